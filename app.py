@@ -1,12 +1,6 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
-import plotly.express as px
-import folium
-from streamlit_folium import st_folium
-from PIL import Image
-import tempfile
 import os
+import time
 from datetime import datetime, timedelta
 import sys
 
@@ -14,10 +8,12 @@ import sys
 sys.path.append('.')
 sys.path.append('./utils')
 
+# תלויות כבדות (pandas, plotly, folium, ee, rasterio, cv2) נטענות רק במצב העבודה
+# שצריך אותן - עליית האפליקציה לא משלמת על מצבים שלא נבחרו
 try:
     import config
-    from utils.earth_engine_utils import *
-    from utils.image_processing import *
+    from utils.profiling import (is_profiling_enabled, stage, get_stage_summary,
+                                 get_metrics_json, get_prometheus_metrics, clear_stage_records)
 except ImportError as e:
     st.error(f"Error importing modules: {e}")
     st.stop()
@@ -48,6 +44,14 @@ with st.sidebar:
     st.markdown("---")
     
     # הגדרות נוספות
+    if analysis_mode == "תמונה מקומית":
+        st.subheader("📏 הגדרות שטח")
+        gsd_m = st.number_input(
+            "גודל פיקסל בשטח (מטרים):",
+            min_value=0.01, value=float(config.DEFAULT_GSD_M), step=0.5,
+            help="משמש לחישוב שטח כאשר לתמונה אין התייחסות גיאוגרפית (GeoTIFF)"
+        )
+    
     if analysis_mode == "Google Earth Engine":
         st.subheader("🛰️ הגדרות לוויין")
         satellite = st.selectbox(
@@ -67,9 +71,37 @@ with st.sidebar:
             0, 100, 20,
             help="אחוז כיסוי עננים מקסימלי מותר"
         )
+        
+        download_map = st.checkbox(
+            "הורד מפת סיווג מלאה",
+            value=False,
+            help="הורדת פיקסלי הסיווג באריחים מקבילים, במקום היסטוגרמה בלבד"
+        )
+    
+    st.markdown("---")
+    
+    # מדידת זמן וזיכרון לכל שלב - הגדרה של התהליך כולו (LAND_USE_PROFILING=1) ולא של
+    # משתמש בודד, כדי ש-session אחד לא יכבה את המדידה ואת tracemalloc באמצע שלבים של אחר
+    profiling_enabled = is_profiling_enabled()
+    if profiling_enabled:
+        st.caption("📈 מדידת ביצועים פעילה (LAND_USE_PROFILING)")
 
 # אזור תוכן ראשי
 if analysis_mode == "תמונה מקומית":
+    try:
+        import pandas as pd
+        import plotly.express as px
+        from utils.image_processing import (load_raster, get_display_image, read_image_size, read_band_names,
+                                            create_classification_overlay, get_rgb_classification_stats,
+                                            scale_georeference)
+        from utils.classification_session import ClassificationSession, get_classification_session
+        from utils.result_cache import make_result_key, get_cached_result, get_result_file_path
+        from utils.job_queue import get_job_queue, JobQueueFull, QUEUED, DONE, FAILED, CANCELLED
+        from utils.local_analysis import analyze_local_image
+    except ImportError as e:
+        st.error(f"Error importing modules: {e}")
+        st.stop()
+    
     st.header("📁 ניתוח תמונה מקומית")
     
     # העלאת קובץ
@@ -80,49 +112,171 @@ if analysis_mode == "תמונה מקומית":
     )
     
     if uploaded_file is not None:
-        # שמירת הקובץ זמנית
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
-            tmp_file.write(uploaded_file.read())
-            tmp_file_path = tmp_file.name
+        # גישה ישירה לבתים של הקובץ שהועלה, ללא העתקה וללא קובץ זמני
+        file_buffer = uploaded_file.getbuffer()
+        
+        # מפתח מטמון לפי תוכן הקובץ והגדרות הסיווג
+        overlay_alpha = 0.6
+        result_key = make_result_key(file_buffer, max_size=config.MAX_IMAGE_SIZE, alpha=overlay_alpha,
+                                     preview_size=config.OVERLAY_PREVIEW_SIZE, gsd_m=gsd_m)
         
         try:
-            # טעינת התמונה
-            with st.spinner("טוען תמונה..."):
-                image = load_image(tmp_file_path)
+            # בדיקת המטמון לפני פענוח - תוצאה שמורה כוללת גם את תמונת התצוגה
+            result = get_cached_result(result_key)
+            
+            preview_state = st.session_state.get('preview')
+            if result is not None and result['preview'] is not None:
+                preview = result['preview']
+            elif preview_state is not None and preview_state[0] == result_key:
+                # תמונת התצוגה נשמרת בין רענוני הדף בזמן שהניתוח רץ
+                preview = preview_state[1]
+            else:
+                # תמונת תצוגה בלבד - הקטנה ברמת המפענח, כך שגם קובץ גדול נטען מהר
+                with st.spinner("טוען תמונה..."):
+                    image = load_raster(file_buffer, config.OVERLAY_PREVIEW_SIZE)
+                preview = get_display_image(image, config.OVERLAY_PREVIEW_SIZE) if image is not None else None
+                st.session_state.preview = (result_key, preview)
             
-            if image is not None:
+            if preview is not None:
                 # הצגת התמונה המקורית
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.subheader("🖼️ תמונה מקורית")
-                    st.image(image, caption="תמונה מקורית", use_column_width=True)
+                    st.image(preview, caption="תמונה מקורית", use_column_width=True)
                 
-                # כפתור לניתוח
+                # כפתור לניתוח - התוצאות נשארות מוצגות גם בהרצות חוזרות של הדף
                 if st.button("🔍 התחל ניתוח", type="primary"):
-                    with st.spinner("מבצע ניתוח סיווג..."):
-                        # שינוי גודל אם נדרש
-                        processed_image = resize_image(image)
-                        
-                        # סיווג התמונה
-                        classification = classify_rgb_image(processed_image)
-                        
-                        # יצירת שכבת צבעים
-                        overlay = create_classification_overlay(processed_image, classification, alpha=0.6)
-                        
-                        with col2:
-                            st.subheader("🎨 תוצאות סיווג")
-                            st.image(overlay, caption="סיווג שטח", use_column_width=True)
-                        
-                        # סטטיסטיקות
-                        st.subheader("📊 סטטיסטיקות")
-                        stats = get_rgb_classification_stats(classification)
+                    st.session_state.analyzed_key = result_key
+                
+                if st.session_state.get('analyzed_key') == result_key and result is None:
+                    # הניתוח רץ בתור העבודות ברקע - ה-session מחזיק רק את מזהה העבודה,
+                    # והדף מתרענן ומציג התקדמות עד שהתוצאה מוכנה
+                    job_queue = get_job_queue()
+                    job_state = st.session_state.get('analysis_job')
+                    job = job_queue.get_job(job_state[1]) if job_state and job_state[0] == result_key else None
+                    
+                    if job is None:
+                        try:
+                            job = job_queue.submit(analyze_local_image, file_buffer, result_key, gsd_m,
+                                                   overlay_alpha, name='local_analysis')
+                            st.session_state.analysis_job = (result_key, job.id)
+                        except JobQueueFull:
+                            st.session_state.pop('analyzed_key', None)
+                            st.warning("⚠️ המערכת עמוסה - נסה שוב בעוד מספר דקות")
+                    
+                    if job is not None:
+                        if job.status == DONE and job.result is not None:
+                            result = job.result
+                        elif job.done:
+                            # כישלון, ביטול או תמונה שלא נטענה - לחיצה נוספת מגישה עבודה חדשה
+                            st.session_state.pop('analyzed_key', None)
+                            st.session_state.pop('analysis_job', None)
+                            if job.status == CANCELLED:
+                                st.info("הניתוח בוטל")
+                            elif job.status == FAILED:
+                                st.error(f"❌ שגיאה בניתוח: {job.error}")
+                            else:
+                                st.error("❌ לא ניתן לטעון את התמונה. בדוק שהקובץ תקין.")
+                        else:
+                            with col2:
+                                st.subheader("🎨 תוצאות סיווג")
+                                if job.status == QUEUED:
+                                    st.progress(0.0, text=f"ממתין בתור ({job_queue.get_metrics()['queue_depth']} עבודות)")
+                                else:
+                                    st.progress(job.progress, text=job.message or "מבצע ניתוח סיווג...")
+                                if st.button("⏹️ בטל ניתוח"):
+                                    job.cancel()
+                            time.sleep(config.JOB_POLL_SECONDS)
+                            st.rerun()
+                
+                if st.session_state.get('analyzed_key') == result_key and result is not None:
+                    overlay, stats = result['overlay'], result['stats']
+                    
+                    # כוונון ספים - סיווג מחדש מהמאפיינים השמורים של תמונת התצוגה, שבו מחושבים
+                    # רק התנאים שהסף שלהם השתנה. התוצאה לתצוגה בלבד ולא נשמרת במטמון
+                    with st.expander("🎚️ כוונון ספים", expanded=False):
+                        thresholds = {}
+                        for class_name, class_thresholds in config.RGB_CLASSIFICATION_THRESHOLDS.items():
+                            st.markdown(f"**{config.LAND_USE_CLASSES[class_name]['name']}**")
+                            slider_columns = st.columns(3)
+                            thresholds[class_name] = {}
+                            for i, (name, value) in enumerate(class_thresholds.items()):
+                                low, high, step = config.RGB_THRESHOLD_SLIDERS[name.rsplit('_', 1)[0]]
+                                thresholds[class_name][name] = slider_columns[i % 3].slider(
+                                    name, low, high, type(low)(value), step, key=f"threshold_{class_name}_{name}"
+                                )
+                    
+                    if thresholds != config.RGB_CLASSIFICATION_THRESHOLDS:
+                        # תמונה עם כל ערוצי המודל סווגה בכללים הרב-ספקטרליים
+                        band_names = read_band_names(file_buffer) or []
+                        if all(band in band_names for band in config.MODEL_BANDS):
+                            st.info("כוונון הספים זמין לסיווג RGB בלבד")
+                        elif result['preview'] is None:
+                            st.info("כוונון הספים אינו זמין לתוצאה זו (אין תמונת תצוגה שמורה)")
+                        else:
+                            # הסשן נבנה מתמונת התצוגה השמורה, בגודל שבו השכבה מוצגת, ונשמר
+                            # במטמון המשותף לפי מפתח התוצאה - ה-session לא מחזיק את המישורים
+                            with st.spinner("מכין סיווג אינטראקטיבי..."):
+                                session = get_classification_session(
+                                    result_key, lambda: ClassificationSession(result['preview'])
+                                )
+                            with stage('classify.tuned'):
+                                tuned = session.classify(thresholds)
+                            overlay = create_classification_overlay(result['preview'], tuned, alpha=overlay_alpha)
+                            
+                            # סטטיסטיקות ברזולוציית התצוגה - התייחסות וגודל פיקסל מותאמים לגודל זה
+                            georef = result.get('georef')
+                            if georef is not None:
+                                georef = scale_georeference(georef, tuned.shape[1], tuned.shape[0])
+                            source_size = read_image_size(file_buffer) or result['classification'].shape
+                            scaled_gsd_m = gsd_m * max(source_size) / max(tuned.shape)
+                            stats = get_rgb_classification_stats(tuned, georef, scaled_gsd_m)
+                    
+                    with col2:
+                        st.subheader("🎨 תוצאות סיווג")
+                        st.image(overlay, caption="סיווג שטח", use_column_width=True)
                         
-                        # יצירת DataFrame לתצוגה
-                        stats_df = pd.DataFrame.from_dict(stats, orient='index')
-                        if not stats_df.empty:
-                            st.dataframe(stats_df, use_container_width=True)
+                        # הורדת מפת הסיווג כ-COG עבור מקור GeoTIFF - הקובץ נבנה רק לפי בקשה,
+                        # נשמר ליד התוצאה במאגר, וה-session מחזיק רק את הנתיב אליו
+                        if result.get('georef') is not None:
+                            cog_state = st.session_state.get('cog_download')
+                            if cog_state is not None and (cog_state[0] != result_key or not os.path.exists(cog_state[1])):
+                                # הקובץ של תוצאה אחרת, או שפונה מהדיסק
+                                cog_state = None
+                            
+                            if cog_state is None:
+                                if st.button("🗺️ הכן מפת סיווג להורדה (COG)"):
+                                    from utils.raster_output import write_classification_cog
+                                    
+                                    cog_path = get_result_file_path(result_key, 'classification.tif')
+                                    with st.spinner("יוצר COG..."):
+                                        success = write_classification_cog(result['classification'], cog_path,
+                                                                           result['georef'])
+                                    if success:
+                                        cog_state = (result_key, cog_path)
+                                        st.session_state.cog_download = cog_state
+                                    else:
+                                        st.error("❌ יצירת קובץ ה-COG נכשלה")
                             
+                            if cog_state is not None:
+                                with open(cog_state[1], 'rb') as cog_file:
+                                    st.download_button(
+                                        "⬇️ הורד מפת סיווג (COG)",
+                                        data=cog_file,
+                                        file_name=f"{os.path.splitext(uploaded_file.name)[0]}_classes.tif",
+                                        mime="image/tiff"
+                                    )
+                    
+                    # סטטיסטיקות
+                    st.subheader("📊 סטטיסטיקות")
+                    
+                    # יצירת DataFrame לתצוגה
+                    stats_df = pd.DataFrame.from_dict(stats, orient='index')
+                    if not stats_df.empty:
+                        st.dataframe(stats_df, use_container_width=True)
+                        
+                        with stage('render.charts'):
                             # גרף עוגה
                             fig_pie = px.pie(
                                 values=stats_df['percentage'],
@@ -135,7 +289,7 @@ if analysis_mode == "תמונה מקומית":
                                 }
                             )
                             st.plotly_chart(fig_pie, use_container_width=True)
-                            
+                        
                             # גרף עמודות
                             fig_bar = px.bar(
                                 x=[config.LAND_USE_CLASSES.get(idx, {}).get('name', idx) for idx in stats_df.index],
@@ -155,13 +309,15 @@ if analysis_mode == "תמונה מקומית":
                 
         except Exception as e:
             st.error(f"❌ שגיאה בעיבוד התמונה: {e}")
-        
-        finally:
-            # מחיקת קובץ זמני
-            if os.path.exists(tmp_file_path):
-                os.unlink(tmp_file_path)
 
 elif analysis_mode == "Google Earth Engine":
+    try:
+        from utils.earth_engine_utils import initialize_ee, analyze_region_cached
+        from utils.image_processing import get_class_palette, resize_image
+    except ImportError as e:
+        st.error(f"Error importing modules: {e}")
+        st.stop()
+    
     st.header("🛰️ ניתוח Google Earth Engine")
     
     # בדיקת אתחול Earth Engine
@@ -190,33 +346,44 @@ elif analysis_mode == "Google Earth Engine":
             bounds = [lng - buffer_deg, lat - buffer_deg, lng + buffer_deg, lat + buffer_deg]
             
             try:
-                with st.spinner("מוריד תמונות לוויין..."):
-                    date_start = date_range[0].strftime('%Y-%m-%d')
-                    date_end = date_range[1].strftime('%Y-%m-%d')
-                    
-                    # קבלת תמונת לוויין
-                    satellite_image = get_satellite_image(bounds, date_start, date_end, satellite)
+                date_start = date_range[0].strftime('%Y-%m-%d')
+                date_end = date_range[1].strftime('%Y-%m-%d')
+                
+                # תמונת לוויין, סיווג וסטטיסטיקות - דרך מטמון הבקשות
+                with st.spinner("מנתח תמונות לוויין..."):
+                    stats = analyze_region_cached(bounds, date_start, date_end, satellite, cloud_cover)
                 
-                if satellite_image:
-                    with st.spinner("מבצע סיווג..."):
-                        # סיווג השטח
-                        classification = classify_land_use(satellite_image)
+                if stats:
+                    st.success("✅ הניתוח הושלם בהצלחה!")
+                    
+                    # הצגת תוצאות
+                    st.subheader("📊 תוצאות ניתוח")
+                    st.json(stats)
+                    
+                    if download_map:
+                        # rasterio נדרש רק להורדת המפה המלאה
+                        from utils.ee_download import download_classification
+                        from utils.raster_output import classification_to_cog_bytes
                         
-                        if classification:
-                            # חישוב סטטיסטיקות
-                            geometry = ee.Geometry.Rectangle(bounds)
-                            stats = get_classification_stats(classification, geometry)
-                            
-                            st.success("✅ הניתוח הושלם בהצלחה!")
-                            
-                            # הצגת תוצאות
-                            if stats:
-                                st.subheader("📊 תוצאות ניתוח")
-                                st.json(stats)
-                        else:
-                            st.error("❌ שגיאה בסיווג השטח")
+                        with st.spinner("מוריד את מפת הסיווג באריחים..."):
+                            classification, georef = download_classification(
+                                bounds, date_start, date_end, satellite, cloud_cover)
+                        
+                        st.subheader("🗺️ מפת סיווג")
+                        palette = get_class_palette()
+                        st.image(resize_image(palette[classification], config.OVERLAY_PREVIEW_SIZE),
+                                 caption="מפת סיווג", use_column_width=True)
+                        
+                        cog_bytes = classification_to_cog_bytes(classification, georef)
+                        if cog_bytes:
+                            st.download_button(
+                                "⬇️ הורד מפת סיווג (COG)",
+                                data=cog_bytes,
+                                file_name="classification.tif",
+                                mime="image/tiff"
+                            )
                 else:
-                    st.error("❌ לא נמצאו תמונות לוויין עבור האזור והתאריכים שנבחרו")
+                    st.error("❌ לא נמצאו תמונות לוויין או שהסיווג נכשל עבור האזור והתאריכים שנבחרו")
                     
             except Exception as e:
                 st.error(f"❌ שגיאה בניתוח: {e}")
@@ -225,8 +392,33 @@ elif analysis_mode == "Google Earth Engine":
         st.info("💡 הפעל את הפקודה: `earthengine authenticate` בטרמינל")
 
 elif analysis_mode == "מפה אינטראקטיבית":
+    try:
+        import pandas as pd
+        import folium
+        from streamlit_folium import st_folium
+        from utils.tile_server import (list_sources, register_source, get_source_bounds, get_tile_url_template,
+                                       classify_area)
+    except ImportError as e:
+        st.error(f"Error importing modules: {e}")
+        st.stop()
+    
     st.header("🗺️ מפה אינטראקטיבית")
     
+    # רסטר מקור לשכבת הסיווג - האריחים מסווגים לפי דרישה בזמן הגלילה. המקורות מוגבלים
+    # לקבצים בתיקיית הנתונים שהוגדרה, כך שמשתמש לא יכול להגיש קובץ שרירותי מהשרת
+    source_path = st.selectbox(
+        "קובץ GeoTIFF לשכבת סיווג:",
+        [''] + list_sources(),
+        help=f"תצלום אוויר RGB או סצנה רב-ספקטרלית (ערוצי B2..B12) מתוך {config.TILE_SOURCE_DIR}"
+    )
+    
+    source_id = None
+    if source_path:
+        try:
+            source_id = register_source(source_path)
+        except Exception as e:
+            st.error(f"❌ לא ניתן לפתוח את הקובץ: {e}")
+    
     # יצירת מפה
     m = folium.Map(
         location=config.DEFAULT_MAP_CENTER,
@@ -237,6 +429,20 @@ elif analysis_mode == "מפה אינטראקטיבית":
     # הוספת שכבת OpenStreetMap
     folium.TileLayer('OpenStreetMap').add_to(m)
     
+    # שכבת הסיווג משרת האריחים המקומי
+    if source_id is not None:
+        folium.TileLayer(
+            tiles=get_tile_url_template(source_id),
+            attr='Land use classification',
+            name='סיווג שטח',
+            overlay=True,
+            max_native_zoom=22,
+            max_zoom=22
+        ).add_to(m)
+        
+        west, south, east, north = get_source_bounds(source_id)
+        m.fit_bounds([[south, west], [north, east]])
+    
     # יצירת קבוצת שכבות
     feature_group = folium.FeatureGroup(name='Areas of Interest')
     m.add_child(feature_group)
@@ -255,7 +461,49 @@ elif analysis_mode == "מפה אינטראקטיבית":
         st.info(f"📍 נקודה נבחרה: {clicked_lat:.6f}, {clicked_lng:.6f}")
         
         if st.button("🔍 נתח את האזור הנבחר", type="primary"):
-            st.info("🚧 ניתוח מפות אינטראקטיביות יוטמע בגרסה הבאה")
+            if source_id is None:
+                st.warning("⚠️ בחר קובץ GeoTIFF כדי לנתח את האזור")
+            else:
+                with st.spinner("מסווג את האזור..."):
+                    stats = classify_area(source_id, clicked_lng, clicked_lat)
+                
+                if stats:
+                    st.subheader("📊 סטטיסטיקות האזור")
+                    st.dataframe(pd.DataFrame.from_dict(stats, orient='index'), use_container_width=True)
+                else:
+                    st.error("❌ הנקודה שנבחרה מחוץ לקובץ")
+
+# לוח מדידת ביצועים - אחרי העיבוד, כדי לכלול את השלבים של ההרצה הנוכחית
+if profiling_enabled:
+    import pandas as pd
+    from utils.job_queue import get_job_queue
+    
+    with st.sidebar:
+        with st.expander("🧵 תור עבודות", expanded=False):
+            # עומק התור וניצולת העובדים - משותפים לכל ה-sessions בתהליך
+            job_metrics = get_job_queue().get_metrics()
+            st.metric("עבודות ממתינות", job_metrics['queue_depth'])
+            st.metric("עובדים פעילים", f"{job_metrics['busy_workers']}/{job_metrics['workers']}")
+            st.metric("ניצולת עובדים", f"{job_metrics['utilization']:.0%}")
+            st.json(job_metrics, expanded=False)
+        
+        with st.expander("📈 זמני שלבים", expanded=True):
+            summary = get_stage_summary()
+            if summary:
+                profile_df = pd.DataFrame.from_dict(summary, orient='index')
+                profile_df['peak_mb'] = profile_df['peak_bytes'] / (1024 * 1024)
+                st.dataframe(
+                    profile_df[['calls', 'mean_seconds', 'p95_seconds', 'cpu_seconds', 'peak_mb']].round(4),
+                    use_container_width=True
+                )
+                st.download_button("⬇️ JSON", data=get_metrics_json(include_records=True),
+                                   file_name="stage_metrics.json", mime="application/json")
+                st.download_button("⬇️ Prometheus", data=get_prometheus_metrics() + get_job_queue().get_prometheus_metrics(),
+                                   file_name="stage_metrics.prom", mime="text/plain")
+                if st.button("🗑️ איפוס מדידות"):
+                    clear_stage_records()
+            else:
+                st.info("אין עדיין מדידות - הרץ ניתוח")
 
 # כותרת תחתונה
 st.markdown("---")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+סיווג אצווה משורת הפקודה
+מסווג תיקייה או תבנית glob של תמונות וכותב מפות סיווג וטבלת סטטיסטיקות
+
+דוגמה:
+    python batch_classify.py "tiles/**/*.tif" -o classes/ -s stats.parquet
+"""
+
+import argparse
+import sys
+from utils.batch_processing import iter_input_files, run_batch
+
+def parse_args(argv=None):
+    """פענוח ארגומנטים משורת הפקודה"""
+    parser = argparse.ArgumentParser(description="סיווג שימושי קרקע לתיקיית תמונות")
+    parser.add_argument('source', help="תיקייה או תבנית glob של קבצי קלט")
+    parser.add_argument('-o', '--output-dir', help="תיקייה לכתיבת מפות הסיווג")
+    parser.add_argument('-s', '--stats', default='classification_stats.csv',
+                        help="קובץ טבלת סטטיסטיקות (.csv או .parquet)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="מספר תהליכי עבודה (ברירת מחדל: מספר הליבות)")
+    parser.add_argument('--max-size', type=int, default=None,
+                        help="גודל מקסימלי לצלע התמונה לפני הסיווג")
+    parser.add_argument('--gsd', type=float, default=None,
+                        help="גודל פיקסל בשטח במטרים לקבצים ללא התייחסות גיאוגרפית")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """הרצת סיווג האצווה"""
+    args = parse_args(argv)
+
+    input_paths = iter_input_files(args.source)
+    if not input_paths:
+        print(f"❌ לא נמצאו קבצים נתמכים ב-{args.source}")
+        return 1
+
+    print(f"🗂️  מסווג {len(input_paths)} קבצים...")
+
+    try:
+        result = run_batch(input_paths,
+                           output_dir=args.output_dir,
+                           stats_path=args.stats,
+                           workers=args.workers,
+                           max_size=args.max_size,
+                           gsd_m=args.gsd)
+    except (ValueError, ImportError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"✅ סווגו {len(result['rows'])} קבצים ב-{result['elapsed_seconds']:.1f} שניות")
+    if result['failed']:
+        print(f"⚠️  {len(result['failed'])} קבצים נכשלו")
+    print(f"📈 {result['images_per_second']:.2f} images/s, "
+          f"{result['megapixels_per_second']:.2f} MP/s")
+
+    return 0 if not result['failed'] else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+מדידת ביצועים למערכת סיווג שטח
+מודד זמן ושיא זיכרון של שלבי עיבוד התמונה המקומי על סולם גדלים,
+שומר את התוצאות כ-JSON ומשווה מול ריצת בסיס
+
+דוגמה:
+    python benchmark_system.py -o bench.json
+    python benchmark_system.py --compare bench.json --threshold 0.15
+    python benchmark_system.py --startup
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+import rasterio
+
+from examples.create_sample_image import generate_sample_image
+from utils.image_processing import (load_image, resize_image, calculate_image_indices,
+                                    classify_rgb_image, get_rgb_classification_stats,
+                                    create_classification_overlay)
+
+DEFAULT_SIZES = [512, 1024, 2048, 4096, 10000]
+DEFAULT_REPEATS = 3
+DEFAULT_THRESHOLD = 0.1  # ירידה מותרת בתפוקה (10%)
+
+# המודולים שנטענים בעליית האפליקציה ובכל מצב עבודה
+APP_SHELL_MODULES = ['streamlit', 'config', 'utils.profiling']
+STARTUP_SCENARIOS = {
+    # כל התלויות של כל המצבים בעלייה - כפי ש-app.py טען אותן לפני הייבוא לפי מצב
+    'eager_all_modes': ['streamlit', 'numpy', 'pandas', 'plotly.express', 'folium', 'streamlit_folium',
+                        'PIL.Image', 'ee', 'rasterio', 'cv2', 'config', 'utils.earth_engine_utils',
+                        'utils.image_processing', 'utils.result_cache', 'utils.raster_output',
+                        'utils.ee_download', 'utils.tile_server', 'utils.profiling'],
+    'app_shell': APP_SHELL_MODULES,
+    'local_mode': APP_SHELL_MODULES + ['pandas', 'plotly.express', 'utils.image_processing',
+                                       'utils.result_cache'],
+    # initialize_ee נקרא מיד בכניסה למצב, ולכן ee נטען בו
+    'gee_mode': APP_SHELL_MODULES + ['utils.earth_engine_utils', 'utils.image_processing', 'ee'],
+    'map_mode': APP_SHELL_MODULES + ['pandas', 'folium', 'streamlit_folium', 'utils.tile_server']
+}
+
+# ייבוא המודולים בתהליך נקי ומדידת הזמן - מודול שאינו מותקן מדווח ולא נמדד
+STARTUP_SCRIPT = """
+import importlib, json, sys, time
+missing = []
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        missing.append(name)
+print(json.dumps({'seconds': time.perf_counter() - start, 'missing': missing}))
+"""
+
+def measure(func: Callable[[], object], repeats: int) -> Dict[str, float]:
+    """
+    מדידת זמן (הטוב מבין החזרות) ושיא הקצאות זיכרון של קריאה לפונקציה
+
+    שיא הזיכרון נמדד עם tracemalloc, שעוקב אחרי הקצאות NumPy
+    אך לא אחרי הקצאות פנימיות של OpenCV
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': best, 'peak_mb': peak / (1024 * 1024)}
+
+def write_inputs(image: np.ndarray, tmp_dir: str) -> Dict[str, str]:
+    """
+    שמירת תמונת הקלט בפורמטים הנמדדים
+    """
+    paths = {}
+    bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+    for fmt in ('jpg', 'png'):
+        paths[fmt] = os.path.join(tmp_dir, f"bench.{fmt}")
+        cv2.imwrite(paths[fmt], bgr)
+
+    paths['tif'] = os.path.join(tmp_dir, 'bench.tif')
+    height, width = image.shape[:2]
+    with rasterio.open(paths['tif'], 'w', driver='GTiff', width=width, height=height,
+                       count=3, dtype='uint8', tiled=True, blockxsize=256, blockysize=256) as dst:
+        dst.write(np.transpose(image, (2, 0, 1)))
+
+    return paths
+
+def get_stages(image: np.ndarray, paths: Dict[str, str]) -> List[Tuple[str, Callable[[], object]]]:
+    """
+    רשימת השלבים הנמדדים עבור תמונה אחת
+    """
+    classification = classify_rgb_image(image)
+
+    return [
+        ('load_image_jpeg', lambda: load_image(paths['jpg'])),
+        ('load_image_png', lambda: load_image(paths['png'])),
+        ('load_image_geotiff', lambda: load_image(paths['tif'])),
+        # טעינה בהקטנה ברמת המפענח מול פענוח מלא ואחריו resize_image
+        ('load_image_jpeg_reduced', lambda: load_image(paths['jpg'], max(image.shape[:2]) // 3)),
+        ('load_resize_jpeg', lambda: resize_image(load_image(paths['jpg']), max(image.shape[:2]) // 3)),
+        ('load_image_geotiff_reduced', lambda: load_image(paths['tif'], max(image.shape[:2]) // 3)),
+        ('resize_image', lambda: resize_image(image, max(image.shape[:2]) // 2)),
+        ('calculate_image_indices', lambda: calculate_image_indices(image)),
+        ('classify_rgb_image', lambda: classify_rgb_image(image)),
+        ('get_rgb_classification_stats', lambda: get_rgb_classification_stats(classification)),
+        ('create_classification_overlay', lambda: create_classification_overlay(image, classification))
+    ]
+
+def run_benchmarks(sizes: List[int], repeats: int = DEFAULT_REPEATS) -> Dict:
+    """
+    הרצת כל השלבים על סולם הגדלים
+
+    Returns:
+        מילון תוצאות לפי "שלב@גודל" ומטא-דאטה של הריצה
+    """
+    results = {}
+
+    for size in sizes:
+        print(f"📏 {size}x{size}...")
+        image = generate_sample_image(size, size)
+        megapixels = size * size / 1e6
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = write_inputs(image, tmp_dir)
+
+            for name, func in get_stages(image, paths):
+                result = measure(func, repeats)
+                result['megapixels'] = megapixels
+                result['megapixels_per_second'] = megapixels / result['seconds'] if result['seconds'] > 0 else 0.0
+                results[f"{name}@{size}"] = result
+
+                print(f"   {name:<32} {result['seconds'] * 1000:9.1f} ms "
+                      f"{result['megapixels_per_second']:9.1f} MP/s {result['peak_mb']:9.1f} MB")
+
+        del image
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'repeats': repeats
+        },
+        'results': results
+    }
+
+def measure_startup(modules: List[str], repeats: int = DEFAULT_REPEATS) -> Dict:
+    """
+    זמן ייבוא של רשימת מודולים בתהליך Python חדש (הטוב מבין החזרות)
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    best = None
+
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, *modules], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+
+    return best
+
+def run_startup_benchmarks(repeats: int = DEFAULT_REPEATS) -> Dict:
+    """
+    מדידת זמן העלייה - טעינה מלאה מול מעטפת האפליקציה וכל מצב עבודה בנפרד
+
+    Returns:
+        מילון תוצאות לפי תרחיש, עם החיסכון מול הטעינה המלאה
+    """
+    results = {name: measure_startup(modules, repeats) for name, modules in STARTUP_SCENARIOS.items()}
+    eager = results['eager_all_modes']['seconds']
+
+    for name, result in results.items():
+        result['saved_seconds'] = eager - result['seconds']
+        print(f"   {name:<20} {result['seconds'] * 1000:9.1f} ms   "
+              f"חיסכון {result['saved_seconds'] * 1000:8.1f} ms")
+
+    missing = sorted({name for result in results.values() for name in result['missing']})
+    if missing:
+        print(f"⚠️ מודולים שאינם מותקנים ולא נמדדו: {', '.join(missing)}")
+
+    return results
+
+def compare_results(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    השוואת תפוקה מול ריצת בסיס
+
+    Returns:
+        רשימת שלבים שהתפוקה שלהם ירדה יותר מהסף
+    """
+    regressions = []
+
+    for key, result in current['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if not base or not base.get('megapixels_per_second'):
+            continue
+
+        ratio = result['megapixels_per_second'] / base['megapixels_per_second']
+        if ratio < 1 - threshold:
+            regressions.append(f"{key}: {base['megapixels_per_second']:.1f} -> "
+                               f"{result['megapixels_per_second']:.1f} MP/s ({(ratio - 1) * 100:+.1f}%)")
+
+    return regressions
+
+def parse_args(argv=None):
+    """פענוח ארגומנטים משורת הפקודה"""
+    parser = argparse.ArgumentParser(description="מדידת ביצועי עיבוד תמונה מקומי")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="קובץ JSON לתוצאות")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="צלעות התמונות הנמדדות בפיקסלים")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help="מספר חזרות לכל מדידה")
+    parser.add_argument('--compare', help="קובץ JSON של ריצת בסיס להשוואה")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="ירידת תפוקה מותרת כשבר (0.1 = 10%%)")
+    parser.add_argument('--startup', action='store_true',
+                        help="מדידת זמן עליית האפליקציה לפי מצב עבודה, במקום שלבי העיבוד")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """הרצת מדידות הביצועים"""
+    args = parse_args(argv)
+
+    print("⏱️  מדידת ביצועים")
+    print("=" * 40)
+
+    if args.startup:
+        startup = {'meta': {'timestamp': datetime.now().isoformat(timespec='seconds'),
+                            'python': platform.python_version(), 'repeats': args.repeats},
+                   'startup': run_startup_benchmarks(args.repeats)}
+        with open(args.output, 'w') as f:
+            json.dump(startup, f, indent=2)
+        print(f"\n💾 התוצאות נשמרו: {args.output}")
+        return 0
+
+    current = run_benchmarks(args.sizes, args.repeats)
+
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"\n💾 התוצאות נשמרו: {args.output}")
+
+    if not args.compare:
+        return 0
+
+    with open(args.compare) as f:
+        baseline = json.load(f)
+
+    regressions = compare_results(current, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ ירידה בתפוקה מעבר ל-{args.threshold:.0%}:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+
+    print("\n✅ אין ירידה בתפוקה מול ריצת הבסיס")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,6 +14,41 @@ LAND_USE_CLASSES = {
     'other': {'name': 'אחר', 'color': '#D3D3D3', 'id': 0}
 }
 
+# ספי סיווג תמונות RGB (אינדקסים וגווני HSV של OpenCV)
+RGB_CLASSIFICATION_THRESHOLDS = {
+    'forest': {'grvi_min': 0.1, 'tgi_min': 10, 'hue_min': 40, 'hue_max': 80,
+               'saturation_min': 50, 'value_min': 30},
+    'agricultural': {'grvi_min': 0.05, 'grvi_max': 0.1, 'exg_min': 0, 'hue_min': 30, 'hue_max': 90,
+                     'saturation_min': 30, 'value_min': 40},
+    'urban': {'grvi_max': 0.05, 'saturation_max': 50, 'value_min': 60},
+    'water': {'hue_min': 100, 'hue_max': 130, 'saturation_min': 40, 'value_min': 30}
+}
+
+# כללי סיווג - (מחלקה, [(מאפיין, אופרטור, סף)]). כלל מתקיים כשכל התנאים מתקיימים,
+# והכללים מוחלים לפי הסדר כך שכלל מאוחר גובר על מוקדם (כמו שרשרת where בשרת).
+# סף בשם (מחרוזת) נלקח מטבלת הספים של המחלקה, וסף מספרי משמש כפי שהוא
+RGB_CLASSIFICATION_RULES = [
+    ('agricultural', [('grvi', '>', 'grvi_min'), ('grvi', '<=', 'grvi_max'), ('exg', '>', 'exg_min'),
+                      ('hue', '>=', 'hue_min'), ('hue', '<=', 'hue_max'),
+                      ('saturation', '>', 'saturation_min'), ('value', '>', 'value_min')]),
+    ('urban', [('grvi', '<', 'grvi_max'), ('saturation', '<', 'saturation_max'), ('value', '>', 'value_min')]),
+    ('forest', [('grvi', '>', 'grvi_min'), ('tgi', '>', 'tgi_min'),
+                ('hue', '>=', 'hue_min'), ('hue', '<=', 'hue_max'),
+                ('saturation', '>', 'saturation_min'), ('value', '>', 'value_min')]),
+    ('water', [('hue', '>=', 'hue_min'), ('hue', '<=', 'hue_max'),
+               ('saturation', '>', 'saturation_min'), ('value', '>', 'value_min')])
+]
+
+# טווח וצעד מחווני כוונון הספים בממשק, לפי המאפיין (תחילית שם הסף)
+RGB_THRESHOLD_SLIDERS = {
+    'grvi': (-1.0, 1.0, 0.01),
+    'tgi': (-255, 255, 1),
+    'exg': (-510, 510, 1),
+    'hue': (0, 179, 1),
+    'saturation': (0, 255, 1),
+    'value': (0, 255, 1)
+}
+
 # הגדרות מפה
 DEFAULT_MAP_CENTER = [31.5, 34.8]  # ישראל
 DEFAULT_ZOOM = 8
@@ -21,6 +56,8 @@ DEFAULT_ZOOM = 8
 # הגדרות עיבוד תמונה
 MAX_IMAGE_SIZE = 5000  # פיקסלים
 SUPPORTED_FORMATS = ['jpg', 'jpeg', 'png', 'tif', 'tiff']
+RASTER_STRETCH_PERCENTILES = (2, 98)  # מתיחת ערוצי 16 ביט/float ל-uint8 לפי אחוזונים
+RASTER_STRETCH_SAMPLE_PIXELS = 1 << 18  # גודל הדגימה לחישוב האחוזונים
 
 # הגדרות Earth Engine
 EE_MAX_PIXELS = 1e8
@@ -36,4 +73,96 @@ SATELLITE_COLLECTIONS = {
 # הגדרות מודל
 MODEL_BANDS = ['B2', 'B3', 'B4', 'B8', 'B11', 'B12']  # Sentinel-2
 NDVI_THRESHOLD = 0.3
-NDBI_THRESHOLD = 0.1 
\ No newline at end of file
+NDBI_THRESHOLD = 0.1 
+
+# ספי סיווג רב-ספקטרלי (מקומי ו-Earth Engine)
+SPECTRAL_CLASSIFICATION_THRESHOLDS = {
+    'forest': {'ndvi_min': 0.6, 'evi_min': 0.3},
+    'agricultural': {'ndvi_min': NDVI_THRESHOLD, 'ndvi_max': 0.6, 'evi_min': 0.2},
+    'urban': {'ndbi_min': NDBI_THRESHOLD, 'ndvi_max': NDVI_THRESHOLD},
+    'water': {'mndwi_min': 0.3}
+}
+
+# כללי סיווג רב-ספקטרלי - אותו מבנה כמו RGB_CLASSIFICATION_RULES, על שמות ערוצי האינדקסים
+SPECTRAL_CLASSIFICATION_RULES = [
+    ('agricultural', [('NDVI', '>', 'ndvi_min'), ('NDVI', '<', 'ndvi_max'), ('EVI', '>', 'evi_min')]),
+    ('urban', [('NDBI', '>', 'ndbi_min'), ('NDVI', '<', 'ndvi_max')]),
+    ('forest', [('NDVI', '>', 'ndvi_min'), ('EVI', '>', 'evi_min')]),
+    ('water', [('MNDWI', '>', 'mndwi_min')])
+]
+
+# הגדרות עיבוד באריחים (תמונות גדולות)
+TILE_SIZE = 1024  # פיקסלים לצלע אריח
+OUTPUT_BLOCK_SIZE = 256  # גודל בלוק בקובץ הפלט
+
+# הגדרות מטמון
+CACHE_DIR = os.environ.get('LAND_USE_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'land_use_classification'))
+
+# הגדרות עיבוד מקבילי
+PARALLEL_WORKERS = int(os.environ.get('LAND_USE_WORKERS', 0)) or None  # None = מספר הליבות
+PARALLEL_MIN_BAND_ROWS = 64  # מספר שורות מינימלי לרצועה בתהליך עבודה
+BATCH_PREFETCH_FACTOR = 2  # קבצים בתור לכל תהליך בעיבוד אצווה
+
+# הגדרות תור העבודות ברקע (ממשק Streamlit)
+JOB_WORKERS = int(os.environ.get('LAND_USE_JOB_WORKERS', 2))  # עבודות שרצות במקביל
+JOB_QUEUE_MAX = 32  # עבודות ממתינות מקסימום - מעבר לכך הגשה נדחית
+JOB_HISTORY = 100  # עבודות שהסתיימו שנשמרות לתצוגה
+JOB_POLL_SECONDS = 0.5  # מרווח רענון הדף בזמן שעבודה רצה
+
+# הגדרות מטמון תוצאות (מצב תמונה מקומית)
+RESULT_CACHE_MEMORY_BYTES = 512 * 1024 * 1024  # שכבת הזיכרון
+RESULT_CACHE_DISK_BYTES = 4 * 1024 * 1024 * 1024  # שכבת הדיסק
+
+# הגדרות תצוגה
+OVERLAY_PREVIEW_SIZE = 1400  # צלע מקסימלית לשכבת הסיווג המוצגת בדפדפן
+CLASSIFICATION_SESSION_CACHE_BYTES = 256 * 1024 * 1024  # סשנים לכוונון ספים, משותף לכל המשתמשים
+
+# גודל פיקסל בשטח (מטרים) לחישוב שטח כאשר לתמונה אין התייחסות גיאוגרפית
+DEFAULT_GSD_M = 30
+
+# הגדרות מטמון בקשות Earth Engine
+EE_CACHE_TTL_SECONDS = 7 * 24 * 3600  # תוקף תוצאה במטמון
+EE_CACHE_MAX_ENTRIES = 1000  # מספר רשומות מקסימלי בדיסק
+EE_CACHE_COORD_DECIMALS = 5  # דיוק נרמול הגבולות (~1 מטר)
+
+# הגדרות סטטיסטיקות אזורים באצווה (Earth Engine)
+EE_BATCH_MAX_FEATURES = 500  # מספר אזורים מקסימלי בבקשת reduceRegions אחת
+EE_BATCH_MAX_PAYLOAD_BYTES = 4 * 1024 * 1024  # גודל מקסימלי של הגיאומטריות בבקשה אחת
+
+# הגדרות הרצת בקשות Earth Engine במקביל
+EE_MAX_CONCURRENT_REQUESTS = 8  # בקשות בו זמנית
+EE_REQUESTS_PER_SECOND = 10  # הגבלת קצב (token bucket)
+EE_RETRY_MAX = 5  # ניסיונות חוזרים על שגיאות מכסה ו-5xx
+EE_RETRY_BASE_DELAY = 1.0  # השהיה בסיסית בשניות, מוכפלת בכל ניסיון
+EE_RETRY_MAX_DELAY = 60.0  # השהיה מקסימלית בשניות
+EE_METRICS_HISTORY = 10000  # מספר קריאות אחרונות שנשמרות למדדי זמן
+
+# הגדרות הורדת פיקסלים מ-Earth Engine
+EE_DOWNLOAD_TILE_PIXELS = 1024  # צלע מקסימלית לאריח בבקשה אחת
+EE_DOWNLOAD_MAX_BYTES = 32 * 1024 * 1024  # גודל מקסימלי של תגובה (מגבלת computePixels/getDownloadURL)
+EE_TILE_CACHE_DISK_BYTES = 2 * 1024 * 1024 * 1024  # מטמון האריחים שהורדו בדיסק
+
+# הגדרות קומפוזיט חציוני מקומי
+COMPOSITE_MAX_BYTES = 256 * 1024 * 1024  # זיכרון מקסימלי לאריח (ערימת הסצנות, מסכות ופלט)
+COMPOSITE_SCL_CLOUD_CLASSES = [3, 8, 9, 10]  # Sentinel-2 SCL: צל ענן, ענן בינוני/גבוה, ציררוס
+COMPOSITE_QA60_CLOUD_BITS = [10, 11]  # Sentinel-2 QA60: ענן אטום, ציררוס
+
+# הגדרות שרת אריחים (XYZ) למצב המפה
+# האריחים נטענים בדפדפן של המשתמש ולא בשרת: בפריסה מרוחקת מאזינים על כתובת חיצונית
+# בפורט קבוע (או מאחורי proxy), ומגדירים את הכתובת שהדפדפן פונה אליה
+TILE_SERVER_HOST = os.environ.get('LAND_USE_TILE_HOST', '127.0.0.1')  # כתובת האזנה (0.0.0.0 לכל הממשקים)
+TILE_SERVER_PORT = int(os.environ.get('LAND_USE_TILE_PORT', 0))  # 0 = פורט פנוי אקראי
+TILE_SERVER_PUBLIC_URL = os.environ.get('LAND_USE_TILE_PUBLIC_URL') or None  # כתובת בסיס לדפדפן, למשל https://example.org/land-use
+TILE_SOURCE_DIR = os.environ.get('LAND_USE_DATA_DIR',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))  # רסטרים שמותר להגיש
+TILE_PIXELS = 256  # צלע אריח מפה
+TILE_OVERLAY_ALPHA = 180  # שקיפות שכבת הסיווג (0-255)
+TILE_CACHE_MEMORY_TILES = 4096  # אריחים מקודדים בשכבת הזיכרון
+TILE_CACHE_DISK_BYTES = 1024 * 1024 * 1024  # שכבת הדיסק
+
+# הגדרות מדידת ביצועים לפי שלב
+PROFILING_ENABLED = os.environ.get('LAND_USE_PROFILING', '0') == '1'
+PROFILING_TRACE_MEMORY = True  # שיא הקצאות לכל שלב (tracemalloc מאט הקצאות בזמן שהוא פעיל)
+PROFILING_HISTORY = 5000  # מספר מדידות אחרונות שנשמרות לאחוזונים
+PROFILING_LOG_PATH = os.environ.get('LAND_USE_PROFILING_LOG') or None  # קובץ JSON lines (אופציונלי)
@@ -9,10 +9,13 @@ import cv2
 from PIL import Image, ImageDraw
 import os
 
-def create_sample_image(width=800, height=600, filename="sample_aerial.jpg"):
+def generate_sample_image(width=800, height=600, seed=0):
     """
-    יוצר תמונת דוגמה עם אזורים שונים
+    מחזיר מערך תמונת דוגמה (RGB) עם אזורים שונים, ללא שמירה לדיסק
+    התמונה דטרמיניסטית לפי seed, כך שמדידות ביצועים חוזרות על אותו קלט
     """
+    rng = np.random.default_rng(seed)
+    
     # יצירת תמונה ריקה
     image = np.zeros((height, width, 3), dtype=np.uint8)
     
@@ -25,9 +28,9 @@ def create_sample_image(width=800, height=600, filename="sample_aerial.jpg"):
     
     # הוספת מרקם ליער
     for i in range(50):
-        x = np.random.randint(0, width//2)
-        y = np.random.randint(0, height//3)
-        radius = np.random.randint(5, 15)
+        x = rng.integers(0, width//2)
+        y = rng.integers(0, height//3)
+        radius = rng.integers(5, 15)
         dark_green = [20, 100, 20]
         cv2.circle(image, (x, y), radius, dark_green, -1)
     
@@ -47,10 +50,10 @@ def create_sample_image(width=800, height=600, filename="sample_aerial.jpg"):
     
     # הוספת בניינים (ריבועים כהים)
     for i in range(10):
-        x = np.random.randint(width//2 + 10, width - 30)
-        y = np.random.randint(10, height//2 - 30)
-        w = np.random.randint(15, 30)
-        h = np.random.randint(20, 40)
+        x = rng.integers(width//2 + 10, width - 30)
+        y = rng.integers(10, height//2 - 30)
+        w = rng.integers(15, 30)
+        h = rng.integers(20, 40)
         building_color = [105, 105, 105]  # dim gray
         cv2.rectangle(image, (x, y), (x + w, y + h), building_color, -1)
     
@@ -68,6 +71,14 @@ def create_sample_image(width=800, height=600, filename="sample_aerial.jpg"):
             if (i + j) % 20 < 10:
                 image[i:i+2, j:j+5] = [70, 130, 180]  # steel blue
     
+    return image
+
+def create_sample_image(width=800, height=600, filename="sample_aerial.jpg"):
+    """
+    יוצר תמונת דוגמה עם אזורים שונים
+    """
+    image = generate_sample_image(width, height)
+    
     # שמירת התמונה
     output_path = os.path.join("examples", filename)
     cv2.imwrite(output_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
@@ -118,6 +118,1528 @@ def test_earth_engine():
         print(f"❌ Earth Engine error: {e}")
         return False
 
+def test_tiled_classification():
+    """בדיקת סיווג GeoTIFF באריחים מול סיווג מלא"""
+    print("\n🧩 בודק סיווג באריחים...")
+    
+    import os
+    import tempfile
+    import numpy as np
+    import rasterio
+    from rasterio.transform import from_origin
+    from utils.image_processing import classify_rgb_image, get_rgb_classification_stats
+    from utils.tiled_processing import classify_geotiff_tiled
+    
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, size=(700, 900, 3), dtype=np.uint8)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, 'scene.tif')
+        output_path = os.path.join(tmp_dir, 'classes.tif')
+        
+        with rasterio.open(input_path, 'w', driver='GTiff', width=900, height=700, count=3,
+                           dtype='uint8', crs='EPSG:32636', transform=from_origin(600000, 3500000, 1, 1),
+                           tiled=True, blockxsize=128, blockysize=128) as dst:
+            dst.write(np.transpose(image, (2, 0, 1)))
+        
+        stats = classify_geotiff_tiled(input_path, output_path, tile_size=256)
+        
+        with rasterio.open(output_path) as src:
+            tiled_classification = src.read(1)
+            assert src.crs.to_epsg() == 32636, "CRS not preserved"
+    
+    expected = classify_rgb_image(image)
+    georef = {'crs': rasterio.crs.CRS.from_epsg(32636), 'transform': from_origin(600000, 3500000, 1, 1)}
+    assert np.array_equal(tiled_classification, expected), "Tiled classification differs"
+    assert stats == get_rgb_classification_stats(expected, georef), "Tiled stats differ"
+    
+    print("✅ סיווג באריחים זהה לסיווג מלא")
+    return True
+
+def test_lut_classifier():
+    """בדיקת מסווג טבלת החיפוש מול המסווג הרגיל"""
+    print("\n🎨 בודק מסווג LUT...")
+    
+    import copy
+    import os
+    import tempfile
+    import numpy as np
+    import config
+    from utils.image_processing import classify_rgb_image
+    from utils import lut_classifier
+    
+    original_cache_dir = config.CACHE_DIR
+    original_thresholds = copy.deepcopy(config.RGB_CLASSIFICATION_THRESHOLDS)
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config.CACHE_DIR = tmp_dir
+            
+            rng = np.random.default_rng(1)
+            image = rng.integers(0, 256, size=(400, 500, 3), dtype=np.uint8)
+            
+            result = lut_classifier.classify_rgb_image_lut(image)
+            assert np.array_equal(result, classify_rgb_image(image)), "LUT output differs"
+            assert os.path.exists(lut_classifier.get_lut_path()), "LUT not cached on disk"
+            
+            # שינוי סף חייב להוביל לטבלה חדשה
+            old_path = lut_classifier.get_lut_path()
+            config.RGB_CLASSIFICATION_THRESHOLDS['water']['hue_min'] = 90
+            assert lut_classifier.get_lut_path() != old_path, "LUT path ignores thresholds"
+            
+            result = lut_classifier.classify_rgb_image_lut(image)
+            assert np.array_equal(result, classify_rgb_image(image)), "LUT not rebuilt after change"
+    finally:
+        config.CACHE_DIR = original_cache_dir
+        config.RGB_CLASSIFICATION_THRESHOLDS = original_thresholds
+    
+    print("✅ מסווג LUT זהה למסווג הרגיל")
+    return True
+
+def test_parallel_classification():
+    """בדיקת סיווג מקבילי ברצועות מול סיווג רגיל"""
+    print("\n⚡ בודק סיווג מקבילי...")
+    
+    import numpy as np
+    from utils.image_processing import classify_rgb_image, get_rgb_classification_stats
+    from utils.parallel_processing import classify_rgb_image_parallel
+    
+    rng = np.random.default_rng(2)
+    image = rng.integers(0, 256, size=(600, 400, 3), dtype=np.uint8)
+    
+    classification, stats = classify_rgb_image_parallel(image, workers=4)
+    
+    expected = classify_rgb_image(image)
+    assert np.array_equal(classification, expected), "Parallel classification differs"
+    assert stats == get_rgb_classification_stats(expected), "Parallel stats differ"
+    
+    print("✅ סיווג מקבילי זהה לסיווג רגיל")
+    return True
+
+def test_batch_processing():
+    """בדיקת סיווג אצווה של תיקיית תמונות"""
+    print("\n🗂️  בודק סיווג אצווה...")
+    
+    import os
+    import tempfile
+    import cv2
+    import numpy as np
+    import pandas as pd
+    from utils.image_processing import classify_rgb_image
+    from utils.batch_processing import iter_input_files, run_batch, get_output_path
+    
+    rng = np.random.default_rng(3)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_dir = os.path.join(tmp_dir, 'in')
+        output_dir = os.path.join(tmp_dir, 'out')
+        stats_path = os.path.join(tmp_dir, 'stats.csv')
+        os.makedirs(input_dir)
+        
+        images = {}
+        for i in range(3):
+            path = os.path.join(input_dir, f"tile_{i}.png")
+            images[path] = rng.integers(0, 256, size=(120, 160, 3), dtype=np.uint8)
+            cv2.imwrite(path, cv2.cvtColor(images[path], cv2.COLOR_RGB2BGR))
+        
+        input_paths = iter_input_files(input_dir)
+        assert input_paths == sorted(images), "Input discovery mismatch"
+        
+        result = run_batch(input_paths, output_dir=output_dir, stats_path=stats_path, workers=2)
+        assert not result['failed'], "Batch reported failures"
+        assert result['images_per_second'] > 0, "Throughput not reported"
+        
+        for path, image in images.items():
+            classes = cv2.imread(result['output_paths'][path], cv2.IMREAD_UNCHANGED)
+            assert np.array_equal(classes, classify_rgb_image(image)), "Batch classification differs"
+        
+        table = pd.read_csv(stats_path)
+        assert len(table) == 3, "Stats table row count mismatch"
+        
+        # אותו שם קובץ בתיקיות שונות נשמר בתת-תיקיות נפרדות בפלט
+        for sub_dir in ('a', 'b'):
+            os.makedirs(os.path.join(input_dir, sub_dir))
+            cv2.imwrite(os.path.join(input_dir, sub_dir, 'tile.png'), images[input_paths[0]])
+        nested = iter_input_files(os.path.join(input_dir, '**', '*.png'))
+        result = run_batch(nested, output_dir=output_dir, workers=2)
+        assert len(set(result['output_paths'].values())) == len(nested), "Output paths collide"
+        assert result['output_paths'][os.path.join(input_dir, 'a', 'tile.png')] == \
+            get_output_path(os.path.join(input_dir, 'a', 'tile.png'), output_dir, input_dir), \
+            "Output path not relative to source root"
+        
+        # שם זהה בסיומת שונה באותה תיקייה נדחה לפני תחילת העבודה
+        cv2.imwrite(os.path.join(input_dir, 'tile_0.jpg'), images[input_paths[0]])
+        try:
+            run_batch(iter_input_files(input_dir), output_dir=output_dir, workers=2)
+            assert False, "Colliding outputs not rejected"
+        except ValueError:
+            pass
+    
+    print("✅ סיווג אצווה תקין")
+    return True
+
+def test_benchmark_compare():
+    """בדיקת השוואת תוצאות מדידת ביצועים"""
+    print("\n⏱️  בודק השוואת מדידות ביצועים...")
+    
+    from benchmark_system import compare_results
+    
+    baseline = {'results': {'classify_rgb_image@512': {'megapixels_per_second': 100.0},
+                            'resize_image@512': {'megapixels_per_second': 100.0}}}
+    current = {'results': {'classify_rgb_image@512': {'megapixels_per_second': 95.0},
+                           'resize_image@512': {'megapixels_per_second': 80.0},
+                           'resize_image@1024': {'megapixels_per_second': 1.0}}}
+    
+    regressions = compare_results(current, baseline, threshold=0.1)
+    assert len(regressions) == 1, "Expected exactly one regression"
+    assert regressions[0].startswith('resize_image@512'), "Wrong stage flagged"
+    
+    print("✅ השוואת מדידות תקינה")
+    return True
+
+def test_result_cache():
+    """בדיקת מטמון התוצאות בזיכרון ובדיסק"""
+    print("\n💾 בודק מטמון תוצאות...")
+    
+    import os
+    import tempfile
+    import numpy as np
+    import config
+    from rasterio.crs import CRS
+    from rasterio.transform import from_origin
+    from utils import result_cache
+    
+    original_cache_dir = config.CACHE_DIR
+    original_disk_bytes = config.RESULT_CACHE_DISK_BYTES
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config.CACHE_DIR = tmp_dir
+            result_cache.clear_memory_cache()
+            
+            key = result_cache.make_result_key(b'image-bytes', alpha=0.6)
+            assert key != result_cache.make_result_key(b'image-bytes', alpha=0.5), "Key ignores params"
+            assert result_cache.get_cached_result(key) is None, "Unexpected cache hit"
+            
+            # צבעי המחלקות נכנסים למפתח, כי הם צרובים בשכבת התצוגה
+            original_color = config.LAND_USE_CLASSES['urban']['color']
+            try:
+                config.LAND_USE_CLASSES['urban']['color'] = '#000000'
+                assert key != result_cache.make_result_key(b'image-bytes', alpha=0.6), "Key ignores palette"
+            finally:
+                config.LAND_USE_CLASSES['urban']['color'] = original_color
+            
+            classification = np.arange(12, dtype=np.uint8).reshape(3, 4) % 5
+            overlay = np.zeros((3, 4, 3), dtype=np.uint8)
+            preview = np.full((3, 4, 3), 7, dtype=np.uint8)
+            stats = {'urban': {'pixels': 2, 'percentage': 16.67, 'area_km2': 0.0018}}
+            georef = {'crs': CRS.from_epsg(32636), 'transform': from_origin(600000, 3500000, 2, 2),
+                      'width': 4, 'height': 3}
+            result_cache.store_result(key, classification, overlay, stats, preview, georef)
+            
+            # שליפה מהדיסק לאחר ריקון הזיכרון
+            result_cache.clear_memory_cache()
+            result = result_cache.get_cached_result(key)
+            assert result is not None, "Disk tier miss"
+            assert np.array_equal(result['classification'], classification), "Classification differs"
+            assert result['stats'] == stats, "Stats differ"
+            assert np.array_equal(result['preview'], preview), "Preview not cached"
+            assert result['georef']['crs'] == georef['crs'], "Georeference CRS not cached"
+            assert result['georef']['transform'] == georef['transform'], "Georeference transform not cached"
+            
+            # מגבלת נפח אפס מפנה את כל הקבצים מהדיסק
+            config.RESULT_CACHE_DISK_BYTES = 0
+            result_cache.store_result(key, classification, overlay, stats)
+            assert not os.listdir(result_cache.get_result_cache_dir()), "Disk tier not evicted"
+    finally:
+        config.CACHE_DIR = original_cache_dir
+        config.RESULT_CACHE_DISK_BYTES = original_disk_bytes
+        result_cache.clear_memory_cache()
+    
+    print("✅ מטמון התוצאות תקין")
+    return True
+
+def test_load_image_from_bytes():
+    """בדיקת פענוח תמונות מהזיכרון מול טעינה מקובץ"""
+    print("\n📥 בודק טעינת תמונה מהזיכרון...")
+    
+    import io
+    import os
+    import tempfile
+    import cv2
+    import numpy as np
+    import rasterio
+    from utils.image_processing import load_image, detect_image_format
+    
+    rng = np.random.default_rng(4)
+    image = rng.integers(0, 256, size=(64, 80, 3), dtype=np.uint8)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        png_path = os.path.join(tmp_dir, 'image.png')
+        tif_path = os.path.join(tmp_dir, 'image.tif')
+        
+        cv2.imwrite(png_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+        with rasterio.open(tif_path, 'w', driver='GTiff', width=80, height=64,
+                           count=3, dtype='uint8') as dst:
+            dst.write(np.transpose(image, (2, 0, 1)))
+        
+        for path, fmt in ((png_path, 'png'), (tif_path, 'tiff')):
+            with open(path, 'rb') as f:
+                data = f.read()
+            
+            assert detect_image_format(data) == fmt, f"Format detection failed for {fmt}"
+            assert np.array_equal(load_image(data), image), f"Bytes decode differs for {fmt}"
+            assert np.array_equal(load_image(io.BytesIO(data)), image), f"Buffer decode differs for {fmt}"
+            assert np.array_equal(load_image(path), image), f"File load differs for {fmt}"
+    
+    print("✅ טעינה מהזיכרון זהה לטעינה מקובץ")
+    return True
+
+def test_classification_overlay():
+    """בדיקת שכבת הסיווג מבוססת לוח הצבעים"""
+    print("\n🖌️  בודק שכבת סיווג...")
+    
+    import cv2
+    import numpy as np
+    import config
+    from utils.image_processing import create_classification_overlay
+    
+    rng = np.random.default_rng(5)
+    image = rng.integers(0, 256, size=(300, 500, 3), dtype=np.uint8)
+    classification = rng.integers(0, 5, size=(300, 500), dtype=np.uint8)
+    
+    # מימוש ייחוס - מסכה נפרדת לכל מחלקה
+    colored = np.zeros_like(image)
+    for class_info in config.LAND_USE_CLASSES.values():
+        color = class_info['color']
+        colored[classification == class_info['id']] = [int(color[i:i+2], 16) for i in (1, 3, 5)]
+    expected = cv2.addWeighted(image, 0.4, colored, 0.6, 0)
+    
+    overlay = create_classification_overlay(image, classification, alpha=0.6)
+    assert np.array_equal(overlay, expected), "Palette overlay differs"
+    
+    preview = create_classification_overlay(image, classification, alpha=0.6, max_size=100)
+    assert preview.shape == (60, 100, 3), "Preview size mismatch"
+    
+    print("✅ שכבת הסיווג תקינה")
+    return True
+
+def test_classification_stats():
+    """בדיקת סטטיסטיקות bincount ושטח לפי התייחסות גיאוגרפית"""
+    print("\n📐 בודק סטטיסטיקות סיווג...")
+    
+    import numpy as np
+    from rasterio.crs import CRS
+    from rasterio.transform import from_origin
+    from utils.image_processing import (count_classes, measure_class_areas, stats_from_counts,
+                                        get_rgb_classification_stats)
+    
+    classification = np.zeros((100, 50), dtype=np.uint8)
+    classification[:40] = 2
+    classification[40:, :10] = 4
+    
+    # ספירות של שני חצאים ניתנות לחיבור
+    counts = count_classes(classification[:30]) + count_classes(classification[30:])
+    assert np.array_equal(counts, count_classes(classification)), "Counts not mergeable"
+    
+    stats = stats_from_counts(counts, gsd_m=10)
+    assert stats['urban'] == {'pixels': 2000, 'percentage': 40.0, 'area_km2': 0.2}, "GSD area wrong"
+    
+    # מערכת מוטלת - 20 מ"ר לפיקסל
+    projected = {'crs': CRS.from_epsg(32636), 'transform': from_origin(600000, 3500000, 4, 5)}
+    stats = get_rgb_classification_stats(classification, projected)
+    assert stats['water']['area_km2'] == round(600 * 20 / 1e6, 4), "Projected area wrong"
+    
+    # מערכת גיאוגרפית - שטח האריחים מצטבר לשטח המלא
+    geographic_transform = from_origin(34.0, 32.0, 0.001, 0.001)
+    geographic = CRS.from_epsg(4326)
+    full = measure_class_areas(classification, geographic_transform, geographic)
+    merged = (measure_class_areas(classification[:30], geographic_transform, geographic) +
+              measure_class_areas(classification[30:], geographic_transform, geographic, row_offset=30))
+    assert np.allclose(full, merged), "Geographic areas not mergeable"
+    assert 1.0e4 < full.sum() / classification.size < 1.1e4, "Geographic pixel area implausible"
+    
+    # Web Mercator מנפח שטח בכ-1/cos²(φ) - השטח מחושב על הקרקע ולא על המפה
+    mercator_y = 6378137 * np.log(np.tan(np.pi / 4 + np.radians(31.5) / 2))
+    mercator = {'crs': CRS.from_epsg(3857), 'transform': from_origin(3800000, mercator_y, 10, 10)}
+    areas = measure_class_areas(classification, mercator['transform'], mercator['crs'])
+    ground_pixel = 100 * np.cos(np.radians(31.5)) ** 2
+    assert abs(areas.sum() / classification.size / ground_pixel - 1) < 0.01, "Mercator area not corrected"
+    
+    print("✅ סטטיסטיקות הסיווג תקינות")
+    return True
+
+def test_cog_output():
+    """בדיקת כתיבת מפת סיווג כ-COG עם סקירות"""
+    print("\n🗺️  בודק כתיבת COG...")
+    
+    import os
+    import tempfile
+    import numpy as np
+    import rasterio
+    from rasterio.crs import CRS
+    from rasterio.transform import from_origin
+    from utils.raster_output import write_classification_cog
+    
+    classification = np.zeros((1024, 768), dtype=np.uint8)
+    classification[:, 384:] = 3
+    classification[::4, ::4] = 2  # רעש דליל שלא אמור לשרוד דגימת mode
+    georef = {'crs': CRS.from_epsg(32636), 'transform': from_origin(600000, 3500000, 10, 10)}
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'classes.tif')
+        assert write_classification_cog(classification, output_path, georef), "COG write failed"
+        
+        with rasterio.open(output_path) as src:
+            assert src.crs.to_epsg() == 32636, "CRS not preserved"
+            assert src.transform == georef['transform'], "Transform not preserved"
+            assert src.profile['tiled'], "COG not tiled"
+            assert src.overviews(1) == [2, 4], "Unexpected overview levels"
+            assert np.array_equal(src.read(1), classification), "Full resolution differs"
+            
+            overview = src.read(1, out_shape=(256, 192))
+            assert set(np.unique(overview)) == {0, 3}, "Overview not mode-resampled"
+    
+    print("✅ כתיבת COG תקינה")
+    return True
+
+def test_ee_request_cache():
+    """בדיקת מטמון בקשות Earth Engine מול פונקציית ניתוח מדומה"""
+    print("\n🛰️  בודק מטמון בקשות Earth Engine...")
+    
+    import tempfile
+    from utils.ee_cache import RequestCache, MemoryCacheBackend, DiskCacheBackend
+    from utils.earth_engine_utils import analyze_region_cached
+    
+    calls = []
+    
+    def fake_analyze(bounds, date_start, date_end, collection, cloud_cover):
+        calls.append((tuple(bounds), date_start, date_end, collection, cloud_cover))
+        return {'classification': {'1': 10, '2': 5}}
+    
+    now = [1000.0]
+    cache = RequestCache(MemoryCacheBackend(), ttl_seconds=60, max_entries=2, clock=lambda: now[0])
+    bounds = [34.7, 31.4, 34.9, 31.6]
+    
+    first = analyze_region_cached(bounds, '2024-01-01', '2024-02-01', 'sentinel2', 20, cache, fake_analyze)
+    # גבולות שקולים עד לדיוק הנרמול - אותה בקשה
+    second = analyze_region_cached([34.7000000001, 31.4, 34.9, 31.6], '2024-01-01', '2024-02-01',
+                                   'sentinel2', 20, cache, fake_analyze)
+    assert first == second and len(calls) == 1, "Equivalent request not served from cache"
+    
+    analyze_region_cached(bounds, '2024-01-01', '2024-02-01', 'sentinel2', 30, cache, fake_analyze)
+    assert len(calls) == 2, "Cloud threshold ignored in key"
+    
+    # תפוגה
+    now[0] += 61
+    analyze_region_cached(bounds, '2024-01-01', '2024-02-01', 'sentinel2', 20, cache, fake_analyze)
+    assert len(calls) == 3, "Expired entry served"
+    
+    # פינוי לפי מספר רשומות
+    analyze_region_cached(bounds, '2024-03-01', '2024-04-01', 'sentinel2', 20, cache, fake_analyze)
+    assert len(cache.backend.keys_by_access()) == 2, "Entries not evicted"
+    
+    # שמירה בדיסק בין מופעים
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        disk_cache = RequestCache(DiskCacheBackend(tmp_dir), ttl_seconds=60, max_entries=10)
+        analyze_region_cached(bounds, '2024-01-01', '2024-02-01', 'landsat8', 20, disk_cache, fake_analyze)
+        reloaded = RequestCache(DiskCacheBackend(tmp_dir), ttl_seconds=60, max_entries=10)
+        analyze_region_cached(bounds, '2024-01-01', '2024-02-01', 'landsat8', 20, reloaded, fake_analyze)
+        assert len(calls) == 5, "Disk cache not persisted"
+    
+    print("✅ מטמון בקשות Earth Engine תקין")
+    return True
+
+def test_ee_batch_stats():
+    """בדיקת חלוקת אזורים למקטעים ובניית טבלת סטטיסטיקות"""
+    print("\n🏘️  בודק סטטיסטיקות אזורים באצווה...")
+    
+    from utils.earth_engine_utils import regions_to_features, chunk_features, histograms_to_table
+    
+    def square(x, y):
+        return {'type': 'Polygon', 'coordinates': [[[x, y], [x + 1, y], [x + 1, y + 1], [x, y + 1], [x, y]]]}
+    
+    collection = {'type': 'FeatureCollection',
+                  'features': [{'type': 'Feature', 'geometry': square(i, 0), 'properties': {'id': i}}
+                               for i in range(7)]}
+    features = regions_to_features(collection)
+    assert len(features) == 7, "Feature extraction failed"
+    
+    chunks = chunk_features(features, max_features=3)
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1], "Count-based chunking wrong"
+    
+    chunks = chunk_features(features, max_features=100, max_payload_bytes=250)
+    assert all(len(chunk) >= 1 for chunk in chunks) and sum(map(len, chunks)) == 7, "Payload chunking lost features"
+    assert len(chunks) > 1, "Payload limit ignored"
+    
+    table = histograms_to_table([('a', {'1': 30.0, '4': 10.0}), ('b', {'2': 5.0})])
+    assert list(table['region_id']) == ['a', 'a', 'b'], "Table rows wrong"
+    assert list(table['class_name']) == ['agricultural', 'water', 'urban'], "Class names wrong"
+    assert list(table['percentage']) == [75.0, 25.0, 100.0], "Percentages wrong"
+    
+    # get_classification_stats_batch מול ee מדומה - מקטע שנכשל לא מבטל את האחרים
+    import types
+    import config
+    from utils import earth_engine_utils
+    from utils.ee_executor import EERequestExecutor
+    
+    class FakeReduced:
+        def __init__(self, collection):
+            self.collection = collection
+        
+        def getInfo(self):
+            region_ids = [feature['properties']['region_id'] for feature in self.collection]
+            if 'bad' in region_ids:
+                raise ValueError("Geometry is invalid")
+            # התוצאה חוזרת בסדר הפוך - השיוך הוא לפי region_id ולא לפי מיקום
+            return {'features': [{'type': 'Feature', 'geometry': None,
+                                  'properties': {'region_id': region_id, 'histogram': {'1': 3.0, '2': 1.0}}}
+                                 for region_id in reversed(region_ids)]}
+    
+    class FakeClassification:
+        def reduceRegions(self, collection, reducer, scale):
+            assert reducer == 'frequencyHistogram', "Wrong reducer"
+            return FakeReduced(collection)
+    
+    fake_ee = types.SimpleNamespace(
+        FeatureCollection=lambda features: features,
+        Reducer=types.SimpleNamespace(frequencyHistogram=lambda: 'frequencyHistogram')
+    )
+    
+    regions = [{'type': 'Feature', 'geometry': square(i, 0), 'properties': {'name': name}}
+               for i, name in enumerate(['north', 'south', 'bad', 'east', 'west'])]
+    
+    original_ee = earth_engine_utils.ee
+    original_executor = earth_engine_utils._request_executor
+    original_max_features = config.EE_BATCH_MAX_FEATURES
+    try:
+        earth_engine_utils.ee = fake_ee
+        earth_engine_utils._request_executor = EERequestExecutor(max_workers=2, requests_per_second=1000,
+                                                                 max_retries=0)
+        config.EE_BATCH_MAX_FEATURES = 2
+        
+        table, failed_region_ids = earth_engine_utils.get_classification_stats_batch(
+            FakeClassification(), regions, id_property='name')
+    finally:
+        earth_engine_utils._request_executor.shutdown()
+        earth_engine_utils.ee = original_ee
+        earth_engine_utils._request_executor = original_executor
+        config.EE_BATCH_MAX_FEATURES = original_max_features
+    
+    assert failed_region_ids == ['bad', 'east'], "Failed chunk regions not reported"
+    assert sorted(set(table['region_id'])) == ['north', 'south', 'west'], "Surviving chunks lost"
+    north = table[table['region_id'] == 'north']
+    assert list(north['class_name']) == ['agricultural', 'urban'], "Histogram property not read"
+    assert list(north['percentage']) == [75.0, 25.0], "Region percentages wrong"
+    
+    print("✅ סטטיסטיקות אזורים באצווה תקינות")
+    return True
+
+def test_ee_executor():
+    """בדיקת מנהל ההרצה מול שירות Earth Engine מדומה"""
+    print("\n🚦 בודק מנהל הרצת בקשות...")
+    
+    import threading
+    from utils.ee_executor import EERequestExecutor, TokenBucket, is_retryable_error
+    
+    class FakeEEException(Exception):
+        pass
+    
+    class FakeComputedObject:
+        """אובייקט מדומה שנכשל בשגיאת מכסה מספר פעמים לפני שמחזיר תוצאה"""
+        
+        def __init__(self, value, failures=0, error=None):
+            self.value = value
+            self.failures = failures
+            self.error = error or FakeEEException("Too many concurrent aggregations.")
+            self.calls = 0
+            self.lock = threading.Lock()
+        
+        def getInfo(self):
+            with self.lock:
+                self.calls += 1
+                if self.calls <= self.failures:
+                    raise self.error
+            return self.value
+    
+    assert is_retryable_error(FakeEEException("Quota exceeded")), "Quota error not retryable"
+    assert not is_retryable_error(FakeEEException("Image.select: Band 'B99' not found")), "User error retried"
+    # מספרים בהודעת שגיאה של המשתמש אינם קוד HTTP
+    assert not is_retryable_error(FakeEEException("Collection has 503 elements, limit is 500")), \
+        "Number in user error treated as status"
+    
+    class FakeHttpError(Exception):
+        def __init__(self, status):
+            super().__init__(f"HTTP {status}")
+            self.resp = type('Resp', (), {'status': status})()
+    
+    assert is_retryable_error(FakeHttpError(503)), "HTTP 503 not retryable"
+    assert not is_retryable_error(FakeHttpError(400)), "HTTP 400 retried"
+    
+    sleeps = []
+    
+    with EERequestExecutor(max_workers=4, requests_per_second=1000, max_retries=3,
+                           base_delay=0.5, sleep=sleeps.append) as executor:
+        objects = [FakeComputedObject(i, failures=i % 3) for i in range(10)]
+        assert executor.get_info_all(objects) == list(range(10)), "Results out of order"
+        
+        summary = executor.get_metrics_summary()
+        assert summary['calls'] == 10 and summary['failures'] == 0, "Unexpected failures"
+        assert summary['retries'] == sum(i % 3 for i in range(10)), "Retry count wrong"
+        
+        # שגיאה קבועה עוברת לקורא אחרי מיצוי הניסיונות
+        failing = FakeComputedObject(None, failures=100)
+        try:
+            executor.get_info_all([failing])
+            assert False, "Exhausted retries did not raise"
+        except FakeEEException:
+            pass
+        assert failing.calls == 4, "Wrong number of attempts"
+        
+        # שגיאה שאינה חולפת לא נשלחת שוב
+        invalid = FakeComputedObject(None, failures=1, error=FakeEEException("Invalid geometry"))
+        try:
+            executor.get_info_all([invalid])
+            assert False, "Non-retryable error did not raise"
+        except FakeEEException:
+            pass
+        assert invalid.calls == 1, "Non-retryable error retried"
+    
+    # הגבלת קצב - 5 אסימונים לשנייה ללא מאגר שמור
+    now = [0.0]
+    def fake_sleep(seconds):
+        now[0] += seconds
+    bucket = TokenBucket(rate=5, capacity=1, clock=lambda: now[0], sleep=fake_sleep)
+    for _ in range(11):
+        bucket.acquire()
+    assert abs(now[0] - 2.0) < 1e-9, "Token bucket rate wrong"
+    
+    # מדדים נשמרים בחלון מוגבל
+    with EERequestExecutor(max_workers=2, requests_per_second=1000) as executor:
+        executor.metrics = type(executor.metrics)(maxlen=5)
+        executor.get_info_all([FakeComputedObject(i) for i in range(20)])
+        assert executor.get_metrics_summary()['calls'] == 5, "Metrics history not bounded"
+    
+    print("✅ מנהל הרצת הבקשות תקין")
+    return True
+
+def test_spectral_classification():
+    """בדיקת מנוע הסיווג הרב-ספקטרלי המקומי"""
+    print("\n🛰️  בודק סיווג רב-ספקטרלי מקומי...")
+    
+    import os
+    import tempfile
+    import numpy as np
+    import rasterio
+    import config
+    from rasterio.transform import from_origin
+    from utils.spectral_classification import (classify_land_use_array, calculate_indices_array,
+                                               classify_multispectral_geotiff)
+    
+    # פיקסל מייצג לכל מחלקה, בסדר B2, B3, B4, B8, B11, B12
+    samples = {
+        'forest': [300, 500, 300, 4000, 1500, 900],
+        'agricultural': [400, 700, 900, 3000, 2000, 1500],
+        'urban': [1200, 1300, 1500, 1800, 2600, 2400],
+        'water': [800, 1200, 700, 400, 200, 100],
+        'other': [1000, 1000, 1000, 1000, 1000, 1000]
+    }
+    bands = np.array([samples[name] for name in samples], dtype=np.uint16).T.reshape(6, 1, 5)
+    expected = [config.LAND_USE_CLASSES[name]['id'] for name in samples]
+    assert list(classify_land_use_array(bands).ravel()) == expected, "Class rules differ from server"
+    
+    # מקטעים קטנים נותנים תוצאה זהה למקטע אחד
+    rng = np.random.default_rng(5)
+    scene = rng.integers(0, 6000, size=(6, 90, 70), dtype=np.uint16)
+    full = classify_land_use_array(scene, chunk_pixels=scene.shape[1] * scene.shape[2])
+    assert np.array_equal(classify_land_use_array(scene, chunk_pixels=1000), full), "Chunking changed result"
+    
+    # NDVI ב-float32 כמו normalizedDifference בשרת; ערך שלילי ממסך את האינדקס
+    signed = np.array(samples['agricultural'], dtype=np.int16).reshape(6, 1, 1).repeat(2, axis=2)
+    signed[2, 0, 1] = -5
+    indices = calculate_indices_array(signed)
+    assert indices['NDVI'].dtype == np.float32, "NDVI not float32"
+    assert np.isnan(indices['NDVI'][0, 1]) and not np.isnan(indices['NDVI'][0, 0]), "Negative input not masked"
+    assert list(classify_land_use_array(signed).ravel()) == [1, 0], "Masked index satisfied a rule"
+    
+    # GeoTIFF עם ערוצים בסדר אחר, לפי תיאור, וערך nodata
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, 's2.tif')
+        output_path = os.path.join(tmp_dir, 'classes.tif')
+        order = [3, 0, 5, 1, 4, 2]
+        scene[:, :3, :3] = 0
+        with rasterio.open(input_path, 'w', driver='GTiff', width=70, height=90, count=6, dtype='uint16',
+                           crs='EPSG:32636', transform=from_origin(600000, 3500000, 10, 10), nodata=0) as dst:
+            for position, band_index in enumerate(order, start=1):
+                dst.write(scene[band_index], position)
+                dst.set_band_description(position, config.MODEL_BANDS[band_index])
+        
+        stats = classify_multispectral_geotiff(input_path, output_path, tile_size=32)
+        assert stats is not None, "Multispectral classification failed"
+        
+        with rasterio.open(output_path) as src:
+            result = src.read(1)
+        expected = classify_land_use_array(np.ma.masked_equal(scene, 0))
+        assert np.array_equal(result, expected), "Tiled multispectral classification differs"
+        assert result[0, 0] == 0, "Nodata pixel classified"
+    
+    print("✅ סיווג רב-ספקטרלי מקומי תקין")
+    return True
+
+def test_ee_download():
+    """בדיקת הורדת פיקסלים באריחים מול שרת אריחים מדומה"""
+    print("\n📦 בודק הורדת אריחים מ-Earth Engine...")
+    
+    import os
+    import tempfile
+    import threading
+    import numpy as np
+    import config
+    from utils.ee_download import (get_download_grid, plan_download_tiles, download_image, get_tile_cache_dir,
+                                   get_tile_cache_root)
+    from utils.ee_executor import EERequestExecutor
+    
+    grid = get_download_grid([34.7, 31.4, 34.8, 31.5], scale_m=100)
+    assert grid['crs'].to_epsg() == 4326 and grid['width'] > 100, "Download grid wrong"
+    
+    # אריח קטן יותר כאשר התגובה חורגת מהמגבלה
+    tiles = plan_download_tiles(grid, band_count=2, bytes_per_pixel=8, tile_pixels=64, max_bytes=16 * 1024)
+    assert all(tile['width'] * tile['height'] * 16 <= 16 * 1024 for tile in tiles), "Tile exceeds byte limit"
+    assert sum(tile['width'] * tile['height'] for tile in tiles) == grid['width'] * grid['height'], \
+        "Tiles do not cover grid"
+    
+    # שרת אריחים מדומה - מחזיר מערך מובנה כמו computePixels, לפי היסט האריח ברשת
+    rng = np.random.default_rng(6)
+    scene = rng.integers(0, 5, size=(grid['height'], grid['width']), dtype=np.uint8)
+    calls = []
+    lock = threading.Lock()
+    
+    def fake_fetch(image, tile_request):
+        affine = tile_request['affineTransform']
+        col = int(round((affine['translateX'] - grid['transform'].c) / grid['transform'].a))
+        row = int(round((affine['translateY'] - grid['transform'].f) / grid['transform'].e))
+        width = tile_request['dimensions']['width']
+        height = tile_request['dimensions']['height']
+        with lock:
+            calls.append((row, col))
+        block = np.zeros((height, width), dtype=[('classification', np.uint8)])
+        block['classification'] = scene[row:row + height, col:col + width]
+        return block
+    
+    class FakeImage:
+        def serialize(self):
+            return '{"fake": "classification"}'
+    
+    original_cache_dir = config.CACHE_DIR
+    original_tile_pixels = config.EE_DOWNLOAD_TILE_PIXELS
+    original_tile_cache_bytes = config.EE_TILE_CACHE_DISK_BYTES
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config.CACHE_DIR = tmp_dir
+            config.EE_DOWNLOAD_TILE_PIXELS = 40
+            output_path = os.path.join(tmp_dir, 'mosaic.npy')
+            
+            with EERequestExecutor(max_workers=4, requests_per_second=1000) as executor:
+                mosaic, _ = download_image(FakeImage(), grid, bytes_per_pixel=1, output_path=output_path,
+                                           fetch=fake_fetch, executor=executor)
+                assert isinstance(mosaic, np.memmap), "Mosaic not memory-mapped"
+                assert np.array_equal(mosaic[0], scene), "Mosaic differs from source"
+                assert len(calls) == len(plan_download_tiles(grid, bytes_per_pixel=1)), "Wrong tile count"
+                
+                # הורדה חוזרת נקראת מהמטמון בדיסק
+                fetched = len(calls)
+                mosaic, _ = download_image(FakeImage(), grid, bytes_per_pixel=1, fetch=fake_fetch,
+                                           executor=executor)
+                assert len(calls) == fetched, "Cached tiles fetched again"
+                assert np.array_equal(mosaic[0], scene), "Cached mosaic differs"
+                
+                # מטמון האריחים מוגבל בנפח - אחרי הורדה, ואריחים שפונו מורדים מחדש
+                tile_bytes = sum(os.path.getsize(os.path.join(root, name))
+                                 for root, _, names in os.walk(get_tile_cache_root()) for name in names)
+                config.EE_TILE_CACHE_DISK_BYTES = tile_bytes // 2
+                os.remove(os.path.join(get_tile_cache_dir(FakeImage(), grid), '0_0.npy'))
+                mosaic, _ = download_image(FakeImage(), grid, bytes_per_pixel=1, fetch=fake_fetch,
+                                           executor=executor)
+                cached_bytes = sum(os.path.getsize(os.path.join(root, name))
+                                   for root, _, names in os.walk(get_tile_cache_root()) for name in names)
+                assert cached_bytes <= config.EE_TILE_CACHE_DISK_BYTES, "Tile cache over its limit"
+                assert np.array_equal(mosaic[0], scene), "Mosaic differs after eviction"
+                fetched = len(calls)
+                mosaic, _ = download_image(FakeImage(), grid, bytes_per_pixel=1, fetch=fake_fetch,
+                                           executor=executor)
+                assert len(calls) > fetched and np.array_equal(mosaic[0], scene), "Evicted tiles not fetched again"
+            
+            assert np.array_equal(np.load(output_path, mmap_mode='r')[0], scene), "Memmap not persisted"
+    finally:
+        config.CACHE_DIR = original_cache_dir
+        config.EE_DOWNLOAD_TILE_PIXELS = original_tile_pixels
+        config.EE_TILE_CACHE_DISK_BYTES = original_tile_cache_bytes
+    
+    print("✅ הורדת האריחים תקינה")
+    return True
+
+def test_median_compositing():
+    """בדיקת קומפוזיט חציוני מקומי מול חציון על כל הערימה"""
+    print("\n🧮 בודק קומפוזיט חציוני...")
+    
+    import os
+    import tempfile
+    import warnings
+    import numpy as np
+    import rasterio
+    import config
+    from rasterio.transform import from_origin
+    from utils.compositing import (composite_scenes, classify_scene_stack, get_composite_tile_size,
+                                   get_composite_pixel_bytes)
+    from utils.spectral_classification import classify_land_use_array
+    
+    rng = np.random.default_rng(7)
+    height, width, scene_count = 70, 90, 5
+    stack = rng.integers(1, 6000, size=(scene_count, 6, height, width)).astype(np.uint16)
+    clouds = rng.random((scene_count, height, width)) < 0.3
+    clouds[:, :2, :2] = True  # פיקסלים ללא אף תצפית נקייה
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for i in range(scene_count):
+            path = os.path.join(tmp_dir, f"scene_{i}.tif")
+            scl = np.where(clouds[i], 9, 4).astype(np.uint16)
+            with rasterio.open(path, 'w', driver='GTiff', width=width, height=height, count=7,
+                               dtype='uint16', crs='EPSG:32636',
+                               transform=from_origin(600000, 3500000, 10, 10)) as dst:
+                dst.write(stack[i], list(range(1, 7)))
+                dst.write(scl, 7)
+                for band, name in enumerate(config.MODEL_BANDS + ['SCL'], start=1):
+                    dst.set_band_description(band, name)
+            paths.append(path)
+        
+        # מגבלת זיכרון קטנה מאלצת אריחים קטנים
+        composite_path = os.path.join(tmp_dir, 'composite.tif')
+        assert composite_scenes(paths, composite_path, max_bytes=64 * 1024) == composite_path, "Composite failed"
+        
+        # גודל האריח כולל מסכות ופלט, וערימה שלא נכנסת גם באריח המינימלי נדחית
+        tile_size = get_composite_tile_size(scene_count, 64 * 1024)
+        assert tile_size * tile_size * get_composite_pixel_bytes(scene_count) <= 64 * 1024, "Window over limit"
+        try:
+            get_composite_tile_size(1000, 64 * 1024)
+            assert False, "Deep stack exceeded the memory limit"
+        except ValueError:
+            pass
+        deep_path = os.path.join(tmp_dir, 'deep.tif')
+        assert composite_scenes(paths, deep_path, max_bytes=1024) is None and not os.path.exists(deep_path), \
+            "Composite over the memory limit"
+        
+        masked = np.where(clouds[:, None], np.nan, stack.astype(np.float32))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            expected = np.nanmedian(masked, axis=0)
+        
+        with rasterio.open(composite_path) as src:
+            composite = src.read()
+            assert list(src.descriptions) == config.MODEL_BANDS, "Composite band names missing"
+        assert np.allclose(composite, expected, equal_nan=True), "Composite differs from full-stack median"
+        assert np.isnan(composite[:, 0, 0]).all(), "Fully clouded pixel not masked"
+        
+        # הקומפוזיט עובר ישירות לסיווג המקומי
+        output_path = os.path.join(tmp_dir, 'classes.tif')
+        stats = classify_scene_stack(paths, output_path, max_bytes=64 * 1024)
+        assert stats is not None, "Stack classification failed"
+        with rasterio.open(output_path) as src:
+            classes = src.read(1)
+        assert np.array_equal(classes, classify_land_use_array(np.ma.masked_invalid(expected))), \
+            "Stack classification differs"
+    
+    print("✅ קומפוזיט חציוני תקין")
+    return True
+
+def test_tile_server():
+    """בדיקת שרת אריחי הסיווג ומטמון האריחים"""
+    print("\n🗺️ בודק שרת אריחים...")
+    
+    import math
+    import os
+    import tempfile
+    import urllib.request
+    import cv2
+    import numpy as np
+    import rasterio
+    import config
+    from rasterio.transform import from_origin
+    from utils import tile_server
+    
+    original_cache_dir = config.CACHE_DIR
+    original_source_dir = config.TILE_SOURCE_DIR
+    original_public_url = config.TILE_SERVER_PUBLIC_URL
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config.CACHE_DIR = tmp_dir
+            config.TILE_SOURCE_DIR = tmp_dir
+            tile_server.clear_memory_tiles()
+            
+            rng = np.random.default_rng(3)
+            path = os.path.join(tmp_dir, 'aerial.tif')
+            with rasterio.open(path, 'w', driver='GTiff', width=200, height=200, count=3,
+                               dtype='uint8', crs='EPSG:4326',
+                               transform=from_origin(34.75, 32.05, 0.0005, 0.0005)) as dst:
+                dst.write(rng.integers(0, 256, size=(3, 200, 200), dtype=np.uint8))
+            
+            source_id = tile_server.register_source(path)
+            assert tile_server.list_sources() == ['aerial.tif'], "Wrong source list"
+            assert tile_server.register_source('aerial.tif') == source_id, "Relative source not resolved"
+            
+            # קבצים מחוץ לתיקיית הנתונים לא נרשמים - גם דרך '..' או קישור
+            for outside_path in (os.path.join(tmp_dir, '..', 'aerial.tif'), os.path.abspath(__file__)):
+                try:
+                    tile_server.register_source(outside_path)
+                    assert False, f"Registered {outside_path}"
+                except PermissionError:
+                    pass
+            os.symlink(os.path.dirname(os.path.abspath(__file__)), os.path.join(tmp_dir, 'link'))
+            try:
+                tile_server.register_source(os.path.join('link', os.path.basename(__file__)))
+                assert False, "Registered a source through a symlink"
+            except PermissionError:
+                pass
+            
+            west, south, east, north = tile_server.get_source_bounds(source_id)
+            assert abs(west - 34.75) < 1e-6 and abs(north - 32.05) < 1e-6, "Wrong source bounds"
+            
+            # האריח שמכיל את מרכז הרסטר
+            z, lon, lat = 14, 34.8, 32.0
+            x = int((lon + 180) / 360 * 2 ** z)
+            y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * 2 ** z)
+            
+            data = tile_server.get_tile(source_id, z, x, y)
+            rgba = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+            assert rgba.shape == (config.TILE_PIXELS, config.TILE_PIXELS, 4), "Wrong tile shape"
+            assert (rgba[..., 3] == config.TILE_OVERLAY_ALPHA).all(), "Covered tile not opaque"
+            
+            # אריח מחוץ לרסטר שקוף לחלוטין
+            outside = cv2.imdecode(np.frombuffer(tile_server.get_tile(source_id, z, 0, 0), np.uint8),
+                                   cv2.IMREAD_UNCHANGED)
+            assert (outside[..., 3] == 0).all(), "Outside tile not transparent"
+            
+            # שכבת הזיכרון ושכבת הדיסק מחזירות את אותו אריח ללא סיווג מחדש
+            original_render = tile_server.render_tile
+            tile_server.render_tile = lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError("re-rendered"))
+            try:
+                assert tile_server.get_tile(source_id, z, x, y) == data, "Memory tile cache miss"
+                tile_server.clear_memory_tiles()
+                assert tile_server.get_tile(source_id, z, x, y) == data, "Disk tile cache miss"
+            finally:
+                tile_server.render_tile = original_render
+            
+            assert tile_server.get_tile('0' * 16, z, x, y) is None, "Unknown source served"
+            
+            # סטטיסטיקות לחלון סביב נקודה
+            stats = tile_server.classify_area(source_id, lon, lat, size_pixels=64)
+            assert stats and sum(info['pixels'] for info in stats.values()) == 64 * 64, "Wrong area stats"
+            assert tile_server.classify_area(source_id, 0.0, 0.0) is None, "Outside point classified"
+            
+            # בקשת HTTP דרך השרת
+            url = tile_server.get_tile_url_template(source_id).format(z=z, x=x, y=y)
+            with urllib.request.urlopen(url) as response:
+                assert response.headers['Content-Type'] == 'image/png', "Wrong content type"
+                assert response.read() == data, "HTTP tile differs"
+            
+            # כתובת ציבורית (proxy) - התבנית נבנית ממנה, והשרת מקבל את הנתיב עם התחילית
+            local_url = tile_server.start_tile_server()
+            config.TILE_SERVER_PUBLIC_URL = 'https://maps.example.org/land-use/'
+            assert tile_server.get_tile_url_template(source_id) == \
+                f"https://maps.example.org/land-use/tiles/{source_id}/{{z}}/{{x}}/{{y}}.png", "Wrong public URL"
+            with urllib.request.urlopen(f"{local_url}/land-use/tiles/{source_id}/{z}/{x}/{y}.png") as response:
+                assert response.read() == data, "Prefixed tile path not served"
+    finally:
+        config.CACHE_DIR = original_cache_dir
+        config.TILE_SOURCE_DIR = original_source_dir
+        config.TILE_SERVER_PUBLIC_URL = original_public_url
+        tile_server.clear_memory_tiles()
+    
+    print("✅ שרת אריחים תקין")
+    return True
+
+def test_profiling():
+    """בדיקת מדידת הביצועים לפי שלב"""
+    print("\n📈 בודק מדידת ביצועים...")
+    
+    import json
+    import threading
+    import numpy as np
+    from utils import profiling
+    from utils.ee_executor import EERequestExecutor
+    from utils.image_processing import classify_rgb_image, resize_image
+    
+    was_enabled = profiling.is_profiling_enabled()
+    
+    try:
+        # כשהמדידה כבויה לא נרשם דבר
+        profiling.set_profiling(False)
+        profiling.clear_stage_records()
+        image = np.random.default_rng(0).integers(0, 256, size=(300, 400, 3), dtype=np.uint8)
+        classify_rgb_image(image)
+        with profiling.stage('render.charts'):
+            pass
+        assert profiling.get_stage_records() == [], "Stages recorded while disabled"
+        
+        profiling.set_profiling(True, trace_memory=True)
+        classify_rgb_image(resize_image(image, 200))
+        
+        # שלב מקונן - השיא של החיצוני כולל את הפנימי
+        with profiling.stage('outer'):
+            with profiling.stage('inner'):
+                buffer = np.ones(2 * 1024 * 1024, dtype=np.uint8)
+                del buffer
+        
+        try:
+            with profiling.stage('failing'):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+        
+        with EERequestExecutor(max_workers=2, requests_per_second=1000) as executor:
+            executor.submit(lambda: 42, name='reduceRegions[3]').result()
+        
+        summary = profiling.get_stage_summary()
+        for name in ('resize', 'classify', 'outer', 'inner', 'failing', 'ee.reduceRegions'):
+            assert name in summary, f"Stage {name} not recorded"
+        assert summary['classify']['cpu_seconds'] >= 0 and summary['classify']['wall_seconds'] > 0, \
+            "Missing classify timing"
+        assert summary['inner']['peak_bytes'] >= 2 * 1024 * 1024, "Inner allocation peak missed"
+        assert summary['outer']['peak_bytes'] >= summary['inner']['peak_bytes'], "Outer peak below inner"
+        assert summary['failing']['failures'] == 1, "Failure not counted"
+        
+        # שלבים חופפים ב-threads שונים - שיא ההקצאות משותף לתהליך ולא מיוחס לאף אחד
+        started, release = threading.Event(), threading.Event()
+        def background_stage():
+            with profiling.stage('background'):
+                started.set()
+                release.wait(5)
+        worker = threading.Thread(target=background_stage)
+        worker.start()
+        started.wait(5)
+        with profiling.stage('foreground'):
+            buffer = np.ones(1024 * 1024, dtype=np.uint8)
+            del buffer
+        release.set()
+        worker.join()
+        records = {record['stage']: record for record in profiling.get_stage_records()}
+        assert records['foreground']['peak_bytes'] is None and records['background']['peak_bytes'] is None, \
+            "Peak attributed to overlapping stages"
+        with profiling.stage('alone'):
+            buffer = np.ones(1024 * 1024, dtype=np.uint8)
+            del buffer
+        assert profiling.get_stage_records()[-1]['peak_bytes'] >= 1024 * 1024, "Peak missed after overlap"
+        
+        payload = json.loads(profiling.get_metrics_json(include_records=True))
+        assert payload['stages']['classify']['calls'] == 1 and payload['records'], "Wrong JSON metrics"
+        
+        prometheus = profiling.get_prometheus_metrics()
+        assert 'land_use_stage_calls_total{stage="classify"} 1' in prometheus, "Missing Prometheus counter"
+        assert '# TYPE land_use_stage_wall_seconds summary' in prometheus, "Missing Prometheus summary"
+    finally:
+        profiling.set_profiling(was_enabled)
+        profiling.clear_stage_records()
+    
+    print("✅ מדידת ביצועים תקינה")
+    return True
+
+def test_lazy_imports():
+    """בדיקה שמודולי העזר לא טוענים תלויות כבדות בזמן הייבוא"""
+    print("\n🪶 בודק טעינה עצלה...")
+    
+    import json
+    import subprocess
+    import sys
+    from utils.lazy_import import lazy_module
+    
+    # ייבוא בתהליך נקי - המודולים שכבר נטענו בבדיקות אחרות לא משפיעים
+    script = (
+        "import json, sys\n"
+        "import utils.earth_engine_utils, utils.image_processing, utils.result_cache, utils.profiling\n"
+        "print(json.dumps([name for name in ('ee', 'rasterio', 'pandas') if name in sys.modules]))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+    loaded = json.loads(output.strip().splitlines()[-1])
+    assert loaded == [], f"Heavy modules loaded at import time: {loaded}"
+    
+    # המודול נטען בגישה הראשונה לתכונה
+    lazy_json = lazy_module('json')
+    assert 'not loaded' in repr(lazy_json), "Module loaded before use"
+    assert lazy_json.dumps([1]) == '[1]', "Lazy module attribute failed"
+    assert "'json' (loaded)" in repr(lazy_json), "Module not marked loaded"
+    
+    print("✅ טעינה עצלה תקינה")
+    return True
+
+def test_classification_rules():
+    """בדיקת מנוע כללי הסיווג - מעריך NumPy וביטויי Earth Engine מאותם כללים"""
+    print("\n📐 בודק מנוע כללי סיווג...")
+    
+    import copy
+    import numpy as np
+    import config
+    from utils.classification_rules import (get_compiled_rules, compile_ee_expressions,
+                                            get_rules_fingerprint, resolve_rules)
+    from utils.image_processing import classify_rgb_image, get_classifier_fingerprint
+    
+    rules, thresholds = config.SPECTRAL_CLASSIFICATION_RULES, config.SPECTRAL_CLASSIFICATION_THRESHOLDS
+    compiled = get_compiled_rules(rules, thresholds)
+    assert compiled.features == ['EVI', 'MNDWI', 'NDBI', 'NDVI'], "Wrong rule features"
+    
+    rng = np.random.default_rng(5)
+    features = {name: rng.uniform(-1, 1, 5000) for name in compiled.features}
+    features['NDVI'][:10] = np.nan  # פיקסל ממוסך לא מקיים אף תנאי
+    local = compiled.evaluate(features)
+    
+    # ביטויי השרת, מוערכים מקומית בשרשרת where, נותנים את אותו סיווג
+    expected = np.zeros(5000, dtype=np.uint8)
+    for class_id, expression, bands in compile_ee_expressions(rules, thresholds):
+        numpy_expression = ' & '.join(f"({term})" for term in expression.split(' && '))
+        condition = eval(numpy_expression, {}, {band: features[band] for band in bands})
+        expected[condition] = class_id
+    assert np.array_equal(local, expected), "EE expressions differ from local evaluator"
+    assert (local[:10] != config.LAND_USE_CLASSES['forest']['id']).all(), "Masked pixel classified as forest"
+    
+    # כלל מאוחר גובר: מים מעל חקלאות
+    overlap = {'NDVI': np.array([0.4]), 'EVI': np.array([0.5]), 'NDBI': np.array([0.0]), 'MNDWI': np.array([0.9])}
+    assert compiled.evaluate(overlap)[0] == config.LAND_USE_CLASSES['water']['id'], "Rule order ignored"
+    
+    # סף לא מוכר מדווח
+    try:
+        resolve_rules([('water', [('MNDWI', '>', 'missing')])], thresholds)
+        assert False, "Unknown threshold accepted"
+    except ValueError:
+        pass
+    
+    # שינוי סף ב-config משנה את הסיווג ואת טביעת האצבע ללא עריכת קוד
+    original_thresholds = copy.deepcopy(config.RGB_CLASSIFICATION_THRESHOLDS)
+    image = rng.integers(0, 256, size=(120, 150, 3), dtype=np.uint8)
+    before = classify_rgb_image(image)
+    fingerprint = get_classifier_fingerprint()
+    rgb_fingerprint = get_rules_fingerprint(config.RGB_CLASSIFICATION_RULES, config.RGB_CLASSIFICATION_THRESHOLDS)
+    try:
+        config.RGB_CLASSIFICATION_THRESHOLDS['urban']['value_min'] = 0
+        config.RGB_CLASSIFICATION_THRESHOLDS['urban']['saturation_max'] = 256
+        config.RGB_CLASSIFICATION_THRESHOLDS['urban']['grvi_max'] = 2
+        after = classify_rgb_image(image)
+        assert get_classifier_fingerprint() != fingerprint, "Fingerprint ignores rule thresholds"
+        assert get_rules_fingerprint(config.RGB_CLASSIFICATION_RULES,
+                                     config.RGB_CLASSIFICATION_THRESHOLDS) != rgb_fingerprint, "Rules fingerprint unchanged"
+        assert (after == config.LAND_USE_CLASSES['urban']['id']).sum() > \
+            (before == config.LAND_USE_CLASSES['urban']['id']).sum(), "Threshold change not applied"
+    finally:
+        config.RGB_CLASSIFICATION_THRESHOLDS = original_thresholds
+    
+    assert np.array_equal(classify_rgb_image(image), before), "Original thresholds not restored"
+    
+    print("✅ מנוע כללי סיווג תקין")
+    return True
+
+def test_raster_store():
+    """בדיקת מאגר הרסטרים בדיסק ושיתוף התוצאות כ-memmap"""
+    print("\n🗄️ בודק מאגר רסטרים...")
+    
+    import os
+    import tempfile
+    import numpy as np
+    import config
+    from utils import raster_store, result_cache
+    from utils.image_processing import classify_rgb_image, create_classification_overlay
+    
+    original_cache_dir = config.CACHE_DIR
+    original_disk_bytes = config.RESULT_CACHE_DISK_BYTES
+    original_chunk_bytes = raster_store.STORE_CHUNK_BYTES
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config.CACHE_DIR = tmp_dir
+            result_cache.clear_memory_cache()
+            
+            # מקטעים קטנים מאלצים העתקה בכמה חלקים
+            raster_store.STORE_CHUNK_BYTES = 1000
+            root = os.path.join(tmp_dir, 'store')
+            array = np.arange(300 * 40, dtype=np.int32).reshape(300, 40)
+            raster_store.save_entry(root, 'entry', {'values': array, 'missing': None}, {'name': 'test'})
+            entry = raster_store.open_entry(root, 'entry')
+            assert entry['meta']['name'] == 'test' and entry['meta']['arrays'] == ['values'], "Wrong meta"
+            assert isinstance(entry['arrays']['values'], np.memmap), "Array not memory-mapped"
+            assert not entry['arrays']['values'].flags.writeable, "Stored array writable"
+            assert np.array_equal(entry['arrays']['values'], array), "Chunked copy differs"
+            assert raster_store.open_entry(root, 'missing') is None, "Missing entry opened"
+            
+            # הסיווג נכתב ישירות לדיסק, והתוצאה נשמרת ללא העתקה
+            rng = np.random.default_rng(6)
+            image = rng.integers(0, 256, size=(90, 130, 3), dtype=np.uint8)
+            key = result_cache.make_result_key(image.tobytes())
+            classification = result_cache.create_result_array(key, 'classification', image.shape[:2])
+            classify_rgb_image(image, out=classification)
+            assert np.array_equal(classification, classify_rgb_image(image)), "Classification into memmap differs"
+            
+            overlay = create_classification_overlay(image, classification)
+            result = result_cache.store_result(key, classification, overlay, {'stats': 1})
+            assert isinstance(result['classification'], np.memmap), "Result not memory-mapped"
+            assert not os.path.exists(classification.filename), "Temporary array left behind"
+            assert result_cache._result_nbytes(result) == 0, "Memory tier counts on-disk pixels"
+            assert np.array_equal(result['overlay'], overlay), "Overlay differs"
+            
+            # קובץ נלווה נשמר ברשומה ונמחק איתה בפינוי
+            cog_path = result_cache.get_result_file_path(key, 'classification.tif')
+            with open(cog_path, 'wb') as f:
+                f.write(b'cog')
+            
+            # הרשומה הישנה ביותר מפונה ראשונה, והמיפוי הפתוח ממשיך לעבוד
+            other = result_cache.store_result('other', classification, overlay, {'stats': 2})
+            os.utime(os.path.join(result_cache.get_result_cache_dir(), key, raster_store.META_FILE), (0, 0))
+            other_size = raster_store._get_entry_size(os.path.join(result_cache.get_result_cache_dir(), 'other'))
+            raster_store.evict_entries(result_cache.get_result_cache_dir(), other_size)
+            assert not os.path.exists(cog_path), "Oldest entry not evicted"
+            assert raster_store.open_entry(result_cache.get_result_cache_dir(), 'other') is not None, \
+                "Recent entry evicted"
+            assert np.array_equal(result['classification'], classification), "Open mapping broken by eviction"
+            assert other['stats'] == {'stats': 2}, "Wrong stats"
+    finally:
+        config.CACHE_DIR = original_cache_dir
+        config.RESULT_CACHE_DISK_BYTES = original_disk_bytes
+        raster_store.STORE_CHUNK_BYTES = original_chunk_bytes
+        result_cache.clear_memory_cache()
+    
+    print("✅ מאגר רסטרים תקין")
+    return True
+
+def test_reduced_decode():
+    """בדיקת טעינה בהקטנה ברמת המפענח מול פענוח מלא ו-resize_image"""
+    print("\n🔽 בודק טעינה מוקטנת...")
+    
+    import io
+    import os
+    import tempfile
+    import cv2
+    import numpy as np
+    import rasterio
+    from utils.image_processing import (load_image, resize_image, read_image_size,
+                                        get_jpeg_read_flag, get_resized_shape)
+    
+    # בחירת ההקטנה הגדולה ביותר שלא יורדת מתחת לגודל היעד
+    assert get_jpeg_read_flag(9000, 12000, 5000) == cv2.IMREAD_REDUCED_COLOR_2, "Wrong reduction for 12k"
+    assert get_jpeg_read_flag(900, 1200, 150) == cv2.IMREAD_REDUCED_COLOR_8, "Wrong reduction for 1/8"
+    assert get_jpeg_read_flag(900, 1200, 700) == cv2.IMREAD_COLOR, "Reduced below target"
+    assert get_jpeg_read_flag(900, 1200, None) == cv2.IMREAD_COLOR, "Reduced without target"
+    assert get_resized_shape(900, 1200, 500) == (375, 500), "Wrong resized shape"
+    
+    # תמונה חלקה, כדי שההבדל בין הקטנה במפענח להקטנה אחרי הפענוח יהיה קטן
+    rng = np.random.default_rng(7)
+    image = cv2.resize(rng.integers(0, 256, size=(9, 12, 3), dtype=np.uint8), (1200, 900),
+                       interpolation=cv2.INTER_CUBIC)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jpg_path = os.path.join(tmp_dir, 'image.jpg')
+        png_path = os.path.join(tmp_dir, 'image.png')
+        tif_path = os.path.join(tmp_dir, 'image.tif')
+        
+        cv2.imwrite(jpg_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+        cv2.imwrite(png_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+        with rasterio.open(tif_path, 'w', driver='GTiff', width=1200, height=900,
+                           count=3, dtype='uint8') as dst:
+            dst.write(np.transpose(image, (2, 0, 1)))
+        
+        for path in (jpg_path, png_path, tif_path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            assert read_image_size(path) == (900, 1200), f"Wrong header size for {path}"
+            assert read_image_size(io.BytesIO(data)) == (900, 1200), f"Wrong buffer header size for {path}"
+            
+            for max_size in (140, 500, 2000):
+                expected = resize_image(load_image(path), max_size)
+                reduced = load_image(path, max_size)
+                assert reduced.shape == expected.shape, f"Reduced shape differs for {path}@{max_size}"
+                assert np.array_equal(load_image(data, max_size), reduced), f"Bytes decode differs for {path}"
+                error = np.abs(reduced.astype(np.int16) - expected).mean()
+                assert error < 3, f"Reduced decode too far from full decode for {path}@{max_size}: {error}"
+        
+        assert read_image_size(b'not an image') is None, "Size read from unknown format"
+    
+    print("✅ טעינה מוקטנת תקינה")
+    return True
+
+def test_band_raster():
+    """בדיקת רסטר בסדר ערוצים-קודם מול המסלול הקודם (גובה, רוחב, ערוצים)"""
+    print("\n🎚️ בודק רסטר ערוצים-קודם...")
+    
+    import os
+    import tempfile
+    import numpy as np
+    import rasterio
+    import config
+    from utils.image_processing import (load_image, load_raster, classify_image, classify_rgb_image,
+                                        calculate_image_indices, create_classification_overlay, read_band_names)
+    from utils.band_raster import BandRaster
+    from utils.spectral_classification import classify_land_use_array
+    
+    rng = np.random.default_rng(8)
+    image = rng.integers(0, 256, size=(70, 90, 3), dtype=np.uint8)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # GeoTIFF uint8 בשלושה ערוצים - אותו סיווג ואותם אינדקסים כמו במסלול הקודם
+        rgb_path = os.path.join(tmp_dir, 'rgb.tif')
+        with rasterio.open(rgb_path, 'w', driver='GTiff', width=90, height=70, count=3, dtype='uint8') as dst:
+            dst.write(np.transpose(image, (2, 0, 1)))
+        
+        raster = load_raster(rgb_path)
+        assert isinstance(raster, BandRaster) and raster.names == ['RED', 'GREEN', 'BLUE'], "Wrong band names"
+        assert raster.band('red').flags.c_contiguous, "Band plane not contiguous"
+        assert np.shares_memory(raster.get_bands(['GREEN', 'BLUE']), raster.data), "Consecutive bands copied"
+        assert np.array_equal(classify_image(raster), classify_rgb_image(load_image(rgb_path))), \
+            "Band-first classification differs"
+        indices = calculate_image_indices(raster)
+        expected = calculate_image_indices(image)
+        assert all(np.array_equal(indices[name], expected[name]) for name in expected), "Indices differ"
+        assert load_raster(rgb_path.replace('.tif', '.png')) is None, "Missing file loaded"
+        
+        # uint16 בארבעה ערוצים (RGBN) - מתיחה ל-uint8 לפי אחוזונים, בכל מקטע בנפרד
+        wide = (image.astype(np.uint16) * 40 + 500).transpose(2, 0, 1)
+        nir = rng.integers(0, 10000, size=(1, 70, 90), dtype=np.uint16)
+        rgbn_path = os.path.join(tmp_dir, 'rgbn.tif')
+        with rasterio.open(rgbn_path, 'w', driver='GTiff', width=90, height=70, count=4, dtype='uint16') as dst:
+            dst.write(np.concatenate([wide, nir]))
+        
+        raster = load_raster(rgbn_path)
+        assert raster.dtype == np.uint16 and raster.names == ['RED', 'GREEN', 'BLUE', 'NIR'], "Wrong 16-bit raster"
+        assert read_band_names(rgbn_path) == raster.names and read_band_names(image.tobytes()) is None, \
+            "Wrong band names from header"
+        low, high = raster.get_display_range('RED')
+        assert 500 <= low < high <= 500 + 255 * 40, "Wrong stretch range"
+        rgb = raster.to_rgb()
+        assert rgb.dtype == np.uint8 and rgb.shape == (70, 90, 3), "Wrong display image"
+        assert np.array_equal(classify_image(raster), classify_rgb_image(rgb)), "16-bit classification differs"
+        assert create_classification_overlay(raster, classify_image(raster), max_size=45).shape == (35, 45, 3), \
+            "Wrong overlay from band raster"
+        
+        # Sentinel-2 בסדר ערוצים אחר, לפי תיאור - סיווג בכללים הרב-ספקטרליים
+        scene = rng.integers(0, 6000, size=(6, 40, 50), dtype=np.uint16)
+        order = [3, 0, 5, 1, 4, 2]
+        s2_path = os.path.join(tmp_dir, 's2.tif')
+        with rasterio.open(s2_path, 'w', driver='GTiff', width=50, height=40, count=6, dtype='uint16') as dst:
+            for position, band_index in enumerate(order, start=1):
+                dst.write(scene[band_index], position)
+                dst.set_band_description(position, config.MODEL_BANDS[band_index])
+        
+        with open(s2_path, 'rb') as f:
+            raster = load_raster(f.read())
+        assert raster.has_bands(config.MODEL_BANDS), "Model bands not found"
+        assert np.array_equal(classify_image(raster), classify_land_use_array(scene)), \
+            "Multispectral classification differs"
+    
+    print("✅ רסטר ערוצים-קודם תקין")
+    return True
+
+def test_job_queue():
+    """בדיקת תור העבודות ברקע - עדיפויות, ביטול, דחייה ומדדים"""
+    print("\n🧵 בודק תור עבודות...")
+    
+    import glob
+    import os
+    import tempfile
+    import threading
+    import cv2
+    import numpy as np
+    import config
+    from utils import result_cache
+    from utils.job_queue import JobQueue, JobQueueFull, RUNNING, DONE, FAILED, CANCELLED
+    from utils.local_analysis import analyze_local_image, LOAD_PROGRESS
+    
+    queue = JobQueue(max_workers=1, max_queued=3)
+    release = threading.Event()
+    order = []
+    
+    def blocking(job):
+        release.wait(5)
+        return 'first'
+    
+    def record(job, label):
+        order.append(label)
+        return label
+    
+    def cancellable(job):
+        for i in range(1000):
+            job.set_progress(i / 1000)
+            release.wait(0.01)
+    
+    def failing(job):
+        raise ValueError("bad input")
+    
+    try:
+        first = queue.submit(blocking)
+        assert first.wait(0) is False, "Submit blocked"
+        while first.status != RUNNING:
+            release.wait(0.01)
+        low = queue.submit(record, 'low', priority=0)
+        high = queue.submit(record, 'high', priority=5)
+        skipped = queue.submit(record, 'skipped')
+        
+        # עבודה בעדיפות גבוהה קודמת, ותור מלא דוחה הגשה
+        try:
+            queue.submit(record, 'overflow')
+            assert False, "Full queue accepted a job"
+        except JobQueueFull:
+            pass
+        assert queue.get_metrics()['queue_depth'] == 3 and queue.get_metrics()['busy_workers'] == 1, \
+            "Wrong queue metrics"
+        assert queue.cancel(skipped.id), "Queued job not cancellable"
+        
+        release.set()
+        for job in (first, low, high, skipped):
+            assert job.wait(5), f"Job {job.name} did not finish"
+        assert order == ['high', 'low'], f"Wrong priority order: {order}"
+        assert first.status == DONE and first.result == 'first' and first.progress == 1.0, "Wrong finished job"
+        assert skipped.status == CANCELLED, "Cancelled job ran"
+        
+        # ביטול עבודה שרצה בנקודת דיווח ההתקדמות הבאה, ושגיאה נשמרת בעבודה
+        release.clear()
+        running = queue.submit(cancellable)
+        while running.progress == 0:
+            release.wait(0.01)
+        running.cancel()
+        failed = queue.submit(failing)
+        assert running.wait(5) and running.status == CANCELLED, "Running job not cancelled"
+        assert failed.wait(5) and failed.status == FAILED and isinstance(failed.error, ValueError), \
+            "Failure not recorded"
+        
+        metrics = queue.get_metrics()
+        assert (metrics['completed'], metrics['failed'], metrics['cancelled'], metrics['rejected']) == (3, 1, 2, 1), \
+            f"Wrong counters: {metrics}"
+        assert 0 < metrics['utilization'] <= 1, "Wrong utilization"
+        prometheus = queue.get_prometheus_metrics()
+        assert 'land_use_job_queue_depth 0' in prometheus and 'land_use_jobs_failed_total 1' in prometheus, \
+            "Wrong Prometheus metrics"
+        assert [job['id'] for job in queue.get_jobs()][0] == failed.id, "Jobs not newest first"
+    finally:
+        release.set()
+        queue.shutdown()
+    
+    # ניתוח תמונה מקומית כעבודה - התקדמות עד הסוף ותוצאה שמורה במטמון
+    original_cache_dir = config.CACHE_DIR
+    queue = JobQueue(max_workers=2)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config.CACHE_DIR = tmp_dir
+            result_cache.clear_memory_cache()
+            
+            rng = np.random.default_rng(9)
+            image = rng.integers(0, 256, size=(120, 160, 3), dtype=np.uint8)
+            data = cv2.imencode('.png', cv2.cvtColor(image, cv2.COLOR_RGB2BGR))[1].tobytes()
+            key = result_cache.make_result_key(data)
+            
+            job = queue.submit(analyze_local_image, data, key, 1.0)
+            assert job.wait(10) and job.status == DONE, f"Analysis job failed: {job.error}"
+            assert job.progress == 1.0 and job.result['classification'].shape == (120, 160), "Wrong analysis result"
+            assert result_cache.get_cached_result(key) is not None, "Analysis result not cached"
+            
+            # ביטול באמצע הסיווג לא משאיר מערך זמני במאגר
+            def cancel_during_classify(job, *args):
+                set_progress = job.set_progress
+                
+                def cancel_and_report(fraction, message=None):
+                    if fraction > LOAD_PROGRESS:
+                        job.cancel()
+                    set_progress(fraction, message)
+                
+                job.set_progress = cancel_and_report
+                return analyze_local_image(job, *args)
+            
+            cancelled = queue.submit(cancel_during_classify, data, 'cancelled', 1.0)
+            cancelled.wait(10)
+            assert cancelled.status == CANCELLED, "Analysis not cancelled"
+            assert not glob.glob(os.path.join(tmp_dir, '**', '*.tmp'), recursive=True), "Temporary array left behind"
+    finally:
+        queue.shutdown()
+        config.CACHE_DIR = original_cache_dir
+        result_cache.clear_memory_cache()
+    
+    print("✅ תור עבודות תקין")
+    return True
+
+def test_classification_session():
+    """בדיקת סיווג מחדש אינקרמנטלי כשסף משתנה מול הסיווג המלא"""
+    print("\n🎛️ בודק סיווג אינטראקטיבי...")
+    
+    import copy
+    import cv2
+    import numpy as np
+    import config
+    from utils.image_processing import classify_rgb_image
+    from utils.band_raster import BandRaster
+    from utils.classification_session import (ClassificationSession, FeaturePlane, get_classification_session,
+                                               clear_session_cache)
+    
+    rng = np.random.default_rng(11)
+    image = cv2.resize(rng.integers(0, 256, size=(30, 40, 3), dtype=np.uint8), (320, 240),
+                       interpolation=cv2.INTER_LINEAR)
+    
+    session = ClassificationSession(image)
+    assert np.array_equal(session.classify(), classify_rgb_image(image)), "Session differs from full classification"
+    assert session.get_feature('grvi').codes.dtype == np.uint16, "GRVI plane not compressed"
+    
+    # ספים אקראיים - זהות פיקסל לפיקסל לסיווג המלא באותם ספים
+    original_thresholds = copy.deepcopy(config.RGB_CLASSIFICATION_THRESHOLDS)
+    original_compare = FeaturePlane.compare
+    try:
+        for _ in range(10):
+            thresholds = copy.deepcopy(original_thresholds)
+            class_name = rng.choice(list(thresholds))
+            name = rng.choice(list(thresholds[class_name]))
+            low, high, step = config.RGB_THRESHOLD_SLIDERS[name.rsplit('_', 1)[0]]
+            thresholds[class_name][name] = type(low)(low + step * rng.integers(0, round((high - low) / step) + 1))
+            
+            config.RGB_CLASSIFICATION_THRESHOLDS = thresholds
+            assert np.array_equal(session.classify(thresholds), classify_rgb_image(image)), \
+                f"Session differs after changing {class_name}.{name}"
+        
+        # שינוי סף אחד מחשב מחדש רק את התנאים שמשתמשים בו
+        calls = []
+        def counting_compare(plane, op, value, out):
+            calls.append((op, value))
+            return original_compare(plane, op, value, out)
+        FeaturePlane.compare = counting_compare
+        
+        session.classify(original_thresholds)
+        calls.clear()
+        thresholds = copy.deepcopy(original_thresholds)
+        thresholds['water']['hue_min'] = 95
+        session.classify(thresholds)
+        assert calls == [('>=', 95)], f"Recomputed {calls}"
+        calls.clear()
+        session.classify(thresholds)
+        assert calls == [], "Unchanged thresholds recomputed"
+    finally:
+        FeaturePlane.compare = original_compare
+        config.RGB_CLASSIFICATION_THRESHOLDS = original_thresholds
+    
+    # רסטר ערוצים-קודם - אותה תוצאה כמו מערך (גובה, רוחב, ערוצים)
+    raster = BandRaster(np.transpose(image, (2, 0, 1)).copy(), ['RED', 'GREEN', 'BLUE'])
+    assert np.array_equal(ClassificationSession(raster).classify(), classify_rgb_image(image)), \
+        "Band raster session differs"
+    
+    # הנפח כולל את עותקי הערוצים, והמטמון המשותף מפנה לפי מגבלת הנפח
+    fresh = ClassificationSession(image)
+    assert fresh.nbytes >= 4 * image.shape[0] * image.shape[1], "Channel copies not counted"
+    original_budget = config.CLASSIFICATION_SESSION_CACHE_BYTES
+    try:
+        clear_session_cache()
+        first = get_classification_session('first', lambda: ClassificationSession(image))
+        first.classify()
+        assert get_classification_session('first', lambda: None) is first, "Session not cached"
+        config.CLASSIFICATION_SESSION_CACHE_BYTES = first.nbytes + 1
+        second = get_classification_session('second', lambda: ClassificationSession(image))
+        assert second is not None and get_classification_session('first', lambda: None) is None, \
+            "Session cache over budget"
+    finally:
+        config.CLASSIFICATION_SESSION_CACHE_BYTES = original_budget
+        clear_session_cache()
+    
+    print("✅ סיווג אינטראקטיבי תקין")
+    return True
+
 def main():
     """הפעלת כל הבדיקות"""
     print("🌍 בדיקת מערכת סיווג שטח")
@@ -127,7 +1649,32 @@ def main():
         ("Import Tests", test_imports),
         ("Config Tests", test_config), 
         ("Utils Tests", test_utils),
-        ("Earth Engine Tests", test_earth_engine)
+        ("Earth Engine Tests", test_earth_engine),
+        ("Tiled Classification Tests", test_tiled_classification),
+        ("LUT Classifier Tests", test_lut_classifier),
+        ("Parallel Classification Tests", test_parallel_classification),
+        ("Batch Processing Tests", test_batch_processing),
+        ("Benchmark Compare Tests", test_benchmark_compare),
+        ("Result Cache Tests", test_result_cache),
+        ("In-Memory Decode Tests", test_load_image_from_bytes),
+        ("Classification Overlay Tests", test_classification_overlay),
+        ("Classification Stats Tests", test_classification_stats),
+        ("COG Output Tests", test_cog_output),
+        ("EE Request Cache Tests", test_ee_request_cache),
+        ("EE Batch Stats Tests", test_ee_batch_stats),
+        ("EE Executor Tests", test_ee_executor),
+        ("Spectral Classification Tests", test_spectral_classification),
+        ("EE Download Tests", test_ee_download),
+        ("Median Compositing Tests", test_median_compositing),
+        ("Tile Server Tests", test_tile_server),
+        ("Profiling Tests", test_profiling),
+        ("Lazy Import Tests", test_lazy_imports),
+        ("Classification Rules Tests", test_classification_rules),
+        ("Raster Store Tests", test_raster_store),
+        ("Reduced Decode Tests", test_reduced_decode),
+        ("Band Raster Tests", test_band_raster),
+        ("Job Queue Tests", test_job_queue),
+        ("Classification Session Tests", test_classification_session)
     ]
     
     results = []
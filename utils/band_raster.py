@@ -0,0 +1,188 @@
+"""
+רסטר רב-ערוצי בסדר ערוצים-קודם (ערוצים, גובה, רוחב)
+ערוצי GeoTIFF נשמרים כפי שנקראו מהקובץ - כל ערוץ הוא מישור רציף בזיכרון,
+ללא המרה לפורמט (גובה, רוחב, ערוצים) וללא העתקה של התמונה המלאה.
+לכל ערוץ יש שם (מתיאור הערוץ בקובץ או לפי מספר הערוצים), וסוג הנתונים
+נשמר: ערוצי 16 ביט או float נמתחים ל-uint8 רק במקטע שהסיווג או התצוגה צריכים
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import cv2
+import numpy as np
+import config
+
+# שמות ערוצים כשאין תיאורים בקובץ - לפי מספר הערוצים
+DEFAULT_BAND_NAMES = {
+    1: ['GRAY'],
+    3: ['RED', 'GREEN', 'BLUE'],
+    4: ['RED', 'GREEN', 'BLUE', 'NIR'],
+    len(config.MODEL_BANDS): list(config.MODEL_BANDS)
+}
+
+# שמות מקובלים לכל ערוץ צבע, לפי סדר עדיפות (כולל שמות ערוצי Sentinel-2)
+RGB_BAND_ALIASES = {
+    'red': ['RED', 'R', 'B4'],
+    'green': ['GREEN', 'G', 'B3'],
+    'blue': ['BLUE', 'B', 'B2']
+}
+
+def get_band_names(descriptions: Sequence[Optional[str]]) -> List[str]:
+    """
+    שמות הערוצים בקובץ - מהתיאורים אם לכל הערוצים יש תיאור, אחרת לפי מספר הערוצים
+    """
+    names = [description.strip().upper() if description else None for description in descriptions]
+    if all(names) and len(set(names)) == len(names):
+        return names
+    return DEFAULT_BAND_NAMES.get(len(names), [f"BAND_{i}" for i in range(1, len(names) + 1)])
+
+class BandRaster:
+    """
+    רסטר בסדר ערוצים-קודם עם שמות ערוצים
+    """
+
+    def __init__(self, data: np.ndarray, names: Sequence[str]):
+        if data.ndim == 2:
+            data = data[np.newaxis]
+        if data.shape[0] != len(names):
+            raise ValueError(f"Got {len(names)} band names for {data.shape[0]} bands")
+
+        self.data = data
+        self.names = [name.upper() for name in names]
+        # טווח המתיחה ל-uint8 לכל ערוץ, מחושב פעם אחת
+        self._ranges: Dict[str, Tuple[float, float]] = {}
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.data.dtype
+
+    @property
+    def count(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def height(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def width(self) -> int:
+        return self.data.shape[2]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """גודל התמונה (גובה, רוחב), כמו image.shape[:2]"""
+        return self.data.shape[1:]
+
+    def has_bands(self, names: Sequence[str]) -> bool:
+        """האם כל הערוצים קיימים"""
+        return all(name.upper() in self.names for name in names)
+
+    def band(self, name: str) -> np.ndarray:
+        """מישור הערוץ (גובה, רוחב) - תצוגה ולא העתקה"""
+        return self.data[self.names.index(name.upper())]
+
+    def get_bands(self, names: Sequence[str]) -> np.ndarray:
+        """
+        ערוצים (ערוצים, גובה, רוחב) לפי סדר names - תצוגה כשהערוצים רצופים בקובץ באותו סדר
+        """
+        indexes = [self.names.index(name.upper()) for name in names]
+        if indexes == list(range(indexes[0], indexes[0] + len(indexes))):
+            return self.data[indexes[0]:indexes[0] + len(indexes)]
+        return self.data[indexes]
+
+    def get_rgb_names(self) -> List[str]:
+        """
+        שמות ערוצי האדום, הירוק והכחול - ערוץ אפור יחיד משמש לשלושתם
+
+        Raises:
+            ValueError: אין בקובץ ערוצי צבע מזוהים
+        """
+        if self.names == ['GRAY']:
+            return ['GRAY'] * 3
+
+        rgb_names = []
+        for color, aliases in RGB_BAND_ALIASES.items():
+            name = next((alias for alias in aliases if alias in self.names), None)
+            if name is None:
+                raise ValueError(f"No {color} band found in bands {', '.join(self.names)}")
+            rgb_names.append(name)
+        return rgb_names
+
+    def get_display_range(self, name: str) -> Tuple[float, float]:
+        """
+        טווח הערכים שנמתח ל-0..255 - כל הטווח ל-uint8, ואחוזוני
+        config.RASTER_STRETCH_PERCENTILES על דגימה של הערוץ לשאר הסוגים
+        """
+        if self.dtype == np.uint8:
+            return 0.0, 255.0
+
+        if name not in self._ranges:
+            plane = self.band(name).reshape(-1)
+            step = max(1, plane.size // config.RASTER_STRETCH_SAMPLE_PIXELS)
+            sample = plane[::step]
+            if np.issubdtype(sample.dtype, np.floating):
+                sample = sample[np.isfinite(sample)]
+            if sample.size == 0:
+                self._ranges[name] = (0.0, 1.0)
+            else:
+                low, high = np.percentile(sample, config.RASTER_STRETCH_PERCENTILES)
+                self._ranges[name] = (float(low), float(high))
+        return self._ranges[name]
+
+    def get_uint8(self, name: str, block: slice = slice(None)) -> np.ndarray:
+        """
+        מקטע שטוח של ערוץ כ-uint8 (0..255) - תצוגה לערוץ uint8, ומתיחה של המקטע בלבד לשאר הסוגים
+
+        Args:
+            name: שם הערוץ
+            block: טווח פיקסלים בערוץ השטוח (גובה * רוחב)
+        """
+        plane = self.band(name).reshape(-1)[block]
+        if self.dtype == np.uint8:
+            return plane
+
+        low, high = self.get_display_range(name)
+        scale = 255.0 / (high - low) if high > low else 0.0
+        scaled = (plane.astype(np.float32) - low) * scale
+        np.nan_to_num(scaled, copy=False)
+        np.clip(scaled, 0, 255, out=scaled)
+        return np.rint(scaled).astype(np.uint8)
+
+    def to_rgb(self, max_size: Optional[int] = None) -> np.ndarray:
+        """
+        תמונת RGB uint8 בפורמט (גובה, רוחב, 3) לתצוגה ולשכבת הסיווג
+
+        Args:
+            max_size: גודל מקסימלי לצלע הארוכה - כל ערוץ מוקטן לפני השילוב,
+                      כך שהעותק המשולב נוצר רק בגודל התצוגה
+        """
+        from utils.image_processing import get_resized_shape
+
+        height, width = self.shape
+        if max_size is not None:
+            height, width = get_resized_shape(height, width, max_size)
+
+        planes = []
+        for name in self.get_rgb_names():
+            plane = self.get_uint8(name).reshape(self.shape)
+            if (height, width) != self.shape:
+                plane = cv2.resize(plane, (width, height), interpolation=cv2.INTER_AREA)
+            planes.append(plane)
+        return np.dstack(planes)
+
+def read_band_raster(src, max_size: Optional[int] = None) -> BandRaster:
+    """
+    קריאת כל ערוצי קובץ raster פתוח כ-BandRaster, ללא שינוי סדר הצירים
+
+    Args:
+        src: קובץ rasterio פתוח
+        max_size: גודל מקסימלי לצלע הארוכה - הקטנה בזמן הקריאה (ראו read_raster_image)
+    """
+    if max_size is None:
+        data = src.read()
+    else:
+        from rasterio.enums import Resampling
+        from utils.image_processing import get_resized_shape
+
+        height, width = get_resized_shape(src.height, src.width, max_size)
+        data = src.read(out_shape=(src.count, height, width), resampling=Resampling.average)
+    return BandRaster(data, get_band_names(src.descriptions))
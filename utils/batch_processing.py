@@ -0,0 +1,255 @@
+"""
+מודול עיבוד אצווה
+סיווג תיקיות שלמות של תמונות במקביל - כל תהליך עבודה טוען, מסווג
+וכותב קובץ אחד, וכמה קבצים נמצאים בטיפול בו זמנית כך שקריאה מהדיסק
+של קובץ אחד חופפת לחישוב של אחר
+"""
+
+import glob
+import importlib.util
+import os
+import time
+import cv2
+import numpy as np
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional
+import config
+from utils.image_processing import (load_raster, read_image_size, classify_image,
+                                    get_rgb_classification_stats, read_georeference,
+                                    scale_georeference)
+from utils.parallel_processing import get_worker_count
+from utils.raster_output import write_classification_cog
+
+def iter_input_files(source: str) -> List[str]:
+    """
+    רשימת קבצי הקלט מתיקייה או מתבנית glob, ממוינת ומסוננת לפי הפורמטים הנתמכים
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source, recursive=True)
+
+    return sorted(
+        path for path in paths
+        if os.path.isfile(path) and path.lower().rsplit('.', 1)[-1] in config.SUPPORTED_FORMATS
+    )
+
+def get_source_root(input_paths: Iterable[str]) -> str:
+    """
+    התיקייה המשותפת לכל קבצי הקלט - נתיבי הפלט נבנים יחסית אליה
+    """
+    return os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in input_paths])
+
+def get_output_path(input_path: str, output_dir: str, source_root: Optional[str] = None) -> str:
+    """
+    נתיב מפת הסיווג עבור קובץ קלט - GeoTIFF למקורות גיאוגרפיים ו-PNG לשאר
+
+    מבנה התיקיות שמתחת ל-source_root נשמר בתיקיית הפלט, כך שקבצים בעלי
+    אותו שם בתיקיות שונות לא דורסים זה את זה
+    """
+    if source_root is None:
+        relative_path = os.path.basename(input_path)
+    else:
+        relative_path = os.path.relpath(os.path.abspath(input_path), source_root)
+
+    stem, ext = os.path.splitext(relative_path)
+    suffix = '.tif' if ext.lower() in ('.tif', '.tiff') else '.png'
+    return os.path.join(output_dir, f"{stem}_classes{suffix}")
+
+def get_output_paths(input_paths: List[str], output_dir: str) -> Dict[str, str]:
+    """
+    מיפוי קבצי הקלט לנתיבי הפלט, עם בדיקת התנגשויות לפני תחילת העבודה
+
+    Raises:
+        ValueError: אם שני קבצי קלט ממופים לאותו קובץ פלט (למשל a.jpg ו-a.png)
+    """
+    source_root = get_source_root(input_paths)
+    output_paths = {path: get_output_path(path, output_dir, source_root) for path in input_paths}
+
+    sources_by_output = {}
+    for path, output_path in output_paths.items():
+        sources_by_output.setdefault(output_path, []).append(path)
+
+    collisions = {output_path: paths for output_path, paths in sources_by_output.items() if len(paths) > 1}
+    if collisions:
+        details = '; '.join(f"{output_path} <- {', '.join(paths)}"
+                            for output_path, paths in sorted(collisions.items()))
+        raise ValueError(f"Output path collisions: {details}")
+
+    return output_paths
+
+def check_stats_engine(stats_path: str) -> None:
+    """
+    וידוא שניתן לכתוב את טבלת הסטטיסטיקות לפני שמתחילים לסווג
+
+    Raises:
+        ImportError: קובץ Parquet ללא pyarrow או fastparquet
+    """
+    if not stats_path.lower().endswith('.parquet'):
+        return
+
+    if not any(importlib.util.find_spec(engine) for engine in ('pyarrow', 'fastparquet')):
+        raise ImportError("Writing .parquet stats requires pyarrow or fastparquet - "
+                          "install one of them or use a .csv stats path")
+
+def write_class_raster(classification: np.ndarray, output_path: str, georef: Optional[Dict] = None) -> None:
+    """
+    כתיבת מפת הסיווג לקובץ - COG עם ההתייחסות הגיאוגרפית של מקור GeoTIFF
+    """
+    if not output_path.lower().endswith('.tif'):
+        cv2.imwrite(output_path, classification)
+        return
+
+    if not write_classification_cog(classification, output_path, georef):
+        raise IOError(f"Could not write {output_path}")
+
+def classify_file(input_path: str, output_path: Optional[str] = None,
+                  max_size: int = None, gsd_m: float = None) -> Optional[Dict]:
+    """
+    טעינה, סיווג וכתיבה של קובץ בודד
+
+    Returns:
+        שורת סטטיסטיקות לקובץ, או None אם הטעינה נכשלה
+    """
+    if max_size is None:
+        max_size = config.MAX_IMAGE_SIZE
+
+    # טעינה ישירה בגודל העיבוד - הקטנה ברמת המפענח, ללא פענוח ברזולוציה המלאה;
+    # GeoTIFF רב-ספקטרלי מסווג בכללים הרב-ספקטרליים
+    image = load_raster(input_path, max_size)
+    if image is None:
+        return None
+
+    classification = classify_image(image)
+
+    # גודל הפיקסל שהוזן מתייחס לקובץ המקורי, לפני שינוי הגודל
+    if gsd_m is not None:
+        source_size = read_image_size(input_path) or image.shape[:2]
+        gsd_m = gsd_m * max(source_size) / max(classification.shape)
+
+    # התאמת ה-transform לגודל לאחר שינוי הגודל
+    georef = read_georeference(input_path)
+    if georef is not None:
+        georef = scale_georeference(georef, classification.shape[1], classification.shape[0])
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        write_class_raster(classification, output_path, georef)
+
+    row = {
+        'file': input_path,
+        'width': int(classification.shape[1]),
+        'height': int(classification.shape[0])
+    }
+    for class_name, class_stats in get_rgb_classification_stats(classification, georef, gsd_m).items():
+        row[f"{class_name}_pixels"] = class_stats['pixels']
+        row[f"{class_name}_percentage"] = class_stats['percentage']
+        row[f"{class_name}_area_km2"] = class_stats['area_km2']
+
+    return row
+
+def write_stats_table(rows: List[Dict], stats_path: str) -> None:
+    """
+    כתיבת טבלת הסטטיסטיקות - Parquet לפי סיומת הקובץ, אחרת CSV
+    """
+    table = pd.DataFrame(rows)
+
+    # עמודות מחלקה חסרות (מחלקה שלא הופיעה בקובץ) הן אפס פיקסלים
+    class_columns = [column for column in table.columns
+                     if column.endswith(('_pixels', '_percentage', '_area_km2'))]
+    table[class_columns] = table[class_columns].fillna(0)
+
+    if stats_path.lower().endswith('.parquet'):
+        table.to_parquet(stats_path, index=False)
+    else:
+        table.to_csv(stats_path, index=False)
+
+def run_batch(input_paths: Iterable[str],
+              output_dir: Optional[str] = None,
+              stats_path: Optional[str] = None,
+              workers: int = None,
+              max_size: int = None,
+              gsd_m: float = None) -> Dict:
+    """
+    סיווג רשימת קבצים במאגר תהליכים
+
+    Args:
+        input_paths: קבצי הקלט
+        output_dir: תיקייה למפות הסיווג (אופציונלי)
+        stats_path: קובץ טבלת הסטטיסטיקות - CSV או Parquet (אופציונלי)
+        workers: מספר תהליכי עבודה
+        max_size: גודל מקסימלי לצלע התמונה לפני הסיווג
+        gsd_m: גודל פיקסל בשטח במטרים לקבצים ללא התייחסות גיאוגרפית
+
+    Returns:
+        סיכום הריצה: שורות הסטטיסטיקה, כשלונות וקצבי עיבוד
+
+    Raises:
+        ValueError: התנגשות בנתיבי הפלט
+        ImportError: אין מנוע לכתיבת Parquet
+    """
+    input_paths = list(input_paths)
+    workers = get_worker_count(workers)
+
+    # בדיקות שנכשלות מוקדם, לפני שעבודת הסיווג הולכת לאיבוד
+    if stats_path:
+        check_stats_engine(stats_path)
+
+    output_paths = {}
+    if output_dir and input_paths:
+        output_paths = get_output_paths(input_paths, output_dir)
+
+    rows = []
+    failed = []
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        remaining = iter(input_paths)
+
+        def submit_next() -> bool:
+            path = next(remaining, None)
+            if path is None:
+                return False
+            pending[executor.submit(classify_file, path, output_paths.get(path), max_size, gsd_m)] = path
+            return True
+
+        # שמירת קבצים נוספים בתור, כדי שתהליך שמסיים יתחיל מיד לטעון את הבא
+        for _ in range(workers * config.BATCH_PREFETCH_FACTOR):
+            if not submit_next():
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    row = future.result()
+                except Exception as e:
+                    print(f"❌ Error processing {path}: {e}")
+                    row = None
+
+                if row is None:
+                    failed.append(path)
+                else:
+                    rows.append(row)
+
+                submit_next()
+
+    elapsed = time.perf_counter() - start_time
+
+    rows.sort(key=lambda row: row['file'])
+    if stats_path and rows:
+        write_stats_table(rows, stats_path)
+
+    megapixels = sum(row['width'] * row['height'] for row in rows) / 1e6
+
+    return {
+        'rows': rows,
+        'failed': failed,
+        'output_paths': output_paths,
+        'elapsed_seconds': elapsed,
+        'images_per_second': len(rows) / elapsed if elapsed > 0 else 0.0,
+        'megapixels_per_second': megapixels / elapsed if elapsed > 0 else 0.0
+    }
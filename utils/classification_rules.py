@@ -0,0 +1,153 @@
+"""
+מנוע כללי סיווג
+כללים הצהרתיים מ-config (מחלקה ורשימת תנאים "מאפיין אופרטור סף") מהודרים
+פעם אחת לכל הגדרת ספים, לשני יעדים:
+- מעריך NumPy שרץ על מקטע פיקסלים: כל השוואה נכתבת למאגר בוליאני בגודל
+  המקטע שממוחזר בין התנאים, ולא מוקצים מערכים זמניים בגודל התמונה
+- ביטויי ee.Image.expression לכל כלל, לשרשרת where בשרת Earth Engine
+כך ששינוי כלל או סף ב-config מגיע לשני המסלולים ללא עריכה ידנית
+"""
+
+import hashlib
+import json
+from numbers import Real
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import config
+
+# אופרטורי השוואה נתמכים - אותו סימון ב-NumPy וב-ee.Image.expression
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal
+}
+
+# כלל מפוענח: (מזהה מחלקה, [(מאפיין, אופרטור, ערך סף)])
+ResolvedRule = Tuple[int, List[Tuple[str, str, Real]]]
+
+def resolve_rules(rules: List, thresholds: Dict[str, Dict]) -> List[ResolvedRule]:
+    """
+    החלפת שמות המחלקות במזהים ושמות הספים בערכים מטבלת הספים
+
+    Raises:
+        ValueError: מחלקה, אופרטור או סף לא מוכרים
+    """
+    resolved = []
+    for class_name, conditions in rules:
+        if class_name not in config.LAND_USE_CLASSES:
+            raise ValueError(f"Unknown land use class in rule: {class_name}")
+        class_thresholds = thresholds.get(class_name, {})
+
+        resolved_conditions = []
+        for feature, op, value in conditions:
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator {op!r} in {class_name} rule")
+            if isinstance(value, str):
+                if value not in class_thresholds:
+                    raise ValueError(f"Unknown threshold {value!r} in {class_name} rule")
+                value = class_thresholds[value]
+            if not isinstance(value, Real):
+                raise ValueError(f"Threshold for {feature} in {class_name} rule is not a number: {value!r}")
+            resolved_conditions.append((feature, op, value))
+
+        resolved.append((config.LAND_USE_CLASSES[class_name]['id'], resolved_conditions))
+    return resolved
+
+def get_rules_fingerprint(rules: List, thresholds: Dict[str, Dict]) -> str:
+    """
+    טביעת אצבע של הכללים אחרי החלפת הספים - משתנה בכל שינוי בכלל או בסף
+    """
+    payload = json.dumps(resolve_rules(rules, thresholds))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def assign_class(out: np.ndarray, class_id: int, match: np.ndarray, scratch: np.ndarray) -> np.ndarray:
+    """
+    out[match] = class_id ללא הסתעפויות
+
+    np.copyto עם where מסתעף בכל פיקסל, ועל מסכה מפוזרת הוא איטי פי כמה;
+    כאן out ^= (out ^ class_id) * match - שלוש פעולות וקטוריות
+
+    Args:
+        out: מפת הסיווג (uint8)
+        class_id: מזהה המחלקה
+        match: מסכה בוליאנית באותו גודל
+        scratch: מאגר uint8 באותו גודל
+    """
+    np.bitwise_xor(out, np.uint8(class_id), out=scratch)
+    np.multiply(scratch, match.view(np.uint8), out=scratch)
+    np.bitwise_xor(out, scratch, out=out)
+    return out
+
+class CompiledRules:
+    """
+    מעריך כללים מהודר - מפעיל את כל הכללים על מקטע מאפיינים אחד
+    """
+
+    def __init__(self, rules: List[ResolvedRule]):
+        self.rules = [(class_id, [(feature, OPERATORS[op], value) for feature, op, value in conditions])
+                      for class_id, conditions in rules]
+        # המאפיינים שהכללים צריכים - כדי שהקורא יחשב רק אותם
+        self.features = sorted({feature for _, conditions in rules for feature, _, _ in conditions})
+
+    def evaluate(self, features: Dict[str, np.ndarray], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        סיווג מקטע - מזהה המחלקה של הכלל האחרון שמתקיים, או 0
+
+        Args:
+            features: מאפיינים בגודל המקטע (לפחות self.features)
+            out: מערך uint8 לתוצאה (אופציונלי)
+        """
+        shape = np.shape(features[self.features[0]]) if self.features else np.shape(out)
+        if out is None:
+            out = np.zeros(shape, dtype=np.uint8)
+        else:
+            out[...] = 0
+
+        # מאגרים בגודל המקטע לכל הכללים: התאמת הכלל, התנאי הנוכחי והשמת המחלקה
+        match = np.empty(shape, dtype=bool)
+        term = np.empty(shape, dtype=bool)
+        scratch = np.empty(shape, dtype=np.uint8)
+
+        for class_id, conditions in self.rules:
+            if not conditions:
+                match[...] = True
+            for i, (feature, compare, value) in enumerate(conditions):
+                if i == 0:
+                    compare(features[feature], value, out=match)
+                else:
+                    compare(features[feature], value, out=term)
+                    match &= term
+            assign_class(out, class_id, match, scratch)
+
+        return out
+
+# מעריכים מהודרים לפי הכללים המפוענחים - הידור מחדש רק כשכלל או סף משתנים
+_compiled: Dict[str, CompiledRules] = {}
+
+def get_compiled_rules(rules: List, thresholds: Dict[str, Dict]) -> CompiledRules:
+    """
+    המעריך המהודר להגדרת הכללים והספים הנוכחית
+    """
+    resolved = resolve_rules(rules, thresholds)
+    key = json.dumps(resolved)
+
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = CompiledRules(resolved)
+        _compiled[key] = compiled
+    return compiled
+
+def compile_ee_expressions(rules: List, thresholds: Dict[str, Dict]) -> List[Tuple[int, str, List[str]]]:
+    """
+    הידור הכללים לביטויי ee.Image.expression
+
+    Returns:
+        לכל כלל לפי הסדר: (מזהה מחלקה, ביטוי, שמות הערוצים שהביטוי משתמש בהם)
+    """
+    expressions = []
+    for class_id, conditions in resolve_rules(rules, thresholds):
+        expression = ' && '.join(f"{feature} {op} {value!r}" for feature, op, value in conditions) or '1'
+        bands = sorted({feature for feature, _, _ in conditions})
+        expressions.append((class_id, expression, bands))
+    return expressions
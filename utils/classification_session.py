@@ -0,0 +1,254 @@
+"""
+סיווג RGB אינטראקטיבי - סיווג מחדש מהיר כשסף משתנה
+מאפייני התמונה (ערוצים, HSV ואינדקסים) מחושבים פעם אחת ונשמרים כקודים
+קומפקטיים: כל מישור מאפיין הוא אינדקס (uint8/uint16) לספר קודים ממוין של
+הערכים האפשריים שלו. השוואה לסף מחושבת על ספר הקודים (מאות עד עשרות אלפי
+ערכים, באותה פעולה ובאותו dtype כמו ב-classify_rgb_image) והופכת להשוואה
+שלמה אחת על הקודים - התוצאה זהה פיקסל לפיקסל לסיווג המלא.
+תוצאות התנאים נשמרות כביטים: לכל כלל מישור uint8 שבו ביט לכל תנאי, ומישור
+אחד שבו ביט לכל כלל, שממופה למחלקה בטבלת חיפוש. כשסף משתנה מחושב מחדש רק
+התנאי שמשתמש בו, ואחריו עדכון שני ביטים וטבלת החיפוש.
+סשנים נשמרים במטמון LRU משותף לתהליך עם מגבלת נפח, לפי מפתח התוצאה,
+כך שה-session של Streamlit מחזיק את המפתח בלבד ולא את המישורים
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Union
+import cv2
+import numpy as np
+import config
+from utils.band_raster import BandRaster
+from utils.classification_rules import OPERATORS, resolve_rules
+from utils.image_processing import _channel_indices
+
+# טווח ExG (2g - r - b) בערוצי uint8 - ערכים שלמים בלבד
+EXG_MIN, EXG_MAX = -2 * 255, 2 * 255
+
+# מאפיינים שתלויים רק בזוג ערוצים - ספר הקודים מחושב על כל 65536 הצירופים
+PAIR_FEATURES = {'grvi': ('g', 'r')}
+
+# מספר כללים ותנאים לכלל מקסימלי - ביט לכל אחד במישור uint8
+MAX_BITS = 8
+
+class FeaturePlane:
+    """
+    מישור מאפיין - קודים לספר קודים ממוין, או הערכים עצמם כשאין ספר קודים
+    """
+
+    def __init__(self, codes: np.ndarray, codebook: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.codebook = codebook
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.codebook.nbytes if self.codebook is not None else 0)
+
+    def compare(self, op: str, value, out: np.ndarray) -> np.ndarray:
+        """
+        מסכת "מאפיין אופרטור סף" לכל הפיקסלים
+        """
+        compare = OPERATORS[op]
+        if self.codebook is None:
+            return compare(self.codes, value, out=out)
+
+        # ספר הקודים ממוין, ולכן התוצאה עליו מונוטונית: False...True עבור > ו->=,
+        # ו-True...False עבור < ו-<= - הסף על הקודים הוא מקום המעבר
+        passed = compare(self.codebook, value)
+        if op in ('>', '>='):
+            first = int(np.argmax(passed)) if passed.any() else len(passed)
+            return np.greater_equal(self.codes, first, out=out)
+        return np.less(self.codes, int(passed.sum()), out=out)
+
+class ClassificationSession:
+    """
+    סיווג חוזר של תמונה אחת בכללי RGB עם ספים משתנים
+    """
+
+    def __init__(self, image: Union[np.ndarray, BandRaster], rules: List = None):
+        self.rules = rules if rules is not None else config.RGB_CLASSIFICATION_RULES
+        self.shape = tuple(image.shape[:2])
+
+        # ערוצי הצבע כמישורי uint8 רציפים - הבסיס לכל המאפיינים
+        if isinstance(image, BandRaster):
+            self._channels = {key: image.get_uint8(name).reshape(self.shape)
+                              for key, name in zip('rgb', image.get_rgb_names())}
+        else:
+            self._channels = {key: np.ascontiguousarray(image[:, :, i]) for i, key in enumerate('rgb')}
+
+        self._features: Dict[str, FeaturePlane] = {}
+
+        # מבנה הכללים (מחלקה, מאפיין ואופרטור לכל תנאי) שהמישורים מחושבים לפיו
+        self._structure = None
+        # ערכי הסף שחושבו לכל תנאי בכל כלל
+        self._values: List[List] = []
+        # לכל כלל - מישור שבו ביט j מסמן שתנאי j מתקיים
+        self._condition_bits: List[np.ndarray] = []
+        # ביט i מסמן שכלל i מתקיים, וטבלת החיפוש ממפה את הביטים למחלקה
+        self._rule_bits = None
+        self._class_lookup = None
+        self._scratch = np.empty(self.shape, dtype=np.uint8)
+        # הסשן משותף בין משתמשים דרך המטמון - סיווג אחד בכל פעם
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """זיכרון הערוצים, המאפיינים ומישורי הביטים השמורים"""
+        planes = list(self._channels.values()) + self._condition_bits + [self._scratch]
+        if self._rule_bits is not None:
+            planes.append(self._rule_bits)
+        # מישורי r/g/b הם הערוצים עצמם - נספרים פעם אחת
+        features = [plane for name, plane in list(self._features.items()) if name not in self._channels]
+        return sum(plane.nbytes for plane in features) + sum(plane.nbytes for plane in planes)
+
+    def _compute_feature(self, name: str) -> FeaturePlane:
+        """חישוב מישור מאפיין בפורמט הקומפקטי"""
+        r, g, b = self._channels['r'], self._channels['g'], self._channels['b']
+
+        if name in ('r', 'g', 'b'):
+            return FeaturePlane(self._channels[name], np.arange(256, dtype=np.float32))
+
+        if name in ('hue', 'saturation', 'value'):
+            hsv = cv2.cvtColor(np.dstack((r, g, b)), cv2.COLOR_RGB2HSV)
+            for i, hsv_name in enumerate(('hue', 'saturation', 'value')):
+                self._features[hsv_name] = FeaturePlane(np.ascontiguousarray(hsv[:, :, i]),
+                                                        np.arange(256, dtype=np.uint8))
+            return self._features[name]
+
+        if name == 'exg':
+            # 2g - r - b שלם, ולכן הקוד הוא הערך בהזזה
+            codes = 2 * g.astype(np.int16) - r - b - EXG_MIN
+            return FeaturePlane(codes.astype(np.uint16), np.arange(EXG_MIN, EXG_MAX + 1, dtype=np.float32))
+
+        if name in PAIR_FEATURES:
+            # ערכי המאפיין לכל צירופי הזוג, באותו חישוב כמו בסיווג המלא
+            first, second = PAIR_FEATURES[name]
+            pairs = np.arange(256 * 256)
+            values = {first: (pairs >> 8).astype(np.float32), second: (pairs & 0xFF).astype(np.float32)}
+            table = _channel_indices(values.get('r', 0), values.get('g', 0), values.get('b', 0), (name,))[name]
+            codebook, inverse = np.unique(table, return_inverse=True)
+            lookup = inverse.astype(np.uint16)
+            pair_codes = (self._channels[first].astype(np.uint16) << 8) | self._channels[second]
+            return FeaturePlane(lookup[pair_codes], codebook)
+
+        # מאפיין שתלוי בשלושת הערוצים - הערכים עצמם ב-float32
+        channels = {key: plane.astype(np.float32) for key, plane in self._channels.items()}
+        return FeaturePlane(_channel_indices(channels['r'], channels['g'], channels['b'], (name,))[name])
+
+    def get_feature(self, name: str) -> FeaturePlane:
+        """מישור מאפיין - מחושב בשימוש הראשון ונשמר"""
+        if name not in self._features:
+            self._features[name] = self._compute_feature(name)
+        return self._features[name]
+
+    def _set_bit(self, plane: np.ndarray, bit: int, mask: np.ndarray) -> None:
+        """עדכון ביט אחד במישור לפי מסכה בוליאנית"""
+        np.bitwise_and(plane, np.uint8(~(1 << bit) & 0xFF), out=plane)
+        np.left_shift(mask.view(np.uint8), bit, out=self._scratch)
+        np.bitwise_or(plane, self._scratch, out=plane)
+
+    def _reset(self, resolved) -> None:
+        """התחלה מחדש כשמבנה הכללים השתנה (ולא רק ערכי הסף)"""
+        if len(resolved) > MAX_BITS or any(len(conditions) > MAX_BITS for _, conditions in resolved):
+            raise ValueError(f"Interactive classification supports up to {MAX_BITS} rules "
+                             f"and {MAX_BITS} conditions per rule")
+
+        self._structure = [(class_id, [(feature, op) for feature, op, _ in conditions])
+                           for class_id, conditions in resolved]
+        self._values = [[None] * len(conditions) for _, conditions in resolved]
+        self._condition_bits = [np.zeros(self.shape, dtype=np.uint8) for _ in resolved]
+        self._rule_bits = np.zeros(self.shape, dtype=np.uint8)
+
+        # הכלל האחרון שמתקיים קובע את המחלקה - כמו סדר ה-where בשרת
+        self._class_lookup = np.zeros(256, dtype=np.uint8)
+        for bits in range(1, 1 << len(resolved)):
+            self._class_lookup[bits] = resolved[bits.bit_length() - 1][0]
+
+    def classify(self, thresholds: Dict[str, Dict] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        סיווג בספים הנתונים - רק תנאים שהסף שלהם השתנה מחושבים מחדש
+
+        Args:
+            thresholds: טבלת ספים כמו config.RGB_CLASSIFICATION_THRESHOLDS (ברירת מחדל: מ-config)
+            out: מערך uint8 בגודל (גובה, רוחב) לתוצאה (אופציונלי)
+        """
+        if thresholds is None:
+            thresholds = config.RGB_CLASSIFICATION_THRESHOLDS
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+
+        resolved = resolve_rules(self.rules, thresholds)
+        with self._lock:
+            return self._classify(resolved, out)
+
+    def _classify(self, resolved, out: np.ndarray) -> np.ndarray:
+        """הערכת הכללים המפוענחים - נקרא תחת נעילת הסשן"""
+        structure = [(class_id, [(feature, op) for feature, op, _ in conditions])
+                     for class_id, conditions in resolved]
+        if structure != self._structure:
+            self._reset(resolved)
+
+        match = np.empty(self.shape, dtype=bool)
+        for i, (_, conditions) in enumerate(resolved):
+            changed = False
+            for j, (feature, op, value) in enumerate(conditions):
+                if self._values[i][j] == value:
+                    continue
+                self.get_feature(feature).compare(op, value, out=match)
+                self._set_bit(self._condition_bits[i], j, match)
+                self._values[i][j] = value
+                changed = True
+
+            if changed:
+                # הכלל מתקיים כשכל ביטי התנאים שלו דולקים
+                np.equal(self._condition_bits[i], (1 << len(conditions)) - 1, out=match)
+                self._set_bit(self._rule_bits, i, match)
+
+        return cv2.LUT(self._rule_bits, self._class_lookup, dst=out)
+
+# מטמון הסשנים - משותף לכל המשתמשים של תהליך Streamlit
+_sessions: "OrderedDict[str, ClassificationSession]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def get_classification_session(key: str,
+                               build: Callable[[], Optional[ClassificationSession]]) -> Optional[ClassificationSession]:
+    """
+    סשן סיווג לפי מפתח (למשל מפתח התוצאה) מהמטמון, או בנייה ושמירה שלו
+
+    המאפיינים מחושבים בשימוש, ולכן הנפח נבדק מחדש בכל גישה ומפונים הסשנים
+    שלא נגישו זמן רב ביותר עד config.CLASSIFICATION_SESSION_CACHE_BYTES.
+    הסשן המבוקש לא מפונה בגישה שלו
+
+    Args:
+        key: מפתח המטמון
+        build: בניית הסשן כשאינו במטמון (None - אין סשן לשמור)
+    """
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is not None:
+            _sessions.move_to_end(key)
+
+    if session is None:
+        session = build()
+        if session is None:
+            return None
+        with _sessions_lock:
+            session = _sessions.setdefault(key, session)
+            _sessions.move_to_end(key)
+
+    with _sessions_lock:
+        total = sum(cached.nbytes for cached in _sessions.values())
+        while total > config.CLASSIFICATION_SESSION_CACHE_BYTES and len(_sessions) > 1:
+            evicted_key, evicted = next(iter(_sessions.items()))
+            if evicted_key == key:
+                break
+            del _sessions[evicted_key]
+            total -= evicted.nbytes
+    return session
+
+def clear_session_cache() -> None:
+    """
+    ריקון מטמון הסשנים
+    """
+    with _sessions_lock:
+        _sessions.clear()
@@ -0,0 +1,195 @@
+"""
+קומפוזיט חציוני מקומי לערימות סצנות
+מקבילה מקומית ל-image_collection.median() בשרת: הסצנות נקראות אריח אחר
+אריח, פיקסלים מעוננים ממוסכים לפי SCL או QA60, והחציון מחושב לכל פיקסל
+על התצפיות הנקיות. גודל האריח נקבע לפי מספר הסצנות (ערימה, מסכות ופלט),
+כך שהזיכרון חסום ב-config.COMPOSITE_MAX_BYTES ולא תלוי בגודל הסצנה; ערימה
+עמוקה מדי גם לאריח המינימלי נדחית ולא חורגת מהמגבלה
+"""
+
+import os
+import tempfile
+import warnings
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+import config
+from utils.spectral_classification import get_band_indexes, classify_multispectral_geotiff
+from utils.tiled_processing import iter_tile_windows
+
+# מספר העתקים של ערימת ערוץ בזיכרון בזמן חישוב החציון (ערימה + מיון פנימי)
+MEDIAN_WORKING_COPIES = 3
+
+# צלע האריח המינימלית - מתחתיה התקורה של קריאת החלונות שולטת
+MIN_COMPOSITE_TILE_SIZE = 16
+
+def get_composite_pixel_bytes(scene_count: int) -> int:
+    """
+    זיכרון לפיקסל בחלון ב-median_composite_window: ערימת ערוץ אחד בזמן החציון,
+    מסכה לכל סצנה, פלט הקומפוזיט, ומסכות הקריאה של סצנה אחת בכל פעם
+    """
+    float_bytes = np.dtype(np.float32).itemsize
+    band_count = len(config.MODEL_BANDS)
+
+    band_stack = scene_count * float_bytes * MEDIAN_WORKING_COPIES
+    masks = scene_count * np.dtype(bool).itemsize
+    composite = band_count * float_bytes
+    # מסכות nodata של ערוצי המודל (uint8 והמרה ל-bool) וערוץ QA60 כ-uint32
+    reading = band_count * 2 + np.dtype(np.uint32).itemsize
+    return band_stack + masks + composite + reading
+
+def get_composite_tile_size(scene_count: int, max_bytes: int = None) -> int:
+    """
+    צלע האריח כך שכל הזיכרון של חלון (get_composite_pixel_bytes) נכנס במגבלה
+
+    Raises:
+        ValueError: גם האריח המינימלי חורג מהמגבלה (ערימה עמוקה מדי)
+    """
+    if max_bytes is None:
+        max_bytes = config.COMPOSITE_MAX_BYTES
+
+    pixel_bytes = get_composite_pixel_bytes(scene_count)
+    min_bytes = MIN_COMPOSITE_TILE_SIZE * MIN_COMPOSITE_TILE_SIZE * pixel_bytes
+    if min_bytes > max_bytes:
+        raise ValueError(f"A {MIN_COMPOSITE_TILE_SIZE}x{MIN_COMPOSITE_TILE_SIZE} composite window over "
+                         f"{scene_count} scenes needs {min_bytes} bytes, above the {max_bytes} byte limit")
+    return min(config.TILE_SIZE, int(np.sqrt(max_bytes / pixel_bytes)))
+
+def get_cloud_mask(src, window: Window, descriptions: List[Optional[str]]) -> np.ndarray:
+    """
+    מסכת עננים לחלון - True בפיקסל מעונן, לפי ערוץ SCL או QA60 אם קיים בסצנה
+    """
+    descriptions = [description.upper() if description else None for description in descriptions]
+
+    if 'SCL' in descriptions:
+        scl = src.read(descriptions.index('SCL') + 1, window=window)
+        return np.isin(scl, config.COMPOSITE_SCL_CLOUD_CLASSES)
+
+    if 'QA60' in descriptions:
+        qa = src.read(descriptions.index('QA60') + 1, window=window).astype(np.uint32)
+        cloud_bits = sum(1 << bit for bit in config.COMPOSITE_QA60_CLOUD_BITS)
+        return (qa & cloud_bits) != 0
+
+    return np.zeros((int(window.height), int(window.width)), dtype=bool)
+
+def _open_aligned(stack: ExitStack, path: str, reference) -> Dict:
+    """
+    פתיחת סצנה מיושרת לרשת של סצנת הייחוס (WarpedVRT אם הרשת שונה)
+    """
+    src = stack.enter_context(rasterio.open(path))
+    scene = {'band_indexes': get_band_indexes(src), 'descriptions': list(src.descriptions)}
+
+    if (src.crs == reference.crs and src.transform == reference.transform
+            and src.width == reference.width and src.height == reference.height):
+        scene['dataset'] = src
+    else:
+        scene['dataset'] = stack.enter_context(WarpedVRT(
+            src, crs=reference.crs, transform=reference.transform,
+            width=reference.width, height=reference.height,
+            resampling=Resampling.nearest
+        ))
+    return scene
+
+def median_composite_window(scenes: List[Dict], window: Window) -> np.ndarray:
+    """
+    חציון לכל פיקסל על התצפיות הנקיות בחלון, ערוץ אחר ערוץ
+
+    Returns:
+        מערך float32 (ערוצים, גובה, רוחב) עם NaN בפיקסלים ללא תצפית נקייה
+    """
+    height, width = int(window.height), int(window.width)
+    band_count = len(config.MODEL_BANDS)
+
+    # מסכה לכל סצנה פעם אחת: nodata של ערוצי המודל או ענן
+    masks = []
+    for scene in scenes:
+        dataset = scene['dataset']
+        nodata = ~dataset.read_masks(scene['band_indexes'], window=window).astype(bool)
+        masks.append(nodata.any(axis=0) | get_cloud_mask(dataset, window, scene['descriptions']))
+
+    composite = np.empty((band_count, height, width), dtype=np.float32)
+    band_stack = np.empty((len(scenes), height, width), dtype=np.float32)
+
+    for band in range(band_count):
+        for i, scene in enumerate(scenes):
+            band_stack[i] = scene['dataset'].read(scene['band_indexes'][band], window=window)
+            band_stack[i][masks[i]] = np.nan
+
+        with warnings.catch_warnings():
+            # פיקסל ללא אף תצפית נקייה נשאר NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            composite[band] = np.nanmedian(band_stack, axis=0)
+
+    return composite
+
+def composite_scenes(scene_paths: List[str], output_path: str,
+                     max_bytes: int = None) -> Optional[str]:
+    """
+    קומפוזיט חציוני של ערימת סצנות לקובץ GeoTIFF בערוצי MODEL_BANDS
+
+    Args:
+        scene_paths: קבצי הסצנות - הרשת של הראשון היא רשת הפלט
+        output_path: קובץ הקומפוזיט (float32, NaN כ-nodata)
+        max_bytes: מגבלת זיכרון לחלון (ערימה, מסכות ופלט)
+
+    Returns:
+        נתיב הקומפוזיט, או None אם נכשל
+    """
+    try:
+        with ExitStack() as stack:
+            reference = stack.enter_context(rasterio.open(scene_paths[0]))
+            scenes = [_open_aligned(stack, path, reference) for path in scene_paths]
+            block_size = config.OUTPUT_BLOCK_SIZE
+            # ערימה שלא נכנסת במגבלה נדחית לפני יצירת קובץ הפלט
+            tile_size = get_composite_tile_size(len(scenes), max_bytes)
+
+            with rasterio.open(
+                output_path, 'w',
+                driver='GTiff',
+                width=reference.width,
+                height=reference.height,
+                count=len(config.MODEL_BANDS),
+                dtype='float32',
+                nodata=np.nan,
+                crs=reference.crs,
+                transform=reference.transform,
+                tiled=True,
+                blockxsize=block_size,
+                blockysize=block_size,
+                compress='deflate'
+            ) as dst:
+                for band, name in enumerate(config.MODEL_BANDS, start=1):
+                    dst.set_band_description(band, name)
+
+                for window in iter_tile_windows(dst, tile_size):
+                    dst.write(median_composite_window(scenes, window), window=window)
+
+        return output_path
+
+    except Exception as e:
+        print(f"❌ Error compositing scenes: {e}")
+        return None
+
+def classify_scene_stack(scene_paths: List[str],
+                         output_path: Optional[str] = None,
+                         composite_path: Optional[str] = None,
+                         max_bytes: int = None) -> Optional[Dict]:
+    """
+    קומפוזיט חציוני וסיווג מקומי של ערימת סצנות - המקבילה המקומית ל-analyze_region
+
+    Args:
+        output_path: קובץ COG למפת הסיווג (אופציונלי)
+        composite_path: שמירת הקומפוזיט (אופציונלי, אחרת קובץ זמני)
+
+    Returns:
+        סטטיסטיקות סיווג, או None אם נכשל
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = composite_path or os.path.join(tmp_dir, 'composite.tif')
+        if composite_scenes(scene_paths, path, max_bytes) is None:
+            return None
+        return classify_multispectral_geotiff(path, output_path)
@@ -3,10 +3,25 @@
 מכיל פונקציות לעיבוד תמונות לוויין וסיווג שטח
 """
 
-import ee
-import numpy as np
-from typing import Dict, List, Tuple, Optional
+import json
+from typing import Any, Callable, Dict, List, Tuple, Optional
 import config
+from utils.classification_rules import compile_ee_expressions, get_rules_fingerprint
+from utils.ee_cache import RequestCache, normalize_request, make_request_key
+from utils.ee_executor import EERequestExecutor
+from utils.lazy_import import lazy_module
+from utils.profiling import profiled
+
+# earthengine-api ו-pandas נטענים רק בשימוש הראשון - ייבוא המודול לא מאט את עליית האפליקציה
+ee = lazy_module('ee')
+pd = lazy_module('pandas')
+
+# גרסת אלגוריתם הסיווג - יש להעלות בכל שינוי לוגי ב-classify_land_use
+EE_CLASSIFIER_VERSION = 1
+
+# מטמון בקשות ומנהל הרצה משותפים, נוצרים בשימוש הראשון
+_request_cache: Optional[RequestCache] = None
+_request_executor: Optional[EERequestExecutor] = None
 
 def initialize_ee(service_account_file: Optional[str] = None):
     """
@@ -24,10 +39,12 @@ def initialize_ee(service_account_file: Optional[str] = None):
         print(f"❌ Failed to initialize Earth Engine: {e}")
         return False
 
+@profiled('ee.satellite_image')
 def get_satellite_image(bounds: List[float], 
                        date_start: str, 
                        date_end: str, 
-                       collection: str = 'sentinel2') -> ee.Image:
+                       collection: str = 'sentinel2',
+                       cloud_cover: float = 20) -> 'ee.Image':
     """
     קבלת תמונת לוויין עבור אזור ותאריך נתונים
     
@@ -36,6 +53,7 @@ def get_satellite_image(bounds: List[float],
         date_start: תאריך התחלה 'YYYY-MM-DD'
         date_end: תאריך סיום 'YYYY-MM-DD'
         collection: סוג אוסף לוויין
+        cloud_cover: אחוז כיסוי עננים מקסימלי
     """
     try:
         # יצירת גיאומטריה מהגבולות
@@ -48,7 +66,7 @@ def get_satellite_image(bounds: List[float],
         image_collection = (ee.ImageCollection(collection_id)
                            .filterBounds(roi)
                            .filterDate(date_start, date_end)
-                           .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)))
+                           .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover)))
         
         # חישוב חציון לתמונה נקייה
         image = image_collection.median().clip(roi)
@@ -59,7 +77,7 @@ def get_satellite_image(bounds: List[float],
         print(f"❌ Error getting satellite image: {e}")
         return None
 
-def calculate_indices(image: ee.Image) -> ee.Image:
+def calculate_indices(image: 'ee.Image') -> 'ee.Image':
     """
     חישוב אינדקסים ספקטרליים לסיווג שטח
     """
@@ -90,37 +108,27 @@ def calculate_indices(image: ee.Image) -> ee.Image:
         print(f"❌ Error calculating indices: {e}")
         return image
 
-def classify_land_use(image: ee.Image) -> ee.Image:
+@profiled('ee.classify')
+def classify_land_use(image: 'ee.Image') -> 'ee.Image':
     """
     סיווג שימושי קרקע בהתבסס על אינדקסים ספקטרליים
+    
+    כל כלל ב-config.SPECTRAL_CLASSIFICATION_RULES מהודר לביטוי ee.Image.expression,
+    והכללים מוחלים בשרשרת where לפי הסדר - כלל מאוחר גובר, ותנאי ממוסך לא משנה את הפיקסל
     """
     try:
         # חישוב אינדקסים
         image_with_indices = calculate_indices(image)
         
-        # הגדרת תנאים לסיווג
-        # יער - NDVI גבוה
-        forest = (image_with_indices.select('NDVI').gt(0.6)
-                 .And(image_with_indices.select('EVI').gt(0.3)))
+        expressions = compile_ee_expressions(config.SPECTRAL_CLASSIFICATION_RULES,
+                                             config.SPECTRAL_CLASSIFICATION_THRESHOLDS)
         
-        # חקלאות - NDVI בינוני עד גבוה
-        agriculture = (image_with_indices.select('NDVI').gt(0.3)
-                      .And(image_with_indices.select('NDVI').lt(0.6))
-                      .And(image_with_indices.select('EVI').gt(0.2)))
-        
-        # עירוני - NDBI גבוה, NDVI נמוך
-        urban = (image_with_indices.select('NDBI').gt(0.1)
-                .And(image_with_indices.select('NDVI').lt(0.3)))
-        
-        # מים - MNDWI גבוה
-        water = image_with_indices.select('MNDWI').gt(0.3)
-        
-        # יצירת מפת סיווג
-        classification = (ee.Image(0)  # רקע
-                         .where(agriculture, 1)  # חקלאות
-                         .where(urban, 2)        # עירוני
-                         .where(forest, 3)       # יער
-                         .where(water, 4))       # מים
+        # יצירת מפת סיווג - רקע 0
+        classification = ee.Image(0)
+        for class_id, expression, bands in expressions:
+            condition = image_with_indices.expression(
+                expression, {band: image_with_indices.select(band) for band in bands})
+            classification = classification.where(condition, class_id)
         
         return classification.rename('classification')
         
@@ -128,28 +136,151 @@ def classify_land_use(image: ee.Image) -> ee.Image:
         print(f"❌ Error in land use classification: {e}")
         return None
 
-def get_classification_stats(classification: ee.Image, 
-                           geometry: ee.Geometry) -> Dict:
+@profiled('ee.stats')
+def get_classification_stats(classification: 'ee.Image', 
+                           geometry: 'ee.Geometry') -> Dict:
     """
     חישוב סטטיסטיקות של הסיווג
+    
+    הקריאה עוברת דרך מנהל ההרצה המשותף (הגבלת קצב וניסיונות חוזרים);
+    שגיאה שלא נפתרה מועברת לקורא
     """
-    try:
-        # חישוב שטח כל קטגוריה
-        pixel_count = classification.reduceRegion(
+    # חישוב שטח כל קטגוריה
+    pixel_count = classification.reduceRegion(
+        reducer=ee.Reducer.frequencyHistogram(),
+        geometry=geometry,
+        scale=config.EE_SCALE,
+        maxPixels=config.EE_MAX_PIXELS
+    )
+    
+    return get_request_executor().submit(pixel_count.getInfo, name='reduceRegion').result()
+
+def regions_to_features(regions) -> List[Dict]:
+    """
+    המרת אזורים ל-GeoJSON features ב-EPSG:4326 - FeatureCollection, רשימת features או GeoDataFrame
+    """
+    if hasattr(regions, 'to_crs'):
+        # GeoDataFrame
+        if regions.crs is not None:
+            regions = regions.to_crs(epsg=4326)
+        regions = regions.__geo_interface__
+    
+    if isinstance(regions, dict):
+        return list(regions.get('features', []))
+    return list(regions)
+
+def chunk_features(features: List[Dict],
+                   max_features: int = None,
+                   max_payload_bytes: int = None) -> List[List[Dict]]:
+    """
+    חלוקת features למקטעים, כך שכל בקשה נשארת מתחת למגבלת המספר והגודל
+    """
+    if max_features is None:
+        max_features = config.EE_BATCH_MAX_FEATURES
+    if max_payload_bytes is None:
+        max_payload_bytes = config.EE_BATCH_MAX_PAYLOAD_BYTES
+    
+    chunks = []
+    current = []
+    current_bytes = 0
+    
+    for feature in features:
+        feature_bytes = len(json.dumps(feature['geometry']))
+        
+        if current and (len(current) >= max_features or current_bytes + feature_bytes > max_payload_bytes):
+            chunks.append(current)
+            current = []
+            current_bytes = 0
+        
+        current.append(feature)
+        current_bytes += feature_bytes
+    
+    if current:
+        chunks.append(current)
+    
+    return chunks
+
+def histograms_to_table(region_histograms: List[Tuple[Any, Dict]]) -> 'pd.DataFrame':
+    """
+    המרת היסטוגרמות מחלקה לכל אזור לטבלה מסודרת - שורה לכל (אזור, מחלקה)
+    """
+    class_names = {info['id']: key for key, info in config.LAND_USE_CLASSES.items()}
+    pixel_area_km2 = config.EE_SCALE ** 2 / 1e6
+    
+    rows = []
+    for region_id, histogram in region_histograms:
+        histogram = histogram or {}
+        total = sum(histogram.values())
+        
+        for class_key, count in sorted(histogram.items(), key=lambda item: int(float(item[0]))):
+            class_id = int(float(class_key))
+            rows.append({
+                'region_id': region_id,
+                'class_id': class_id,
+                'class_name': class_names.get(class_id, 'other'),
+                'pixels': count,
+                'percentage': round(count / total * 100, 2) if total else 0.0,
+                'area_km2': round(count * pixel_area_km2, 4)
+            })
+    
+    return pd.DataFrame(rows, columns=['region_id', 'class_id', 'class_name',
+                                       'pixels', 'percentage', 'area_km2'])
+
+@profiled('ee.stats_batch')
+def get_classification_stats_batch(classification: 'ee.Image',
+                                   regions,
+                                   id_property: str = 'id') -> Tuple['pd.DataFrame', List[Any]]:
+    """
+    חישוב סטטיסטיקות סיווג לאזורים רבים בקריאת reduceRegions אחת לכל מקטע
+    
+    Args:
+        classification: מפת הסיווג
+        regions: GeoJSON FeatureCollection, רשימת features או GeoDataFrame
+        id_property: שם התכונה המזהה את האזור (ברירת מחדל: מספר סידורי)
+    
+    Returns:
+        טבלה עם שורה לכל (אזור, מחלקה), ורשימת מזהי האזורים שהמקטע שלהם נכשל
+    """
+    features = regions_to_features(regions)
+    
+    # מזהה יציב לכל אזור, כדי לשייך את התוצאות גם אם הסדר משתנה
+    tagged = []
+    for index, feature in enumerate(features):
+        properties = feature.get('properties') or {}
+        region_id = properties.get(id_property, index)
+        tagged.append({'type': 'Feature', 'geometry': feature['geometry'],
+                       'properties': {'region_id': region_id}})
+    
+    # המקטעים נשלחים במקביל, עם הגבלת קצב וניסיונות חוזרים
+    executor = get_request_executor()
+    submitted = []
+    for index, chunk in enumerate(chunk_features(tagged)):
+        reduced = classification.reduceRegions(
+            collection=ee.FeatureCollection(chunk),
             reducer=ee.Reducer.frequencyHistogram(),
-            geometry=geometry,
-            scale=config.EE_SCALE,
-            maxPixels=config.EE_MAX_PIXELS
+            scale=config.EE_SCALE
         )
+        submitted.append((chunk, executor.submit(reduced.getInfo, name=f"reduceRegions[{index}]")))
+    
+    # מקטע שנכשל לא מבטל את האחרים - האזורים שלו מדווחים בנפרד
+    region_histograms = []
+    failed_region_ids = []
+    for chunk, future in submitted:
+        try:
+            reduced = future.result()
+        except Exception as e:
+            print(f"❌ Error calculating batch classification stats: {e}")
+            failed_region_ids.extend(feature['properties']['region_id'] for feature in chunk)
+            continue
         
-        return pixel_count.getInfo()
-        
-    except Exception as e:
-        print(f"❌ Error calculating classification stats: {e}")
-        return {}
+        for feature in reduced['features']:
+            properties = feature['properties']
+            region_histograms.append((properties['region_id'], properties.get('histogram')))
+    
+    return histograms_to_table(region_histograms), failed_region_ids
 
-def export_classification(classification: ee.Image, 
-                         geometry: ee.Geometry,
+def export_classification(classification: 'ee.Image', 
+                         geometry: 'ee.Geometry',
                          filename: str) -> str:
     """
     ייצוא תוצאות הסיווג
@@ -171,4 +302,77 @@ def export_classification(classification: ee.Image,
         
     except Exception as e:
         print(f"❌ Error exporting classification: {e}")
-        return f"Export failed: {e}" 
\ No newline at end of file
+        return f"Export failed: {e}"
+
+def get_request_executor() -> EERequestExecutor:
+    """
+    מנהל ההרצה המשותף לבקשות Earth Engine
+    """
+    global _request_executor
+    if _request_executor is None:
+        _request_executor = EERequestExecutor()
+    return _request_executor
+
+def get_request_cache() -> RequestCache:
+    """
+    מטמון הבקשות המשותף (בדיסק, לפי הגדרות המערכת)
+    """
+    global _request_cache
+    if _request_cache is None:
+        _request_cache = RequestCache()
+    return _request_cache
+
+@profiled('ee.analyze_region')
+def analyze_region(bounds: List[float],
+                   date_start: str,
+                   date_end: str,
+                   collection: str = 'sentinel2',
+                   cloud_cover: float = 20) -> Dict:
+    """
+    ניתוח אזור מלא - תמונת לוויין, סיווג וסטטיסטיקות
+    
+    Returns:
+        היסטוגרמת המחלקות באזור
+    
+    Raises:
+        RuntimeError: אם בניית תמונת הלוויין או הסיווג נכשלה; שגיאות
+        Earth Engine בחישוב הסטטיסטיקות מועברות כפי שהן
+    """
+    satellite_image = get_satellite_image(bounds, date_start, date_end, collection, cloud_cover)
+    if satellite_image is None:
+        raise RuntimeError(f"Could not build satellite image for {collection}")
+    
+    classification = classify_land_use(satellite_image)
+    if classification is None:
+        raise RuntimeError("Could not classify satellite image")
+    
+    return get_classification_stats(classification, ee.Geometry.Rectangle(bounds))
+
+def analyze_region_cached(bounds: List[float],
+                          date_start: str,
+                          date_end: str,
+                          collection: str = 'sentinel2',
+                          cloud_cover: float = 20,
+                          cache: Optional[RequestCache] = None,
+                          analyze: Callable[..., Dict] = None) -> Dict:
+    """
+    ניתוח אזור דרך מטמון הבקשות - בקשה זהה לא יוצאת שוב ל-Earth Engine
+    
+    Args:
+        cache: מטמון לשימוש (ברירת מחדל: המטמון המשותף)
+        analyze: פונקציית הניתוח (ברירת מחדל: analyze_region) - ניתנת להחלפה בבדיקות
+    """
+    if cache is None:
+        cache = get_request_cache()
+    if analyze is None:
+        analyze = analyze_region
+    
+    # הגרסה כוללת את טביעת האצבע של הכללים - שינוי סף לא מחזיר תוצאה ישנה מהמטמון
+    version = f"{EE_CLASSIFIER_VERSION}:" + get_rules_fingerprint(config.SPECTRAL_CLASSIFICATION_RULES,
+                                                                   config.SPECTRAL_CLASSIFICATION_THRESHOLDS)
+    request = normalize_request(bounds, date_start, date_end, collection, cloud_cover, version)
+    
+    return cache.get_or_compute(
+        make_request_key(request),
+        lambda: analyze(request['bounds'], request['dates'][0], request['dates'][1], collection, cloud_cover)
+    )
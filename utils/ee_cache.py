@@ -0,0 +1,175 @@
+"""
+מטמון בקשות Google Earth Engine
+תוצאות ניתוח (שמתקבלות ב-getInfo חוסם) נשמרות לפי מפתח מנורמל של
+גבולות, טווח תאריכים, אוסף, סף עננים וגרסת הסיווג, עם תפוגה (TTL)
+ופינוי לפי מספר רשומות. האחסון עצמו הוא backend נפרד וניתן להחלפה
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import config
+
+def normalize_request(bounds: List[float], date_start: str, date_end: str,
+                      collection: str, cloud_cover: float, version: Union[int, str]) -> Dict:
+    """
+    נרמול פרמטרי בקשה כך שבקשות שקולות יקבלו אותו מפתח
+    """
+    collection_id = config.SATELLITE_COLLECTIONS.get(collection, collection)
+    return {
+        'bounds': [round(float(value), config.EE_CACHE_COORD_DECIMALS) for value in bounds],
+        'dates': [str(date_start)[:10], str(date_end)[:10]],
+        'collection': collection_id,
+        'cloud_cover': round(float(cloud_cover), 2),
+        'version': version
+    }
+
+def make_request_key(request: Dict) -> str:
+    """
+    מפתח מטמון מבקשה מנורמלת
+    """
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+class MemoryCacheBackend:
+    """
+    אחסון בזיכרון התהליך
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """רשומה (זמן יצירה, ערך) או None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, created: float, value: Any) -> None:
+        """שמירת רשומה"""
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+
+    def delete(self, key: str) -> None:
+        """מחיקת רשומה"""
+        self._entries.pop(key, None)
+
+    def keys_by_access(self) -> List[str]:
+        """מפתחות מהישן לחדש לפי גישה אחרונה"""
+        return list(self._entries)
+
+class DiskCacheBackend:
+    """
+    אחסון בקבצי JSON בדיסק המקומי - נשמר בין הפעלות של האפליקציה
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, 'ee_requests')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """רשומה (זמן יצירה, ערך) או None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # עדכון זמן הגישה לטובת הפינוי
+            os.utime(path)
+            return entry['created'], entry['value']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Corrupt EE cache entry, ignoring: {e}")
+            return None
+
+    def set(self, key: str, created: float, value: Any) -> None:
+        """שמירת רשומה בכתיבה אטומית"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'created': created, 'value': value}, f)
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str) -> None:
+        """מחיקת רשומה"""
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def keys_by_access(self) -> List[str]:
+        """מפתחות מהישן לחדש לפי זמן גישה אחרון"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.cache_dir, name)), name[:-5]))
+            except OSError:
+                continue
+        return [key for _, key in sorted(entries)]
+
+class RequestCache:
+    """
+    מטמון בקשות עם תפוגה ופינוי מעל מספר רשומות מקסימלי
+    """
+
+    def __init__(self, backend=None, ttl_seconds: float = None, max_entries: int = None,
+                 clock: Callable[[], float] = time.time):
+        self.backend = backend if backend is not None else DiskCacheBackend()
+        self.ttl_seconds = config.EE_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = config.EE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        שליפת ערך בתוקף, או None אם חסר או שפג תוקפו
+        """
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry is None:
+                return None
+
+            created, value = entry
+            if self.clock() - created > self.ttl_seconds:
+                self.backend.delete(key)
+                return None
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        שמירת ערך ופינוי הרשומות שלא נגישו זמן רב ביותר מעבר למגבלה
+        """
+        with self._lock:
+            self.backend.set(key, self.clock(), value)
+
+            keys = self.backend.keys_by_access()
+            for old_key in keys[:max(0, len(keys) - self.max_entries)]:
+                self.backend.delete(old_key)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        החזרת ערך מהמטמון, או חישובו ושמירתו - תוצאות ריקות (כשלון) אינן נשמרות
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = compute()
+        if value:
+            try:
+                self.set(key, value)
+            except Exception as e:
+                print(f"⚠️ Could not save EE cache: {e}")
+        return value
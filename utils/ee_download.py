@@ -0,0 +1,280 @@
+"""
+הורדת פיקסלים מ-Google Earth Engine לאריחים מקומיים
+אזור העניין מחולק לרשת אריחים שכל אחד מהם נכנס במגבלת גודל הבקשה,
+האריחים מורדים במקביל דרך מנהל ההרצה המשותף (computePixels או
+getDownloadURL), נשמרים בדיסק לפי אריח ומורכבים למערך או ל-memmap
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import urllib.request
+from concurrent.futures import as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from rasterio.crs import CRS
+from rasterio.transform import Affine
+from rasterio.warp import transform_bounds
+import config
+from utils.raster_store import evict_files
+
+# מטרים למעלה קו רוחב/אורך בקו המשווה - להמרת scale למערכת גיאוגרפית
+METERS_PER_DEGREE = 111320.0
+
+def get_download_grid(bounds: List[float], scale_m: float = None, crs: str = 'EPSG:4326') -> Dict:
+    """
+    רשת הפיקסלים של אזור ההורדה במערכת היעד
+
+    Args:
+        bounds: [west, south, east, north] בקואורדינטות גיאוגרפיות
+        scale_m: גודל פיקסל במטרים
+        crs: מערכת הקואורדינטות של הפלט
+
+    Returns:
+        מילון עם crs, transform, width ו-height (כמו read_georeference)
+    """
+    if scale_m is None:
+        scale_m = config.EE_SCALE
+
+    target_crs = CRS.from_user_input(crs)
+    west, south, east, north = transform_bounds('EPSG:4326', target_crs, *bounds)
+    pixel_size = scale_m / METERS_PER_DEGREE if target_crs.is_geographic else scale_m
+
+    width = max(1, int(np.ceil((east - west) / pixel_size)))
+    height = max(1, int(np.ceil((north - south) / pixel_size)))
+
+    return {
+        'crs': target_crs,
+        'transform': Affine(pixel_size, 0, west, 0, -pixel_size, north),
+        'width': width,
+        'height': height
+    }
+
+def plan_download_tiles(grid: Dict, band_count: int = 1, bytes_per_pixel: int = 8,
+                        tile_pixels: int = None, max_bytes: int = None) -> List[Dict]:
+    """
+    חלוקת הרשת לאריחים - צלע האריח קטנה עד שהתגובה נכנסת במגבלת הגודל
+
+    Returns:
+        רשימת אריחים עם row, col (היסט בפיקסלים), width ו-height
+    """
+    if tile_pixels is None:
+        tile_pixels = config.EE_DOWNLOAD_TILE_PIXELS
+    if max_bytes is None:
+        max_bytes = config.EE_DOWNLOAD_MAX_BYTES
+
+    pixel_bytes = band_count * bytes_per_pixel
+    while tile_pixels > 1 and tile_pixels * tile_pixels * pixel_bytes > max_bytes:
+        tile_pixels //= 2
+
+    return [
+        {'row': row, 'col': col,
+         'width': min(tile_pixels, grid['width'] - col),
+         'height': min(tile_pixels, grid['height'] - row)}
+        for row in range(0, grid['height'], tile_pixels)
+        for col in range(0, grid['width'], tile_pixels)
+    ]
+
+def get_tile_request(grid: Dict, tile: Dict) -> Dict:
+    """
+    רשת הפיקסלים של אריח בודד בפורמט של computePixels
+    """
+    transform = grid['transform'] * Affine.translation(tile['col'], tile['row'])
+    return {
+        'dimensions': {'width': tile['width'], 'height': tile['height']},
+        'affineTransform': {
+            'scaleX': transform.a, 'shearX': transform.b, 'translateX': transform.c,
+            'shearY': transform.d, 'scaleY': transform.e, 'translateY': transform.f
+        },
+        'crsCode': grid['crs'].to_string()
+    }
+
+def structured_to_bands(data: np.ndarray) -> np.ndarray:
+    """
+    המרת מערך מובנה (שדה לכל ערוץ, כפי ש-Earth Engine מחזיר) למערך (ערוצים, גובה, רוחב)
+    """
+    if data.dtype.names is None:
+        return data if data.ndim == 3 else data[np.newaxis]
+    return np.stack([data[name] for name in data.dtype.names])
+
+def compute_pixels_tile(image, tile_request: Dict) -> np.ndarray:
+    """
+    הורדת אריח ב-ee.data.computePixels כמערך NumPy מובנה
+    """
+    import ee
+
+    return ee.data.computePixels({
+        'expression': image,
+        'fileFormat': 'NUMPY_NDARRAY',
+        'grid': tile_request
+    })
+
+def download_url_tile(image, tile_request: Dict) -> np.ndarray:
+    """
+    הורדת אריח דרך getDownloadURL בפורמט NPY - חלופה ל-computePixels
+    """
+    affine = tile_request['affineTransform']
+    url = image.getDownloadURL({
+        'format': 'NPY',
+        'crs': tile_request['crsCode'],
+        'crs_transform': [affine['scaleX'], affine['shearX'], affine['translateX'],
+                          affine['shearY'], affine['scaleY'], affine['translateY']],
+        'dimensions': f"{tile_request['dimensions']['width']}x{tile_request['dimensions']['height']}"
+    })
+    with urllib.request.urlopen(url) as response:
+        return np.load(io.BytesIO(response.read()), allow_pickle=False)
+
+def get_tile_cache_root() -> str:
+    """
+    תיקיית המטמון של כל אריחי ההורדה
+    """
+    return os.path.join(config.CACHE_DIR, 'ee_tiles')
+
+def get_tile_cache_dir(image, grid: Dict) -> str:
+    """
+    תיקיית המטמון של אריחי הורדה אחת - לפי הגדרת התמונה ברשת
+    """
+    payload = json.dumps({
+        'image': image.serialize(),
+        'crs': grid['crs'].to_string(),
+        'transform': list(grid['transform'])[:6],
+        'size': [grid['width'], grid['height']]
+    }, sort_keys=True)
+    key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return os.path.join(get_tile_cache_root(), key)
+
+def _get_tile_path(cache_dir: Optional[str], tile: Dict) -> Optional[str]:
+    """נתיב אריח במטמון, או None כשהמטמון כבוי"""
+    return os.path.join(cache_dir, f"{tile['row']}_{tile['col']}.npy") if cache_dir else None
+
+def _load_cached_tile(path: Optional[str]) -> Optional[np.ndarray]:
+    """
+    אריח מהמטמון בדיסק, או None אם לא נמצא
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        data = np.load(path, allow_pickle=False)
+        # עדכון זמן הגישה כדי שהפינוי יהיה לפי שימוש אחרון
+        os.utime(path)
+        return data
+    except Exception as e:
+        print(f"⚠️ Corrupt EE tile cache entry, ignoring: {e}")
+        return None
+
+def _fetch_tile(fetch: Callable, image, grid: Dict, tile: Dict, path: Optional[str]) -> np.ndarray:
+    """
+    הורדת אריח ושמירה אטומית במטמון
+    """
+    data = structured_to_bands(fetch(image, get_tile_request(grid, tile)))
+
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Could not save EE tile cache: {e}")
+
+    return data
+
+def download_image(image,
+                   grid: Dict,
+                   band_count: int = 1,
+                   bytes_per_pixel: int = 8,
+                   output_path: Optional[str] = None,
+                   fetch: Callable = None,
+                   executor=None,
+                   use_cache: bool = True) -> Tuple[np.ndarray, Dict]:
+    """
+    הורדת תמונת Earth Engine לרשת מקומית באריחים מקבילים
+
+    Args:
+        image: תמונת Earth Engine (או אובייקט עם serialize בבדיקות)
+        grid: רשת היעד (get_download_grid)
+        band_count, bytes_per_pixel: לחישוב גודל האריח מול מגבלת הבקשה
+        output_path: קובץ .npy לפסיפס כ-memmap (אופציונלי, אחרת מערך בזיכרון)
+        fetch: פונקציית הורדת אריח (image, tile_request) שמחזירה מערך מובנה - ברירת מחדל computePixels
+        executor: מנהל הרצה (ברירת מחדל: המשותף, עם הגבלת קצב וניסיונות חוזרים)
+        use_cache: שמירת האריחים בדיסק ושימוש חוזר בהם
+
+    Returns:
+        מערך (ערוצים, גובה, רוחב) והתייחסות גיאוגרפית של הרשת
+    """
+    if fetch is None:
+        fetch = compute_pixels_tile
+    if executor is None:
+        from utils.earth_engine_utils import get_request_executor
+        executor = get_request_executor()
+
+    tiles = plan_download_tiles(grid, band_count, bytes_per_pixel)
+    cache_dir = get_tile_cache_dir(image, grid) if use_cache else None
+
+    mosaic = None
+
+    def place(tile: Dict, data: np.ndarray) -> None:
+        nonlocal mosaic
+        # הקצאת הפסיפס לפי סוג הנתונים של האריח הראשון
+        if mosaic is None:
+            shape = (data.shape[0], grid['height'], grid['width'])
+            if output_path:
+                mosaic = np.lib.format.open_memmap(output_path, mode='w+', dtype=data.dtype, shape=shape)
+            else:
+                mosaic = np.empty(shape, dtype=data.dtype)
+
+        mosaic[:, tile['row']:tile['row'] + tile['height'], tile['col']:tile['col'] + tile['width']] = data
+
+    # אריחים שכבר במטמון לא צורכים אסימונים של הגבלת הקצב
+    futures = {}
+    for tile in tiles:
+        path = _get_tile_path(cache_dir, tile)
+        data = _load_cached_tile(path)
+        if data is not None:
+            place(tile, data)
+        else:
+            futures[executor.submit(_fetch_tile, fetch, image, grid, tile, path,
+                                    name=f"download[{tile['row']},{tile['col']}]")] = tile
+
+    for future in as_completed(futures):
+        place(futures[future], future.result())
+
+    if isinstance(mosaic, np.memmap):
+        mosaic.flush()
+
+    # פינוי האריחים שלא נגישו זמן רב ביותר - פעם אחת לכל הורדה, ולא בכל אריח
+    if cache_dir and futures:
+        evict_files(get_tile_cache_root(), config.EE_TILE_CACHE_DISK_BYTES)
+
+    return mosaic, grid
+
+def download_classification(bounds: List[float],
+                            date_start: str,
+                            date_end: str,
+                            collection: str = 'sentinel2',
+                            cloud_cover: float = 20,
+                            scale_m: float = None,
+                            output_path: Optional[str] = None) -> Tuple[np.ndarray, Dict]:
+    """
+    הורדת מפת הסיווג של אזור כמערך מקומי (במקום ייצוא ל-Drive)
+
+    Returns:
+        מפת סיווג uint8 (גובה, רוחב) והתייחסות גיאוגרפית
+    """
+    from utils.earth_engine_utils import get_satellite_image, classify_land_use
+
+    satellite_image = get_satellite_image(bounds, date_start, date_end, collection, cloud_cover)
+    if satellite_image is None:
+        raise RuntimeError(f"Could not build satellite image for {collection}")
+
+    classification = classify_land_use(satellite_image)
+    if classification is None:
+        raise RuntimeError("Could not classify satellite image")
+
+    grid = get_download_grid(bounds, scale_m)
+    mosaic, grid = download_image(classification.toUint8(), grid, band_count=1, bytes_per_pixel=1,
+                                  output_path=output_path)
+    return mosaic[0], grid
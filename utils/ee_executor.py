@@ -0,0 +1,203 @@
+"""
+מנהל הרצה מקבילי לבקשות Google Earth Engine
+מריץ הרבה קריאות חוסמות (getInfo, reduceRegion) במאגר threads, עם הגבלת
+קצב (token bucket), ניסיונות חוזרים בהשהיה מעריכית על שגיאות מכסה ו-5xx,
+ומדידת זמן לכל קריאה. שגיאות שאינן חולפות מועברות לקורא ולא מוסתרות
+"""
+
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+import numpy as np
+import config
+from utils.profiling import get_request_stage_name, is_profiling_enabled, record_stage
+
+# הודעות שגיאה של Earth Engine שמעידות על מכסה או תקלה זמנית בשרת
+RETRYABLE_MESSAGE = re.compile(
+    r'quota|rate limit|too many (concurrent|requests)|resource exhausted|'
+    r'service unavailable|temporarily unavailable|deadline exceeded|'
+    r'internal error|backend error',
+    re.IGNORECASE
+)
+
+def get_error_status(error: Exception) -> Optional[int]:
+    """
+    קוד HTTP של שגיאה, אם קיים (HttpError של googleapiclient, requests וכו')
+    """
+    for candidate in (getattr(getattr(error, 'resp', None), 'status', None),
+                      getattr(getattr(error, 'response', None), 'status_code', None),
+                      getattr(error, 'status_code', None),
+                      getattr(error, 'code', None)):
+        try:
+            if candidate is not None:
+                return int(candidate)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    האם השגיאה חולפת - מכסה/קצב (429) או שגיאת שרת (5xx)
+    """
+    status = get_error_status(error)
+    if status is not None:
+        return status == 429 or 500 <= status < 600
+    return bool(RETRYABLE_MESSAGE.search(str(error)))
+
+class TokenBucket:
+    """
+    הגבלת קצב - rate אסימונים לשנייה, עד capacity אסימונים שמורים
+    """
+
+    def __init__(self, rate: float, capacity: float = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        שמירת אסימון והמתנה עד שיתפנה
+
+        כל קריאה שומרת את האסימון הבא מראש (היתרה יכולה לרדת מתחת לאפס),
+        ולכן ההמתנה מחושבת פעם אחת ואין לולאה שתלויה בדיוק החשבון העשרוני
+
+        Returns:
+            זמן ההמתנה בשניות
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            self._tokens -= 1
+            delay = max(0.0, -self._tokens / self.rate)
+
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+class EERequestExecutor:
+    """
+    הרצת בקשות Earth Engine במקביל עם הגבלת קצב, ניסיונות חוזרים ומדדים
+    """
+
+    def __init__(self,
+                 max_workers: int = None,
+                 requests_per_second: float = None,
+                 max_retries: int = None,
+                 base_delay: float = None,
+                 max_delay: float = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_workers = max_workers or config.EE_MAX_CONCURRENT_REQUESTS
+        self.max_retries = config.EE_RETRY_MAX if max_retries is None else max_retries
+        self.base_delay = config.EE_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = config.EE_RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.bucket = TokenBucket(requests_per_second or config.EE_REQUESTS_PER_SECOND,
+                                  clock=clock, sleep=sleep)
+        self.metrics: Deque[Dict] = deque(maxlen=config.EE_METRICS_HISTORY)
+        self._metrics_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ee-request')
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """
+        השהיה מעריכית עם jitter מלא לפני ניסיון נוסף
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _run(self, name: str, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        """
+        הרצת קריאה אחת עם הגבלת קצב וניסיונות חוזרים, ורישום מדדים
+        """
+        start = self.clock()
+        attempt = 0
+        error = None
+
+        try:
+            while True:
+                self.bucket.acquire()
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable_error(e):
+                        error = e
+                        raise
+                    self.sleep(self._backoff_delay(attempt))
+                    attempt += 1
+
+        finally:
+            latency = self.clock() - start
+            with self._metrics_lock:
+                self.metrics.append({
+                    'name': name,
+                    'latency_seconds': latency,
+                    'attempts': attempt + 1,
+                    'success': error is None,
+                    'error': repr(error) if error is not None else None
+                })
+
+            # זמן הסבב מול השרת כשלב במדידת הצנרת (כולל המתנה לאסימונים וניסיונות חוזרים)
+            if is_profiling_enabled():
+                record_stage(get_request_stage_name(name), latency, success=error is None)
+
+    def submit(self, func: Callable[..., Any], *args, name: str = None, **kwargs) -> Future:
+        """
+        הגשת קריאה להרצה ברקע
+        """
+        return self._pool.submit(self._run, name or getattr(func, '__name__', 'call'), func, args, kwargs)
+
+    def get_info_all(self, objects: Iterable[Any], names: Iterable[str] = None) -> List[Any]:
+        """
+        קריאת getInfo על אובייקטי Earth Engine רבים במקביל - התוצאות לפי סדר הקלט
+
+        שגיאה שלא נפתרה בניסיונות החוזרים מועברת לקורא
+        """
+        objects = list(objects)
+        names = list(names) if names is not None else [f"getInfo[{i}]" for i in range(len(objects))]
+        futures = [self.submit(obj.getInfo, name=name) for obj, name in zip(objects, names)]
+        return [future.result() for future in futures]
+
+    def get_metrics_summary(self) -> Dict:
+        """
+        סיכום מדדי זמן לקריאות האחרונות שהסתיימו (עד EE_METRICS_HISTORY)
+        """
+        with self._metrics_lock:
+            metrics = list(self.metrics)
+
+        if not metrics:
+            return {'calls': 0}
+
+        latencies = np.array([m['latency_seconds'] for m in metrics])
+        return {
+            'calls': len(metrics),
+            'failures': sum(not m['success'] for m in metrics),
+            'retries': sum(m['attempts'] - 1 for m in metrics),
+            'mean_seconds': float(latencies.mean()),
+            'p50_seconds': float(np.percentile(latencies, 50)),
+            'p95_seconds': float(np.percentile(latencies, 95)),
+            'max_seconds': float(latencies.max())
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        סגירת מאגר ה-threads
+        """
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
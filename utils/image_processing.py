@@ -4,42 +4,338 @@
 """
 
 import cv2
+import hashlib
+import io
+import json
+import mmap
 import numpy as np
-from PIL import Image
-import rasterio
-from typing import Tuple, Optional, Dict
+from typing import Callable, List, Tuple, Optional, Dict, Union
 import config
+from utils.band_raster import BandRaster, get_band_names, read_band_raster
+from utils.classification_rules import get_compiled_rules, get_rules_fingerprint
+from utils.profiling import profiled, stage
 
-def load_image(file_path: str) -> Optional[np.ndarray]:
+# גרסת אלגוריתם הסיווג - יש להעלות בכל שינוי לוגי ב-classify_rgb_image
+RGB_CLASSIFIER_VERSION = 1
+
+# חתימות פתיחה (magic bytes) של פורמטי הקבצים הנתמכים
+TIFF_SIGNATURES = (b'II*\x00', b'MM\x00*', b'II+\x00', b'MM\x00+')
+JPEG_SIGNATURE = b'\xff\xd8\xff'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def detect_image_format(data) -> Optional[str]:
+    """
+    זיהוי פורמט תמונה לפי חתימת הבתים בתחילת הנתונים
+    """
+    header = bytes(memoryview(data)[:8])
+    
+    if header.startswith(TIFF_SIGNATURES):
+        return 'tiff'
+    if header.startswith(JPEG_SIGNATURE):
+        return 'jpeg'
+    if header.startswith(PNG_SIGNATURE):
+        return 'png'
+    return None
+
+# הקטנה ברמת המפענח ל-JPEG - libjpeg מפענח ישירות ב-1/8, 1/4 או 1/2 מהגודל
+JPEG_REDUCED_READ_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                           (4, cv2.IMREAD_REDUCED_COLOR_4),
+                           (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# סמני JPEG ללא שדה אורך, וסמני SOF שמכילים את גודל התמונה
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xDA)}
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def _read_jpeg_size(data) -> Optional[Tuple[int, int]]:
+    """
+    גודל תמונת JPEG מסגמנט ה-SOF, ללא פענוח
+    """
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # בית מילוי
+            pos += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            pos += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            header = bytes(data[pos + 5:pos + 9])
+            if len(header) < 4:
+                return None
+            return int.from_bytes(header[:2], 'big'), int.from_bytes(header[2:], 'big')
+        pos += 2 + int.from_bytes(bytes(data[pos + 2:pos + 4]), 'big')
+    return None
+
+def _read_header_size(data, source) -> Optional[Tuple[int, int]]:
     """
-    טעינת תמונה מקובץ
+    גודל התמונה לפי כותרת הפורמט
+    """
+    fmt = detect_image_format(data)
+    
+    if fmt == 'jpeg':
+        return _read_jpeg_size(data)
+    if fmt == 'png':
+        header = bytes(data[12:24])
+        if header[:4] != b'IHDR':
+            return None
+        return int.from_bytes(header[8:12], 'big'), int.from_bytes(header[4:8], 'big')
+    if fmt == 'tiff':
+        import rasterio
+        from rasterio.io import MemoryFile
+        
+        if isinstance(source, str):
+            with rasterio.open(source) as src:
+                return src.height, src.width
+        with MemoryFile(bytes(data)) as memfile:
+            with memfile.open() as src:
+                return src.height, src.width
+    return None
+
+def read_image_size(source: Union[str, bytes, bytearray, memoryview, io.BytesIO]) -> Optional[Tuple[int, int]]:
+    """
+    גודל התמונה המקורית (גובה, רוחב) מכותרת הקובץ, ללא פענוח הפיקסלים
+
+    Returns:
+        (גובה, רוחב) לפני סיבוב EXIF, או None אם הפורמט לא מוכר
     """
     try:
+        if isinstance(source, io.BytesIO):
+            source = source.getbuffer()
+        
+        if isinstance(source, str):
+            with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _read_header_size(data, source)
+        return _read_header_size(memoryview(source), source)
+        
+    except Exception as e:
+        print(f"⚠️ Could not read image size: {e}")
+        return None
+
+def read_band_names(source: Union[str, bytes, bytearray, memoryview, io.BytesIO]) -> Optional[List[str]]:
+    """
+    שמות הערוצים של GeoTIFF (כמו ב-load_raster) מכותרת הקובץ, ללא קריאת הפיקסלים
+
+    Returns:
+        שמות הערוצים, או None לפורמט שאינו TIFF
+    """
+    try:
+        if isinstance(source, io.BytesIO):
+            source = source.getbuffer()
+        
+        import rasterio
+        
+        if isinstance(source, str):
+            if source.lower().split('.')[-1] not in ['tif', 'tiff']:
+                return None
+            with rasterio.open(source) as src:
+                return get_band_names(src.descriptions)
+        
+        if detect_image_format(source) != 'tiff':
+            return None
+        
+        from rasterio.io import MemoryFile
+        
+        with MemoryFile(bytes(source)) as memfile:
+            with memfile.open() as src:
+                return get_band_names(src.descriptions)
+        
+    except Exception as e:
+        print(f"⚠️ Could not read band names: {e}")
+        return None
+
+def get_resized_shape(height: int, width: int, max_size: int) -> Tuple[int, int]:
+    """
+    גודל התמונה (גובה, רוחב) לאחר הקטנה ל-max_size תוך שמירה על יחס גובה-רוחב
+    """
+    if max(height, width) <= max_size:
+        return height, width
+    
+    if height > width:
+        return max_size, int(width * (max_size / height))
+    return int(height * (max_size / width)), max_size
+
+def get_jpeg_read_flag(height: int, width: int, max_size: Optional[int]) -> int:
+    """
+    דגל הפענוח של cv2 ל-JPEG - ההקטנה הגדולה ביותר שלא יורדת מתחת ל-max_size,
+    כך של-cv2.resize נשאר רק העידון האחרון
+    """
+    if max_size is not None:
+        for factor, flag in JPEG_REDUCED_READ_FLAGS:
+            if max(height, width) // factor >= max_size:
+                return flag
+    return cv2.IMREAD_COLOR
+
+def _fit_decoded_image(image: Optional[np.ndarray], size: Optional[Tuple[int, int]],
+                       max_size: Optional[int]) -> Optional[np.ndarray]:
+    """
+    עידון תמונה שפוענחה בהקטנה לגודל שהיה מתקבל מ-resize_image על התמונה המלאה
+    """
+    if image is None or max_size is None:
+        return image
+    
+    height, width = size if size is not None else image.shape[:2]
+    # cv2 מסובב לפי EXIF, וגודל הכותרת הוא לפני הסיבוב
+    if (image.shape[0] > image.shape[1]) != (height > width):
+        height, width = width, height
+    
+    target = get_resized_shape(height, width, max_size)
+    if image.shape[:2] == target:
+        return image
+    return cv2.resize(image, (target[1], target[0]), interpolation=cv2.INTER_AREA)
+
+def read_raster_image(src, max_size: Optional[int] = None) -> np.ndarray:
+    """
+    קריאת כל ערוצי קובץ raster פתוח בפורמט (גובה, רוחב, ערוצים)
+
+    Args:
+        src: קובץ rasterio פתוח
+        max_size: גודל מקסימלי לצלע הארוכה - GDAL קורא מה-overview המתאים
+                  ומקטין בזמן הקריאה, בלי לטעון את הרזולוציה המלאה לזיכרון
+    """
+    if max_size is None:
+        image = src.read()
+    else:
+        from rasterio.enums import Resampling
+        
+        height, width = get_resized_shape(src.height, src.width, max_size)
+        image = src.read(out_shape=(src.count, height, width), resampling=Resampling.average)
+    # המרה לפורמט numpy standard
+    if len(image.shape) == 3:
+        image = np.transpose(image, (1, 2, 0))
+    return image
+
+def decode_image(data, max_size: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    פענוח תמונה ישירות מהזיכרון (bytes, bytearray, memoryview או אובייקט buffer)
+
+    Args:
+        data: בתים של קובץ תמונה
+        max_size: גודל מקסימלי לצלע הארוכה (אופציונלי) - ראו load_image
+    """
+    fmt = detect_image_format(data)
+    
+    if fmt == 'tiff':
+        from rasterio.io import MemoryFile
+        
+        # GDAL מעתיק את הנתונים לקובץ וירטואלי בכל מקרה, ו-MemoryFile מקבל bytes בלבד
+        with MemoryFile(bytes(data)) as memfile:
+            with memfile.open() as src:
+                return read_raster_image(src, max_size)
+    
+    # הקטנה ברמת המפענח ל-JPEG, לפי הגודל בכותרת
+    size = None
+    flag = cv2.IMREAD_COLOR
+    if fmt == 'jpeg' and max_size is not None:
+        size = _read_jpeg_size(memoryview(data))
+        if size is not None:
+            flag = get_jpeg_read_flag(*size, max_size)
+    
+    # קובץ תמונה רגיל - פענוח ללא העתקה של הבתים
+    buffer = np.frombuffer(memoryview(data), dtype=np.uint8)
+    image = cv2.imdecode(buffer, flag)
+    if image is not None:
+        # המרה מ-BGR ל-RGB
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return _fit_decoded_image(image, size, max_size)
+
+@profiled('decode')
+def load_image(source: Union[str, bytes, bytearray, memoryview, io.BytesIO],
+               max_size: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    טעינת תמונה מקובץ או מהזיכרון
+
+    Args:
+        source: נתיב לקובץ, בתים של קובץ תמונה, או אובייקט BytesIO (למשל קובץ שהועלה)
+        max_size: גודל מקסימלי לצלע הארוכה (אופציונלי). JPEG מפוענח ישירות
+                  בהקטנה של המפענח ו-GeoTIFF נקרא מה-overview, כך שהרזולוציה
+                  המלאה לא נטענת; התוצאה בגודל של resize_image(load_image(source), max_size)
+    """
+    try:
+        if isinstance(source, io.BytesIO):
+            source = source.getbuffer()
+        
+        if not isinstance(source, str):
+            return decode_image(source, max_size)
+        
         # בדיקת סוג הקובץ
-        file_ext = file_path.lower().split('.')[-1]
+        file_ext = source.lower().split('.')[-1]
         
         if file_ext in ['tif', 'tiff']:
             # קובץ GeoTIFF
-            with rasterio.open(file_path) as src:
-                image = src.read()
-                # המרה לפורמט numpy standard
-                if len(image.shape) == 3:
-                    image = np.transpose(image, (1, 2, 0))
-                return image
+            import rasterio
+            
+            with rasterio.open(source) as src:
+                return read_raster_image(src, max_size)
         else:
-            # קובץ תמונה רגיל
-            image = cv2.imread(file_path)
+            # קובץ תמונה רגיל - הקטנה ברמת המפענח ל-JPEG
+            size = None
+            flag = cv2.IMREAD_COLOR
+            if file_ext in ['jpg', 'jpeg'] and max_size is not None:
+                size = read_image_size(source)
+                if size is not None:
+                    flag = get_jpeg_read_flag(*size, max_size)
+            
+            image = cv2.imread(source, flag)
             if image is not None:
                 # המרה מ-BGR ל-RGB
                 image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                return image
+                return _fit_decoded_image(image, size, max_size)
+        
+        return None
         
+    except Exception as e:
+        print(f"❌ Error loading image: {e}")
         return None
+
+def load_raster(source: Union[str, bytes, bytearray, memoryview, io.BytesIO],
+                max_size: Optional[int] = None) -> Optional[Union[np.ndarray, BandRaster]]:
+    """
+    טעינת תמונה לסיווג - GeoTIFF נטען כ-BandRaster בסדר ערוצים-קודם וב-dtype
+    המקורי (ללא המרה ל-(גובה, רוחב, ערוצים)), וכל פורמט אחר כמו ב-load_image
+
+    Args:
+        source: נתיב לקובץ, בתים של קובץ תמונה, או אובייקט BytesIO
+        max_size: גודל מקסימלי לצלע הארוכה (אופציונלי)
+    """
+    try:
+        if isinstance(source, io.BytesIO):
+            source = source.getbuffer()
+        
+        if isinstance(source, str):
+            if source.lower().split('.')[-1] not in ['tif', 'tiff']:
+                return load_image(source, max_size)
+            
+            import rasterio
+            
+            with stage('decode'), rasterio.open(source) as src:
+                return read_band_raster(src, max_size)
+        
+        if detect_image_format(source) != 'tiff':
+            return load_image(source, max_size)
+        
+        from rasterio.io import MemoryFile
+        
+        with stage('decode'), MemoryFile(bytes(source)) as memfile:
+            with memfile.open() as src:
+                return read_band_raster(src, max_size)
         
     except Exception as e:
         print(f"❌ Error loading image: {e}")
         return None
 
+def get_display_image(image: Union[np.ndarray, BandRaster], max_size: int = None) -> np.ndarray:
+    """
+    תמונת RGB uint8 לתצוגה, מוקטנת ל-max_size
+    """
+    if isinstance(image, BandRaster):
+        return image.to_rgb(max_size if max_size is not None else config.MAX_IMAGE_SIZE)
+    return resize_image(image, max_size)
+
+@profiled('resize')
 def resize_image(image: np.ndarray, max_size: int = None) -> np.ndarray:
     """
     שינוי גודל תמונה
@@ -49,28 +345,51 @@ def resize_image(image: np.ndarray, max_size: int = None) -> np.ndarray:
         
     height, width = image.shape[:2]
     
-    # בדיקה אם נדרש שינוי גודל
-    if max(height, width) <= max_size:
-        return image
-    
     # חישוב גודל חדש תוך שמירה על יחס גובה-רוחב
-    if height > width:
-        new_height = max_size
-        new_width = int(width * (max_size / height))
-    else:
-        new_width = max_size
-        new_height = int(height * (max_size / width))
+    new_height, new_width = get_resized_shape(height, width, max_size)
+    if (new_height, new_width) == (height, width):
+        return image
     
     resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
     return resized
 
-def calculate_image_indices(image: np.ndarray) -> Dict[str, np.ndarray]:
+def _channel_indices(r: np.ndarray, g: np.ndarray, b: np.ndarray, names) -> Dict[str, np.ndarray]:
+    """
+    אינדקסים מבוססי RGB מערוצי float32 - רק האינדקסים שב-names
+    """
+    # מניעת חלוקה באפס
+    epsilon = 1e-8
+    
+    indices = {}
+    
+    # Green-Red Vegetation Index (GRVI)
+    if 'grvi' in names:
+        indices['grvi'] = np.where((g + r) > epsilon, (g - r) / (g + r + epsilon), 0)
+    
+    # Visible Atmospherically Resistant Index (VARI)
+    if 'vari' in names:
+        indices['vari'] = np.where((g + r - b) > epsilon, (g - r) / (g + r - b + epsilon), 0)
+    
+    # Excess Green Index (ExG)
+    if 'exg' in names:
+        indices['exg'] = 2 * g - r - b
+    
+    # Triangular Greenness Index (TGI)
+    if 'tgi' in names:
+        indices['tgi'] = g - 0.39 * r - 0.61 * b
+    
+    return indices
+
+def calculate_image_indices(image: Union[np.ndarray, BandRaster]) -> Dict[str, np.ndarray]:
     """
     חישוב אינדקסים ספקטרליים מתמונה רגילה (RGB)
     """
     try:
-        # הפרדת ערוצי צבע
-        if len(image.shape) == 3:
+        # הפרדת ערוצי צבע - ב-BandRaster כל ערוץ הוא כבר מישור רציף
+        if isinstance(image, BandRaster):
+            r, g, b = (image.get_uint8(name).reshape(image.shape).astype(np.float32)
+                       for name in image.get_rgb_names())
+        elif len(image.shape) == 3:
             r = image[:, :, 0].astype(np.float32)
             g = image[:, :, 1].astype(np.float32)
             b = image[:, :, 2].astype(np.float32)
@@ -78,146 +397,391 @@ def calculate_image_indices(image: np.ndarray) -> Dict[str, np.ndarray]:
             # תמונה אפורה
             r = g = b = image.astype(np.float32)
         
-        # מניעת חלוקה באפס
-        epsilon = 1e-8
+        indices = _channel_indices(r, g, b, ('grvi', 'vari', 'exg', 'tgi'))
+        indices.update({'r': r, 'g': g, 'b': b})
+        return indices
         
-        # חישוב אינדקסים מבוססי RGB
-        # Green-Red Vegetation Index (GRVI)
-        grvi = np.where((g + r) > epsilon, (g - r) / (g + r + epsilon), 0)
+    except Exception as e:
+        print(f"❌ Error calculating image indices: {e}")
+        return {}
+
+def calculate_rgb_features(pixels: np.ndarray, names) -> Dict[str, np.ndarray]:
+    """
+    מאפייני סיווג למקטע פיקסלים (מספר פיקסלים, ערוצים) - רק המאפיינים שב-names
+
+    מאפיינים: אינדקסים (grvi, vari, exg, tgi), ערוצים (r, g, b)
+    וגוון/רוויה/בהירות של HSV ב-OpenCV (hue, saturation, value)
+    """
+    return calculate_band_features(pixels[:, 0], pixels[:, 1], pixels[:, 2], names, pixels=pixels)
+
+def calculate_band_features(r: np.ndarray, g: np.ndarray, b: np.ndarray, names,
+                            pixels: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    מאפייני סיווג ממקטעים שטוחים של ערוצי uint8 - רק המאפיינים שב-names
+
+    Args:
+        r, g, b: מקטעי הערוצים
+        names: המאפיינים הנדרשים (ראו calculate_rgb_features)
+        pixels: אותם פיקסלים בפורמט משולב (מספר פיקסלים, 3), אם כבר קיימים - ל-HSV
+    """
+    channels = {'r': r.astype(np.float32), 'g': g.astype(np.float32), 'b': b.astype(np.float32)}
+    
+    features = _channel_indices(channels['r'], channels['g'], channels['b'], names)
+    features.update(channels)
+    
+    if {'hue', 'saturation', 'value'} & set(names):
+        if pixels is None:
+            pixels = np.stack((r, g, b), axis=-1)
+        hsv = cv2.cvtColor(pixels[np.newaxis], cv2.COLOR_RGB2HSV)[0]
+        features.update({'hue': hsv[:, 0], 'saturation': hsv[:, 1], 'value': hsv[:, 2]})
+    
+    return features
+
+# מספר פיקסלים למקטע בסיווג RGB - המאפיינים של מקטע נשארים במטמון המעבד
+RGB_CLASSIFY_BLOCK_PIXELS = 1 << 16
+
+@profiled('classify')
+def classify_rgb_image(image: Union[np.ndarray, BandRaster], out: Optional[np.ndarray] = None,
+                       progress: Optional[Callable[[float], None]] = None) -> np.ndarray:
+    """
+    סיווג תמונה RGB לקטגוריות שימוש בקרקע
+
+    הכללים (config.RGB_CLASSIFICATION_RULES) מוערכים במקטעים של פיקסלים,
+    כך שהמאפיינים והמסכות לא מוקצים בגודל התמונה המלאה
+
+    Args:
+        image: תמונת RGB, או BandRaster - ערוצי הצבע נקראים ממישורי הערוצים,
+               וערוצי 16 ביט נמתחים ל-uint8 במקטע בלבד
+        out: מערך uint8 רציף בגודל (גובה, רוחב) לתוצאה - למשל memmap במאגר הרסטרים (אופציונלי)
+        progress: נקרא עם החלק שסווג (0 עד 1) אחרי כל מקטע, למשל דיווח התקדמות של עבודה ברקע
+    """
+    if out is None:
+        out = np.empty(image.shape[:2], dtype=np.uint8)
+    
+    try:
+        rules = get_compiled_rules(config.RGB_CLASSIFICATION_RULES, config.RGB_CLASSIFICATION_THRESHOLDS)
         
-        # Visible Atmospherically Resistant Index (VARI)
-        vari = np.where((g + r - b) > epsilon, (g - r) / (g + r - b + epsilon), 0)
+        height, width = image.shape[:2]
+        classification = out.reshape(height * width)
         
-        # Excess Green Index (ExG)
-        exg = 2 * g - r - b
+        if isinstance(image, BandRaster):
+            rgb_names = image.get_rgb_names()
+            for start in range(0, height * width, RGB_CLASSIFY_BLOCK_PIXELS):
+                block = slice(start, start + RGB_CLASSIFY_BLOCK_PIXELS)
+                r, g, b = (image.get_uint8(name, block) for name in rgb_names)
+                rules.evaluate(calculate_band_features(r, g, b, rules.features), out=classification[block])
+                if progress is not None:
+                    progress(min(1.0, (start + RGB_CLASSIFY_BLOCK_PIXELS) / (height * width)))
+            return out
         
-        # Triangular Greenness Index (TGI)
-        tgi = g - 0.39 * r - 0.61 * b
+        pixels = image.reshape(height * width, image.shape[2])
+        for start in range(0, height * width, RGB_CLASSIFY_BLOCK_PIXELS):
+            block = slice(start, start + RGB_CLASSIFY_BLOCK_PIXELS)
+            rules.evaluate(calculate_rgb_features(pixels[block], rules.features), out=classification[block])
+            if progress is not None:
+                progress(min(1.0, (start + RGB_CLASSIFY_BLOCK_PIXELS) / (height * width)))
         
-        return {
-            'grvi': grvi,
-            'vari': vari,
-            'exg': exg,
-            'tgi': tgi,
-            'r': r, 'g': g, 'b': b
-        }
+        return out
         
     except Exception as e:
-        print(f"❌ Error calculating image indices: {e}")
-        return {}
+        print(f"❌ Error in RGB image classification: {e}")
+        out[...] = 0
+        return out
 
-def classify_rgb_image(image: np.ndarray) -> np.ndarray:
+def classify_image(image: Union[np.ndarray, BandRaster], out: Optional[np.ndarray] = None,
+                   progress: Optional[Callable[[float], None]] = None) -> np.ndarray:
     """
-    סיווג תמונה RGB לקטגוריות שימוש בקרקע
+    סיווג תמונה לפי הערוצים שיש בה - BandRaster עם כל ערוצי config.MODEL_BANDS
+    מסווג בכללים הרב-ספקטרליים (כולל NIR ו-SWIR), וכל תמונה אחרת בכללי RGB
+
+    Args:
+        image: תמונת RGB או BandRaster
+        out: מערך uint8 רציף בגודל (גובה, רוחב) לתוצאה (אופציונלי)
+        progress: נקרא עם החלק שסווג (0 עד 1) אחרי כל מקטע (אופציונלי)
+    """
+    if isinstance(image, BandRaster) and image.has_bands(config.MODEL_BANDS):
+        # spectral_classification מייבא את tiled_processing, שמייבא את המודול הזה
+        from utils.spectral_classification import classify_land_use_array
+        
+        return classify_land_use_array(image.get_bands(config.MODEL_BANDS), out=out, progress=progress)
+    return classify_rgb_image(image, out=out, progress=progress)
+
+def get_classifier_fingerprint() -> str:
+    """
+    טביעת אצבע של הגדרות הסיווג - משתנה בכל שינוי בכללים, בספים או בגרסת האלגוריתם (RGB ורב-ספקטרלי)
+    """
+    payload = json.dumps({
+        'version': RGB_CLASSIFIER_VERSION,
+        'rgb_rules': get_rules_fingerprint(config.RGB_CLASSIFICATION_RULES, config.RGB_CLASSIFICATION_THRESHOLDS),
+        'spectral_rules': get_rules_fingerprint(config.SPECTRAL_CLASSIFICATION_RULES,
+                                                config.SPECTRAL_CLASSIFICATION_THRESHOLDS)
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+# מספר מזהי המחלקות האפשריים במפת סיווג uint8
+CLASS_COUNT_BINS = 256
+
+# מספר שורות בכל רצועה בחישוב שטח לפי שורה
+AREA_BAND_ROWS = 512
+
+# רדיוס כדור הארץ (אוטלי) לחישוב שטח פיקסלים בקואורדינטות גיאוגרפיות
+EARTH_AUTHALIC_RADIUS_M = 6371007.2
+
+# אליפסואיד WGS84 - חצי ציר ראשי ואקסצנטריות בריבוע
+WGS84_SEMI_MAJOR_M = 6378137.0
+WGS84_ECCENTRICITY_SQ = 0.00669437999014
+
+@profiled('georeference')
+def read_georeference(source) -> Optional[Dict]:
+    """
+    קריאת ההתייחסות הגיאוגרפית (crs, transform) ממקור GeoTIFF - נתיב או בתים
+
+    Returns:
+        מילון עם crs, transform, width ו-height, או None אם המקור אינו GeoTIFF מיוחס
     """
     try:
-        indices = calculate_image_indices(image)
+        # rasterio נטען רק למקורות GeoTIFF
+        import rasterio
+        from rasterio.io import MemoryFile
         
-        if not indices:
-            return np.zeros(image.shape[:2], dtype=np.uint8)
+        if isinstance(source, io.BytesIO):
+            source = source.getbuffer()
         
-        height, width = image.shape[:2]
-        classification = np.zeros((height, width), dtype=np.uint8)
-        
-        # חישוב HSV לזיהוי צבעים טוב יותר
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
-        h, s, v = hsv[:, :, 0], hsv[:, :, 1], hsv[:, :, 2]
-        
-        # יער - צבע ירוק כהה, GRVI גבוה
-        forest_mask = (
-            (indices['grvi'] > 0.1) & 
-            (indices['tgi'] > 10) &
-            (h >= 40) & (h <= 80) &  # גוון ירוק
-            (s > 50) & (v > 30)
-        )
-        
-        # חקלאות - צבע ירוק בהיר, GRVI בינוני
-        agriculture_mask = (
-            (indices['grvi'] > 0.05) & (indices['grvi'] <= 0.1) &
-            (indices['exg'] > 0) &
-            (h >= 30) & (h <= 90) &  # גוון ירוק-צהוב
-            (s > 30) & (v > 40)
-        )
-        
-        # עירוני - צבעים אפורים/בהירים, GRVI נמוך
-        urban_mask = (
-            (indices['grvi'] < 0.05) &
-            (s < 50) &  # רוויה נמוכה
-            (v > 60)   # בהירות גבוהה
-        )
-        
-        # מים - צבע כחול
-        water_mask = (
-            (h >= 100) & (h <= 130) &  # גוון כחול
-            (s > 40) & (v > 30)
-        )
-        
-        # החלת הסיווג
-        classification[agriculture_mask] = 1  # חקלאות
-        classification[urban_mask] = 2        # עירוני
-        classification[forest_mask] = 3       # יער
-        classification[water_mask] = 4        # מים
-        
-        return classification
+        if isinstance(source, str):
+            if source.lower().split('.')[-1] not in ['tif', 'tiff']:
+                return None
+            with rasterio.open(source) as src:
+                georef = {'crs': src.crs, 'transform': src.transform,
+                          'width': src.width, 'height': src.height}
+        else:
+            if detect_image_format(source) != 'tiff':
+                return None
+            with MemoryFile(bytes(source)) as memfile:
+                with memfile.open() as src:
+                    georef = {'crs': src.crs, 'transform': src.transform,
+                              'width': src.width, 'height': src.height}
+        
+        return georef if georef['crs'] is not None else None
         
     except Exception as e:
-        print(f"❌ Error in RGB image classification: {e}")
-        return np.zeros(image.shape[:2], dtype=np.uint8)
+        print(f"⚠️ Could not read georeference: {e}")
+        return None
+
+def scale_georeference(georef: Dict, width: int, height: int) -> Dict:
+    """
+    התאמת ה-transform לרסטר שגודלו שונה (למשל לאחר resize_image)
+    """
+    from rasterio.transform import Affine
+    
+    transform = georef['transform'] * Affine.scale(georef['width'] / width, georef['height'] / height)
+    return {'crs': georef['crs'], 'transform': transform, 'width': width, 'height': height}
+
+def get_projected_row_areas(transform, crs, row_start: int, row_count: int) -> np.ndarray:
+    """
+    שטח קרקע אמיתי לפיקסל בכל שורה במערכת מוטלת
+
+    היטלים קונפורמיים (למשל Web Mercator, EPSG:3857) מנפחים שטח לפי קו
+    הרוחב - כ-1.38 בישראל - ולכן שטח המפה אינו שטח הקרקע. השטח מחושב
+    מהיעקוביאן המקומי על אליפסואיד WGS84: שלוש נקודות לכל שורה (פיקסל,
+    ושכניו בעמודה ובשורה) מוטלות לקואורדינטות גיאוגרפיות. הדגימה היא
+    בעמודה הראשונה, כך שהתוצאה לא תלויה בחלוקה לאריחים; השינוי לאורך
+    השורה זניח בגדלי תמונה רגילים
+    """
+    from rasterio.warp import transform as transform_coords
+    
+    rows = np.arange(row_start, row_start + row_count, dtype=np.float64) + 0.5
+    cols = np.full(row_count, 0.5)
+    
+    points = [transform * (cols + dc, rows + dr) for dc, dr in ((0, 0), (1, 0), (0, 1))]
+    xs = np.concatenate([x for x, _ in points])
+    ys = np.concatenate([y for _, y in points])
+    lon, lat = transform_coords(crs, 'EPSG:4326', xs, ys)
+    lon = np.radians(np.asarray(lon)).reshape(3, row_count)
+    lat = np.radians(np.asarray(lat)).reshape(3, row_count)
+    
+    # רדיוסי העקמומיות (מרידיאן וניצב ראשי) בקו הרוחב של כל שורה
+    sin_lat = np.sin(lat[0])
+    w = 1 - WGS84_ECCENTRICITY_SQ * sin_lat ** 2
+    meridional = WGS84_SEMI_MAJOR_M * (1 - WGS84_ECCENTRICITY_SQ) / w ** 1.5
+    prime_vertical = WGS84_SEMI_MAJOR_M / np.sqrt(w)
+    
+    east = (lon[1:] - lon[0]) * prime_vertical * np.cos(lat[0])
+    north = (lat[1:] - lat[0]) * meridional
+    return np.abs(east[0] * north[1] - east[1] * north[0])
+
+def get_row_pixel_areas(transform, crs, row_start: int, row_count: int) -> np.ndarray:
+    """
+    שטח קרקע של פיקסל במ"ר לכל שורה
+    
+    במערכת גיאוגרפית לפי רצועת קו רוחב על כדור, ובמערכת מוטלת לפי
+    get_projected_row_areas. מערכת ללא דאטום גיאודטי (מקומית) נמדדת
+    בשטח המפה
+    """
+    if crs.is_geographic:
+        # שטח רצועת קו רוחב על כדור: R^2 * dλ * (sin φ2 - sin φ1)
+        rows = np.arange(row_start, row_start + row_count + 1, dtype=np.float64)
+        lat = np.radians(np.clip(transform.f + rows * transform.e, -90, 90))
+        dlon = np.radians(abs(transform.a))
+        return EARTH_AUTHALIC_RADIUS_M ** 2 * dlon * np.abs(np.diff(np.sin(lat)))
+    
+    try:
+        return get_projected_row_areas(transform, crs, row_start, row_count)
+    except Exception:
+        pass
+    
+    try:
+        unit_factor = crs.linear_units_factor[1]
+    except Exception:
+        unit_factor = 1.0
+    
+    pixel_area = abs(transform.a * transform.e - transform.b * transform.d) * unit_factor ** 2
+    return np.full(row_count, pixel_area, dtype=np.float64)
+
+def count_classes(classification: np.ndarray) -> np.ndarray:
+    """
+    ספירת פיקסלים לכל מזהה מחלקה - מערכים של אריחים/תהליכים שונים ניתנים לחיבור
+    """
+    return np.bincount(classification.ravel(), minlength=CLASS_COUNT_BINS)
+
+def measure_class_areas(classification: np.ndarray, transform, crs, row_offset: int = 0) -> np.ndarray:
+    """
+    שטח במ"ר לכל מזהה מחלקה לפי ה-geotransform - ניתן לחיבור בין אריחים
+
+    Args:
+        classification: מפת סיווג (או אריח ממנה)
+        transform, crs: ההתייחסות הגיאוגרפית של הרסטר המלא
+        row_offset: שורת ההתחלה של האריח ברסטר המלא
+    """
+    height = classification.shape[0]
+    row_areas = get_row_pixel_areas(transform, crs, row_offset, height)
+    
+    # שטח כמעט קבוע (למשל UTM באזור קטן) - מכפלה אחת בשטח הממוצע
+    if np.allclose(row_areas, row_areas[0], rtol=1e-6, atol=0):
+        return count_classes(classification) * row_areas.mean()
+    
+    # ספירה לכל צירוף (שורה, מחלקה) ושקלול בשטח השורה, ברצועות כדי להגביל זיכרון
+    areas = np.zeros(CLASS_COUNT_BINS, dtype=np.float64)
+    for start in range(0, height, AREA_BAND_ROWS):
+        band = classification[start:start + AREA_BAND_ROWS]
+        band_height = band.shape[0]
+        row_index = np.arange(band_height, dtype=np.int64)[:, None] * CLASS_COUNT_BINS
+        row_counts = np.bincount((row_index + band).ravel(),
+                                 minlength=band_height * CLASS_COUNT_BINS).reshape(band_height, CLASS_COUNT_BINS)
+        areas += row_areas[start:start + band_height] @ row_counts
+    return areas
+
+def stats_from_counts(counts, areas_m2: Optional[np.ndarray] = None, gsd_m: float = None) -> Dict:
+    """
+    בניית סטטיסטיקות סיווג ממספר הפיקסלים בכל מחלקה
 
-def get_rgb_classification_stats(classification: np.ndarray) -> Dict:
+    Args:
+        counts: מערך ספירות לפי מזהה מחלקה (count_classes) או מילון {מזהה: ספירה}
+        areas_m2: שטח במ"ר לפי מזהה מחלקה (measure_class_areas), אם הקלט מיוחס גיאוגרפית
+        gsd_m: גודל פיקסל בשטח במטרים, כאשר אין התייחסות גיאוגרפית
+    """
+    if isinstance(counts, dict):
+        dense = np.zeros(CLASS_COUNT_BINS, dtype=np.int64)
+        for class_id, count in counts.items():
+            dense[class_id] = count
+        counts = dense
+    
+    if areas_m2 is None:
+        if gsd_m is None:
+            gsd_m = config.DEFAULT_GSD_M
+        areas_m2 = counts * float(gsd_m) ** 2
+    
+    total_pixels = int(counts.sum())
+    class_names = {value['id']: key for key, value in config.LAND_USE_CLASSES.items()}
+    
+    stats = {}
+    for class_id in np.flatnonzero(counts):
+        count = int(counts[class_id])
+        
+        stats[class_names.get(int(class_id), 'other')] = {
+            'pixels': count,
+            'percentage': round((count / total_pixels) * 100, 2),
+            'area_km2': round(float(areas_m2[class_id]) / 1e6, 4)
+        }
+    
+    return stats
+
+@profiled('stats')
+def get_rgb_classification_stats(classification: np.ndarray,
+                                 georef: Optional[Dict] = None,
+                                 gsd_m: float = None) -> Dict:
     """
     חישוב סטטיסטיקות סיווג לתמונה RGB
+
+    Args:
+        classification: מפת הסיווג
+        georef: התייחסות גיאוגרפית (read_georeference) לחישוב שטח אמיתי
+        gsd_m: גודל פיקסל בשטח במטרים כאשר אין התייחסות גיאוגרפית
     """
     try:
-        unique, counts = np.unique(classification, return_counts=True)
-        total_pixels = classification.size
+        counts = count_classes(classification)
         
-        stats = {}
-        for class_id, count in zip(unique, counts):
-            percentage = (count / total_pixels) * 100
-            
-            class_name = 'other'
-            for key, value in config.LAND_USE_CLASSES.items():
-                if value['id'] == class_id:
-                    class_name = key
-                    break
-            
-            stats[class_name] = {
-                'pixels': int(count),
-                'percentage': round(percentage, 2),
-                'area_km2': round((count * 0.0009), 4)  # הערכה גסה
-            }
+        areas_m2 = None
+        if georef is not None:
+            areas_m2 = measure_class_areas(classification, georef['transform'], georef['crs'])
         
-        return stats
+        return stats_from_counts(counts, areas_m2, gsd_m)
         
     except Exception as e:
         print(f"❌ Error calculating RGB classification stats: {e}")
         return {}
 
-def create_classification_overlay(image: np.ndarray, 
+# לוחות צבעים מחושבים לפי הגדרות המחלקות
+_palettes: Dict[tuple, np.ndarray] = {}
+
+def get_class_palette() -> np.ndarray:
+    """
+    לוח צבעים (256, 3) הממפה מזהה מחלקה לצבע RGB - מחושב פעם אחת לכל הגדרת מחלקות
+    """
+    palette_key = tuple(sorted((info['id'], info['color']) for info in config.LAND_USE_CLASSES.values()))
+    
+    palette = _palettes.get(palette_key)
+    if palette is None:
+        palette = np.zeros((256, 3), dtype=np.uint8)
+        for class_id, color in palette_key:
+            # המרת צבע מהקס ל-RGB
+            palette[class_id] = [int(color[i:i+2], 16) for i in (1, 3, 5)]
+        _palettes[palette_key] = palette
+    
+    return palette
+
+@profiled('overlay')
+def create_classification_overlay(image: Union[np.ndarray, BandRaster], 
                                 classification: np.ndarray, 
-                                alpha: float = 0.5) -> np.ndarray:
+                                alpha: float = 0.5,
+                                max_size: int = None) -> np.ndarray:
     """
     יצירת שכבת סיווג שקופה על התמונה המקורית
+
+    Args:
+        image: התמונה המקורית (מערך RGB או BandRaster)
+        classification: מפת הסיווג
+        alpha: שקיפות שכבת הסיווג
+        max_size: גודל מקסימלי לצלע התוצאה - לתצוגה ברזולוציית המסך (אופציונלי)
     """
     try:
-        # יצירת מפת צבעים לסיווג
-        height, width = classification.shape
-        colored_classification = np.zeros((height, width, 3), dtype=np.uint8)
+        # ערוצי BandRaster משולבים ל-RGB רק ברזולוציית התצוגה
+        if isinstance(image, BandRaster):
+            image = image.to_rgb(max_size)
         
-        for class_key, class_info in config.LAND_USE_CLASSES.items():
-            mask = classification == class_info['id']
-            color = class_info['color']
-            
-            # המרת צבע מהקס ל-RGB
-            color_rgb = tuple(int(color[i:i+2], 16) for i in (1, 3, 5))
-            colored_classification[mask] = color_rgb
+        # הקטנה לרזולוציית התצוגה לפני הצביעה והמיזוג
+        if max_size is not None and max(classification.shape) > max_size:
+            image = resize_image(image, max_size)
+            classification = cv2.resize(classification, (image.shape[1], image.shape[0]),
+                                        interpolation=cv2.INTER_NEAREST)
+        
+        # צביעת הסיווג בפעולת gather אחת מלוח הצבעים
+        colored_classification = get_class_palette()[classification]
         
-        # שילוב התמונה המקורית עם הסיווג
-        overlay = cv2.addWeighted(image, 1-alpha, colored_classification, alpha, 0)
+        # שילוב התמונה המקורית עם הסיווג, לתוך מערך הצבעים עצמו
+        cv2.addWeighted(image, 1-alpha, colored_classification, alpha, 0, dst=colored_classification)
         
-        return overlay
+        return colored_classification
         
     except Exception as e:
         print(f"❌ Error creating classification overlay: {e}")
-        return image 
\ No newline at end of file
+        return image
@@ -0,0 +1,339 @@
+"""
+תור עבודות מקומי עם מאגר עובדים מוגבל
+עבודות כבדות (סיווג תמונה מקומית) רצות ב-threads ברקע ולא ב-thread של
+הסקריפט של Streamlit: הגשה מחזירה מיד ידית לעבודה, והדף מציג התקדמות
+בבדיקות חוזרות עד שהתוצאה מוכנה. התור משותף לכל ה-sessions בתהליך, כך
+שמספר העבודות שרצות במקביל מוגבל (JOB_WORKERS) ועבודות מעבר ל-JOB_QUEUE_MAX
+נדחות במקום להתחרות על המעבד. עבודה בעדיפות גבוהה יותר יוצאת מהתור קודם,
+וביטול נבדק בכל דיווח התקדמות
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import config
+from utils.profiling import is_profiling_enabled, record_stage
+
+# מצבי עבודה
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+class JobCancelled(BaseException):
+    """
+    עבודה בוטלה בזמן ריצה - יורש מ-BaseException כדי שלא ייבלע ב-except Exception
+    של שלבי העיבוד (למשל classify_rgb_image, שמחזיר מפה ריקה בשגיאה)
+    """
+
+class JobQueueFull(Exception):
+    """התור מלא - העבודה לא התקבלה"""
+
+class Job:
+    """
+    ידית לעבודה בתור - מצב, התקדמות, תוצאה וביטול
+    """
+
+    def __init__(self, name: str, priority: int = 0):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.priority = priority
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def cancel(self) -> None:
+        """
+        בקשת ביטול - עבודה בתור לא תרוץ, ועבודה שרצה נעצרת בדיווח ההתקדמות הבא
+        """
+        self._cancel_event.set()
+
+    def check_cancelled(self) -> None:
+        """
+        Raises:
+            JobCancelled: התבקש ביטול
+        """
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def set_progress(self, fraction: float, message: str = None) -> None:
+        """
+        דיווח התקדמות (0 עד 1) מתוך העבודה - גם נקודת הביטול שלה
+
+        Raises:
+            JobCancelled: התבקש ביטול
+        """
+        self.check_cancelled()
+        self.progress = min(1.0, max(0.0, float(fraction)))
+        if message is not None:
+            self.message = message
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        המתנה לסיום העבודה
+
+        Returns:
+            האם העבודה הסתיימה
+        """
+        return self._done_event.wait(timeout)
+
+    def _finish(self, status: str, result: Any = None, error: BaseException = None) -> None:
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        if status == DONE:
+            self.progress = 1.0
+        self.status = status
+        self._done_event.set()
+
+    def to_dict(self) -> Dict:
+        """
+        מצב העבודה לתצוגה או ל-JSON (ללא התוצאה עצמה)
+        """
+        return {
+            'id': self.id,
+            'name': self.name,
+            'priority': self.priority,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': repr(self.error) if self.error is not None else None,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+class JobQueue:
+    """
+    תור עבודות בעדיפויות עם מספר עובדים קבוע, ביטול ומדדים
+    """
+
+    def __init__(self, max_workers: int = None, max_queued: int = None, history: int = None):
+        self.max_workers = max_workers or config.JOB_WORKERS
+        self.max_queued = config.JOB_QUEUE_MAX if max_queued is None else max_queued
+        self.history = history or config.JOB_HISTORY
+
+        # ערימה של (-עדיפות, מספר סידורי, עבודה, פונקציה, args, kwargs) - FIFO באותה עדיפות
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._condition = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._shutdown = False
+
+        self._started_at = time.monotonic()
+        self._busy_workers = 0
+        self._busy_seconds = 0.0
+        self._counters = {'submitted': 0, 'rejected': 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def submit(self, func: Callable[..., Any], *args, name: str = None, priority: int = 0, **kwargs) -> Job:
+        """
+        הגשת עבודה - func נקראת כ-func(job, *args, **kwargs) ב-thread של עובד
+
+        Args:
+            priority: עבודה בעדיפות גבוהה יותר יוצאת מהתור קודם
+
+        Raises:
+            JobQueueFull: כבר JOB_QUEUE_MAX עבודות ממתינות
+        """
+        job = Job(name or getattr(func, '__name__', 'job'), priority)
+
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Job queue is shut down")
+            if len(self._heap) >= self.max_queued:
+                self._counters['rejected'] += 1
+                raise JobQueueFull(f"Job queue is full ({self.max_queued} jobs waiting)")
+
+            heapq.heappush(self._heap, (-priority, next(self._sequence), job, func, args, kwargs))
+            self._jobs[job.id] = job
+            self._counters['submitted'] += 1
+            self._trim_history()
+
+            # עובדים נוצרים לפי הצורך, עד max_workers
+            if len(self._workers) < self.max_workers and len(self._heap) > len(self._workers) - self._busy_workers:
+                worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{len(self._workers)}",
+                                          daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+            self._condition.notify()
+
+        return job
+
+    def _trim_history(self) -> None:
+        """מחיקת העבודות הישנות שהסתיימו מעבר ל-history"""
+        excess = len(self._jobs) - self.history
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def _worker_loop(self) -> None:
+        """לולאת עובד - לוקח את העבודה בעדיפות הגבוהה ביותר ומריץ אותה"""
+        while True:
+            with self._condition:
+                while not self._heap and not self._shutdown:
+                    self._condition.wait()
+                if self._shutdown and not self._heap:
+                    return
+
+                _, _, job, func, args, kwargs = heapq.heappop(self._heap)
+                if job.cancel_requested:
+                    job._finish(CANCELLED)
+                    self._counters[CANCELLED] += 1
+                    continue
+
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._busy_workers += 1
+                self._wait_seconds += job.started_at - job.submitted_at
+
+            self._run_job(job, func, args, kwargs)
+
+    def _run_job(self, job: Job, func: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        """הרצת עבודה אחת ורישום המדדים שלה"""
+        start = time.monotonic()
+        status, result, error = DONE, None, None
+
+        try:
+            result = func(job, *args, **kwargs)
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            status, error = FAILED, e
+            print(f"❌ Error in job {job.name}: {e}")
+        finally:
+            elapsed = time.monotonic() - start
+            with self._condition:
+                self._busy_workers -= 1
+                self._busy_seconds += elapsed
+                self._run_seconds += elapsed
+                self._counters[status] += 1
+            job._finish(status, result, error)
+
+            if is_profiling_enabled():
+                record_stage(f"job.{job.name}", elapsed, success=status != FAILED)
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """עבודה לפי מזהה (עבודות שהסתיימו נשמרות עד JOB_HISTORY)"""
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        ביטול עבודה לפי מזהה
+
+        Returns:
+            האם נמצאה עבודה שעוד לא הסתיימה
+        """
+        job = self.get_job(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel()
+        return True
+
+    def get_jobs(self) -> List[Dict]:
+        """מצב כל העבודות הידועות, מהחדשה לישנה"""
+        with self._condition:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def get_metrics(self) -> Dict:
+        """
+        עומק התור, ניצולת העובדים ומונים מצטברים
+        """
+        with self._condition:
+            elapsed = max(time.monotonic() - self._started_at, 1e-9)
+            finished = self._counters[DONE] + self._counters[FAILED] + self._counters[CANCELLED]
+            started = finished + self._busy_workers
+            return {
+                'queue_depth': len(self._heap),
+                'max_queued': self.max_queued,
+                'workers': self.max_workers,
+                'busy_workers': self._busy_workers,
+                'utilization': min(1.0, self._busy_seconds / (self.max_workers * elapsed)),
+                'submitted': self._counters['submitted'],
+                'rejected': self._counters['rejected'],
+                'completed': self._counters[DONE],
+                'failed': self._counters[FAILED],
+                'cancelled': self._counters[CANCELLED],
+                'mean_wait_seconds': self._wait_seconds / started if started else 0.0,
+                'mean_run_seconds': self._run_seconds / finished if finished else 0.0
+            }
+
+    def get_prometheus_metrics(self, prefix: str = 'land_use') -> str:
+        """
+        מדדי התור בפורמט הטקסט של Prometheus
+        """
+        metrics = self.get_metrics()
+        gauges = [
+            ('job_queue_depth', 'gauge', 'Jobs waiting for a worker', 'queue_depth'),
+            ('job_workers', 'gauge', 'Job worker pool size', 'workers'),
+            ('job_workers_busy', 'gauge', 'Workers currently running a job', 'busy_workers'),
+            ('job_worker_utilization', 'gauge', 'Share of worker time spent running jobs', 'utilization'),
+            ('jobs_submitted_total', 'counter', 'Jobs accepted into the queue', 'submitted'),
+            ('jobs_rejected_total', 'counter', 'Jobs rejected because the queue was full', 'rejected'),
+            ('jobs_completed_total', 'counter', 'Jobs that finished successfully', 'completed'),
+            ('jobs_failed_total', 'counter', 'Jobs that raised an error', 'failed'),
+            ('jobs_cancelled_total', 'counter', 'Jobs cancelled before or while running', 'cancelled')
+        ]
+
+        lines = []
+        for metric, metric_type, description, field in gauges:
+            lines.append(f"# HELP {prefix}_{metric} {description}")
+            lines.append(f"# TYPE {prefix}_{metric} {metric_type}")
+            lines.append(f"{prefix}_{metric} {metrics[field]}")
+        return '\n'.join(lines) + '\n'
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        """
+        עצירת העובדים - אחרי שהתור מתרוקן, או מיד עם ביטול העבודות הממתינות
+        """
+        with self._condition:
+            self._shutdown = True
+            if cancel_pending:
+                for _, _, job, _, _, _ in self._heap:
+                    job.cancel()
+            self._condition.notify_all()
+            workers = list(self._workers)
+
+        if wait:
+            for worker in workers:
+                worker.join()
+
+# התור המשותף לתהליך - נוצר בשימוש הראשון
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """
+    התור המשותף לכל ה-sessions בתהליך
+    """
+    global _job_queue
+
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
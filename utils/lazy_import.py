@@ -0,0 +1,43 @@
+"""
+טעינה עצלה של מודולים כבדים
+מודול כמו ee או pandas נטען רק בגישה הראשונה לתכונה שלו, כך שייבוא
+מודולי העזר (ובפרט app.py) לא משלם על תלויות של מצב עבודה שלא נבחר
+"""
+
+import importlib
+import threading
+from types import ModuleType
+
+class LazyModule:
+    """
+    ממלא מקום למודול שנטען בגישה הראשונה לתכונה שלו
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        """טעינת המודול (פעם אחת)"""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_module(name: str) -> LazyModule:
+    """
+    מודול שנטען רק בשימוש הראשון
+
+    Example:
+        ee = lazy_module('ee')  # ee.Initialize() טוען את earthengine-api
+    """
+    return LazyModule(name)
@@ -0,0 +1,76 @@
+"""
+צנרת ניתוח תמונה מקומית כעבודה ברקע
+טעינה, סיווג ישירות למאגר הרסטרים, שכבת תצוגה, התייחסות גיאוגרפית,
+סטטיסטיקות ושמירה במטמון התוצאות - עם דיווח התקדמות ונקודות ביטול
+לתור העבודות (utils.job_queue)
+"""
+
+import os
+from typing import Dict, Optional
+import config
+from utils.image_processing import (load_raster, get_display_image, read_image_size, classify_image,
+                                    create_classification_overlay, read_georeference,
+                                    scale_georeference, get_rgb_classification_stats)
+from utils.job_queue import Job
+from utils.result_cache import create_result_array, store_result
+
+# חלק ההתקדמות של כל שלב - הסיווג הוא רוב העבודה
+LOAD_PROGRESS = 0.1
+CLASSIFY_PROGRESS = 0.85
+
+def analyze_local_image(job: Optional[Job], data, result_key: str, gsd_m: float,
+                        alpha: float = 0.6) -> Optional[Dict]:
+    """
+    ניתוח תמונה מקומית ושמירת התוצאה במטמון
+
+    Args:
+        job: העבודה בתור - לדיווח התקדמות ולביטול (None להרצה ישירה)
+        data: בתים של קובץ התמונה
+        result_key: מפתח המטמון (make_result_key)
+        gsd_m: גודל פיקסל בשטח בקובץ המקורי, לתמונות ללא התייחסות גיאוגרפית
+        alpha: שקיפות שכבת הסיווג
+
+    Returns:
+        התוצאה השמורה (ראו store_result), או None אם לא ניתן לטעון את התמונה
+    """
+    def report(fraction: float, message: str = None) -> None:
+        if job is not None:
+            job.set_progress(fraction, message)
+
+    report(0.0, "טוען תמונה...")
+    # טעינה ישירה בגודל העיבוד - הקטנה ברמת המפענח
+    image = load_raster(data, config.MAX_IMAGE_SIZE)
+    if image is None:
+        return None
+
+    report(LOAD_PROGRESS, "מסווג...")
+    # סיווג ישירות למערך במאגר הרסטרים בדיסק - הסטטיסטיקות, שכבת התצוגה
+    # והייצוא קוראים ממנו, וה-session לא מחזיק את הפיקסלים
+    classification = create_result_array(result_key, 'classification', image.shape[:2])
+    try:
+        classify_image(image, out=classification,
+                       progress=lambda done: report(LOAD_PROGRESS + done * (CLASSIFY_PROGRESS - LOAD_PROGRESS)))
+
+        report(CLASSIFY_PROGRESS, "יוצר שכבת תצוגה...")
+        preview = get_display_image(image, config.OVERLAY_PREVIEW_SIZE)
+        overlay = create_classification_overlay(image, classification, alpha=alpha,
+                                                max_size=config.OVERLAY_PREVIEW_SIZE)
+
+        # התייחסות גיאוגרפית של מקור GeoTIFF, מותאמת לגודל מפת הסיווג
+        georef = read_georeference(data)
+        if georef is not None:
+            georef = scale_georeference(georef, classification.shape[1], classification.shape[0])
+
+        # סטטיסטיקות - שטח אמיתי לפי ה-geotransform עבור GeoTIFF, אחרת לפי
+        # גודל הפיקסל שהוזן, מותאם להקטנת התמונה לפני הסיווג
+        report(0.95, "מחשב סטטיסטיקות...")
+        source_size = read_image_size(data) or image.shape[:2]
+        scaled_gsd_m = gsd_m * max(source_size) / max(classification.shape)
+        stats = get_rgb_classification_stats(classification, georef, scaled_gsd_m)
+
+        return store_result(result_key, classification, overlay, stats, preview, georef)
+    except BaseException:
+        # עבודה שבוטלה או נכשלה לא משאירה מערך זמני במאגר
+        if os.path.exists(classification.filename):
+            os.remove(classification.filename)
+        raise
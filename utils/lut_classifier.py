@@ -0,0 +1,115 @@
+"""
+מסווג מבוסס טבלת חיפוש (LUT)
+הסיווג של classify_rgb_image תלוי רק בשלשת (r, g, b) של כל פיקסל,
+ולכן ניתן לחשב אותו מראש לכל 2^24 הצבעים ולסווג תמונה בפעולת gather אחת
+"""
+
+import os
+import numpy as np
+from typing import Dict
+import config
+from utils.image_processing import classify_rgb_image, get_classifier_fingerprint
+
+LUT_SIZE = 1 << 24
+
+# מספר פיקסלים מקסימלי למקטע אינדקסים זמני בעת הסיווג
+LUT_CHUNK_PIXELS = 1 << 20
+
+# טבלאות טעונות לפי טביעת אצבע של הגדרות הסיווג
+_loaded_luts: Dict[str, np.ndarray] = {}
+
+def get_lut_path(fingerprint: str = None) -> str:
+    """
+    נתיב קובץ הטבלה במטמון עבור הגדרות הסיווג הנוכחיות
+    """
+    if fingerprint is None:
+        fingerprint = get_classifier_fingerprint()
+    return os.path.join(config.CACHE_DIR, f"rgb_lut_{fingerprint}.npy")
+
+def build_rgb_lut() -> np.ndarray:
+    """
+    בניית טבלת הסיווג על ידי הרצת classify_rgb_image על כל הצבעים האפשריים
+    """
+    lut = np.empty(LUT_SIZE, dtype=np.uint8)
+
+    # מישור של כל צירופי (g, b) - שורה לכל g ועמודה לכל b
+    plane = np.empty((256, 256, 3), dtype=np.uint8)
+    plane[:, :, 1] = np.arange(256, dtype=np.uint8)[:, None]
+    plane[:, :, 2] = np.arange(256, dtype=np.uint8)[None, :]
+
+    for r in range(256):
+        plane[:, :, 0] = r
+        lut[r << 16:(r + 1) << 16] = classify_rgb_image(plane).ravel()
+
+    return lut
+
+def get_rgb_lut() -> np.ndarray:
+    """
+    טעינת טבלת הסיווג מהזיכרון או מהדיסק, ובנייה מחדש אם ההגדרות השתנו
+    """
+    fingerprint = get_classifier_fingerprint()
+
+    lut = _loaded_luts.get(fingerprint)
+    if lut is not None:
+        return lut
+
+    lut_path = get_lut_path(fingerprint)
+
+    if os.path.exists(lut_path):
+        try:
+            lut = np.load(lut_path)
+            if lut.shape != (LUT_SIZE,) or lut.dtype != np.uint8:
+                lut = None
+        except Exception as e:
+            print(f"⚠️ Corrupt LUT cache, rebuilding: {e}")
+            lut = None
+
+    if lut is None:
+        lut = build_rgb_lut()
+
+        try:
+            os.makedirs(config.CACHE_DIR, exist_ok=True)
+            tmp_path = f"{lut_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, lut)
+            os.replace(tmp_path, lut_path)
+        except Exception as e:
+            print(f"⚠️ Could not save LUT cache: {e}")
+
+    _loaded_luts.clear()
+    _loaded_luts[fingerprint] = lut
+    return lut
+
+def classify_rgb_image_lut(image: np.ndarray) -> np.ndarray:
+    """
+    סיווג תמונה RGB באמצעות טבלת החיפוש - פלט זהה ל-classify_rgb_image
+    """
+    # תמונות שאינן RGB בשמונה ביט עוברות למסווג הרגיל
+    if image.ndim != 3 or image.shape[2] != 3 or image.dtype != np.uint8:
+        return classify_rgb_image(image)
+
+    try:
+        lut = get_rgb_lut()
+
+        height, width = image.shape[:2]
+        classification = np.empty((height, width), dtype=np.uint8)
+
+        # עיבוד במקטעי שורות כדי שמערך האינדקסים הזמני יישאר קטן
+        rows_per_chunk = max(1, LUT_CHUNK_PIXELS // max(width, 1))
+
+        for start in range(0, height, rows_per_chunk):
+            chunk = image[start:start + rows_per_chunk]
+
+            index = chunk[:, :, 0].astype(np.uint32)
+            index <<= 8
+            index |= chunk[:, :, 1]
+            index <<= 8
+            index |= chunk[:, :, 2]
+
+            np.take(lut, index, out=classification[start:start + rows_per_chunk])
+
+        return classification
+
+    except Exception as e:
+        print(f"❌ Error in LUT classification: {e}")
+        return np.zeros(image.shape[:2], dtype=np.uint8)
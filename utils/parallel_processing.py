@@ -0,0 +1,119 @@
+"""
+מודול עיבוד מקבילי
+סיווג תמונה ברצועות שורות במאגר תהליכים, כאשר הפיקסלים מועברים
+דרך זיכרון משותף (multiprocessing.shared_memory) ולא ב-pickle
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+import config
+from utils.image_processing import classify_rgb_image, count_classes, stats_from_counts, CLASS_COUNT_BINS
+
+def get_worker_count(workers: int = None) -> int:
+    """
+    מספר תהליכי העבודה - ברירת מחדל לפי ההגדרות או מספר הליבות
+    """
+    if workers is None:
+        workers = config.PARALLEL_WORKERS or os.cpu_count() or 1
+    return max(1, int(workers))
+
+def split_row_bands(height: int, workers: int, min_rows: int = None) -> List[Tuple[int, int]]:
+    """
+    חלוקת שורות התמונה לרצועות רציפות בגודל דומה
+    """
+    if min_rows is None:
+        min_rows = config.PARALLEL_MIN_BAND_ROWS
+
+    band_count = max(1, min(workers, height // max(min_rows, 1)))
+    edges = np.linspace(0, height, band_count + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(edges[:-1], edges[1:]) if end > start]
+
+def _classify_band(input_name: str, output_name: str,
+                   shape: Tuple[int, ...], dtype: str,
+                   start: int, end: int,
+                   classifier: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """
+    סיווג רצועת שורות בתהליך עבודה - קריאה וכתיבה ישירות לזיכרון המשותף
+    """
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+
+    try:
+        image = np.ndarray(shape, dtype=dtype, buffer=input_shm.buf)
+        output = np.ndarray(shape[:2], dtype=np.uint8, buffer=output_shm.buf)
+
+        classification = classifier(image[start:end])
+        output[start:end] = classification
+
+        counts = count_classes(classification)
+
+        # שחרור ההפניות לבאפר לפני סגירת הזיכרון המשותף
+        del image, output, classification
+        return counts
+
+    finally:
+        input_shm.close()
+        output_shm.close()
+
+def classify_rgb_image_parallel(image: np.ndarray,
+                                workers: int = None,
+                                classifier: Callable[[np.ndarray], np.ndarray] = classify_rgb_image
+                                ) -> Tuple[Optional[np.ndarray], Dict]:
+    """
+    סיווג תמונה RGB ברצועות שורות במקביל
+
+    Args:
+        image: תמונת הקלט
+        workers: מספר תהליכי עבודה
+        classifier: פונקציית סיווג לרצועה בודדת (חייבת להיות ברמת מודול)
+
+    Returns:
+        מפת הסיווג וסטטיסטיקות מצטברות מכל הרצועות
+    """
+    workers = get_worker_count(workers)
+    bands = split_row_bands(image.shape[0], workers)
+
+    # תמונה קטנה או תהליך יחיד - אין טעם בהקמת מאגר תהליכים
+    if len(bands) <= 1:
+        classification = classifier(image)
+        return classification, stats_from_counts(count_classes(classification))
+
+    input_shm = None
+    output_shm = None
+
+    try:
+        image = np.ascontiguousarray(image)
+        input_shm = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+        output_shm = shared_memory.SharedMemory(create=True, size=max(image.shape[0] * image.shape[1], 1))
+
+        shared_image = np.ndarray(image.shape, dtype=image.dtype, buffer=input_shm.buf)
+        shared_image[...] = image
+        del shared_image
+
+        counts = np.zeros(CLASS_COUNT_BINS, dtype=np.int64)
+
+        with ProcessPoolExecutor(max_workers=len(bands)) as executor:
+            futures = [
+                executor.submit(_classify_band, input_shm.name, output_shm.name,
+                                image.shape, image.dtype.str, start, end, classifier)
+                for start, end in bands
+            ]
+            for future in futures:
+                counts += future.result()
+
+        classification = np.ndarray(image.shape[:2], dtype=np.uint8, buffer=output_shm.buf).copy()
+
+        return classification, stats_from_counts(counts)
+
+    except Exception as e:
+        print(f"❌ Error in parallel classification: {e}")
+        return None, {}
+
+    finally:
+        for shm in (input_shm, output_shm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
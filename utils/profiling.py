@@ -0,0 +1,274 @@
+"""
+מדידת ביצועים לפי שלב בצנרת העיבוד
+כל שלב (פענוח, הקטנה, סיווג, סטטיסטיקות, שכבת תצוגה, בקשות Earth Engine)
+נמדד בזמן אמיתי, זמן CPU ושיא הקצאות (tracemalloc). המדידות זמינות כסיכום
+לפי שלב, כ-JSON מובנה וכמדדים בפורמט Prometheus.
+כשהמדידה כבויה כל שלב עולה בדיקת דגל אחת בלבד.
+המדידה היא הגדרה של התהליך כולו (config.PROFILING_ENABLED), כי tracemalloc
+ושיא ההקצאות שלו משותפים לכל ה-threads: שלבים שרצים במקביל (עובדי תור
+העבודות, שרת האריחים, בקשות Earth Engine, sessions אחרים) לא ניתנים להפרדה,
+ולכן שיא זיכרון נרשם רק לשלב שלא חפף לשלב ב-thread אחר
+"""
+
+import functools
+import json
+import re
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Deque, Dict, List, Optional
+import numpy as np
+import config
+
+# מצב המדידה - משותף לכל התהליך
+_enabled = config.PROFILING_ENABLED
+_trace_memory = config.PROFILING_TRACE_MEMORY
+_started_tracemalloc = False
+
+# מדידות אחרונות ומונים מצטברים לפי שלב
+_records: Deque[Dict] = deque(maxlen=config.PROFILING_HISTORY)
+_totals: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+# שלבים פתוחים לפי thread - לחישוב שיא הזיכרון של שלבים מקוננים ולזיהוי חפיפה
+_open_stages: Dict[int, List[Dict]] = {}
+
+_NULL_STAGE = nullcontext()
+
+def set_profiling(enabled: bool, trace_memory: bool = None) -> None:
+    """
+    הפעלה או כיבוי של המדידה לכל התהליך (benchmark, בדיקות, הגדרת סביבה) - לא
+    להפעלה מ-session בודד, כי הכיבוי עוצר את tracemalloc גם לשלבים של אחרים
+
+    Args:
+        enabled: מדידת זמנים לכל שלב
+        trace_memory: מדידת שיא הקצאות (מאט הקצאות בזמן שהוא פעיל)
+    """
+    global _enabled, _trace_memory, _started_tracemalloc
+
+    if trace_memory is None:
+        trace_memory = _trace_memory
+
+    with _lock:
+        _enabled = bool(enabled)
+        _trace_memory = bool(trace_memory)
+
+        if _enabled and _trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracemalloc = True
+        elif (not _enabled or not _trace_memory) and _started_tracemalloc:
+            # עוצרים רק מעקב שהופעל כאן, ולא מעקב של benchmark או של המשתמש
+            tracemalloc.stop()
+            _started_tracemalloc = False
+
+def is_profiling_enabled() -> bool:
+    """האם המדידה פעילה"""
+    return _enabled
+
+def record_stage(name: str, wall_seconds: float, cpu_seconds: Optional[float] = None,
+                 peak_bytes: Optional[int] = None, success: bool = True) -> None:
+    """
+    רישום מדידה של שלב (גם למדידות שנאספו מחוץ ל-stage, כמו זמני בקשות Earth Engine)
+    """
+    record = {
+        'stage': name,
+        'timestamp': time.time(),
+        'wall_seconds': wall_seconds,
+        'cpu_seconds': cpu_seconds,
+        'peak_bytes': peak_bytes,
+        'success': success
+    }
+
+    with _lock:
+        _records.append(record)
+
+        totals = _totals.setdefault(name, {'calls': 0, 'failures': 0, 'wall_seconds': 0.0,
+                                           'cpu_seconds': 0.0, 'peak_bytes': 0})
+        totals['calls'] += 1
+        totals['failures'] += not success
+        totals['wall_seconds'] += wall_seconds
+        totals['cpu_seconds'] += cpu_seconds or 0.0
+        totals['peak_bytes'] = max(totals['peak_bytes'], peak_bytes or 0)
+
+        if config.PROFILING_LOG_PATH:
+            try:
+                with open(config.PROFILING_LOG_PATH, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+            except OSError as e:
+                print(f"⚠️ Could not write profiling log: {e}")
+
+def _fold_peak(open_stages: List[Dict]) -> None:
+    """
+    העברת שיא ההקצאות מאז האיפוס האחרון לכל השלבים הפתוחים, ואיפוס השיא
+
+    האיפוס משפיע על כל התהליך - נקרא רק כשאין שלב פתוח ב-thread אחר
+    """
+    _, peak = tracemalloc.get_traced_memory()
+    for open_stage in open_stages:
+        open_stage['peak'] = max(open_stage['peak'], peak)
+    tracemalloc.reset_peak()
+
+@contextmanager
+def _measure(name: str):
+    """מדידת שלב פעיל"""
+    trace = _trace_memory and tracemalloc.is_tracing()
+    thread_id = threading.get_ident()
+    current = {'peak': 0, 'start': 0, 'overlapped': False}
+
+    with _lock:
+        open_stages = _open_stages.setdefault(thread_id, [])
+        others = [other for other_id, stages in _open_stages.items() if other_id != thread_id
+                  for other in stages]
+        if others:
+            # שלב פתוח ב-thread אחר - השיא המשותף לא ניתן לייחוס לאף אחד מהשלבים
+            for open_stage in others + open_stages:
+                open_stage['overlapped'] = True
+            current['overlapped'] = True
+        elif trace:
+            _fold_peak(open_stages)
+            current['start'] = tracemalloc.get_traced_memory()[0]
+        open_stages.append(current)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    success = False
+    try:
+        yield
+        success = True
+    finally:
+        wall_seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+
+        peak_bytes = None
+        with _lock:
+            if trace and not current['overlapped'] and tracemalloc.is_tracing():
+                _fold_peak(open_stages)
+                peak_bytes = max(0, current['peak'] - current['start'])
+            open_stages.pop()
+            if not open_stages:
+                del _open_stages[thread_id]
+
+        record_stage(name, wall_seconds, cpu_seconds, peak_bytes, success)
+
+def stage(name: str):
+    """
+    מדידת קטע קוד כשלב בשם name
+
+    Example:
+        with stage('render.charts'):
+            st.plotly_chart(fig)
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return _measure(name)
+
+def profiled(name: str) -> Callable:
+    """
+    מדידת כל קריאה לפונקציה כשלב בשם name
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _measure(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def get_request_stage_name(request_name: str) -> str:
+    """
+    שם שלב לבקשת Earth Engine - בלי אינדקס המקטע/האריח, כדי שמספר השלבים יישאר קטן
+    """
+    return 'ee.' + re.sub(r'\[.*\]$', '', request_name)
+
+def get_stage_records() -> List[Dict]:
+    """
+    המדידות האחרונות (עד PROFILING_HISTORY)
+    """
+    with _lock:
+        return list(_records)
+
+def get_stage_summary() -> Dict[str, Dict]:
+    """
+    סיכום לפי שלב - מונים מצטברים ואחוזוני זמן על המדידות האחרונות
+    """
+    with _lock:
+        records = list(_records)
+        totals = {name: dict(values) for name, values in _totals.items()}
+
+    wall_by_stage: Dict[str, List[float]] = {}
+    for record in records:
+        wall_by_stage.setdefault(record['stage'], []).append(record['wall_seconds'])
+
+    summary = {}
+    for name, values in sorted(totals.items()):
+        latencies = np.array(wall_by_stage.get(name, [0.0]))
+        summary[name] = {
+            **values,
+            'mean_seconds': values['wall_seconds'] / values['calls'],
+            'p50_seconds': float(np.percentile(latencies, 50)),
+            'p95_seconds': float(np.percentile(latencies, 95)),
+            'max_seconds': float(latencies.max())
+        }
+    return summary
+
+def get_metrics_json(include_records: bool = False) -> str:
+    """
+    המדידות כ-JSON מובנה - סיכום לפי שלב, ולפי בקשה גם המדידות עצמן
+    """
+    payload = {'enabled': _enabled, 'trace_memory': _trace_memory, 'stages': get_stage_summary()}
+    if include_records:
+        payload['records'] = get_stage_records()
+    return json.dumps(payload, indent=2)
+
+def _escape_label(value: str) -> str:
+    """בריחת ערך תווית בפורמט Prometheus"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def get_prometheus_metrics(prefix: str = 'land_use') -> str:
+    """
+    המדידות בפורמט הטקסט של Prometheus
+    """
+    summary = get_stage_summary()
+
+    metrics = [
+        ('stage_calls_total', 'counter', 'Completed pipeline stage calls', 'calls'),
+        ('stage_failures_total', 'counter', 'Pipeline stage calls that raised', 'failures'),
+        ('stage_wall_seconds_total', 'counter', 'Wall time spent in pipeline stages', 'wall_seconds'),
+        ('stage_cpu_seconds_total', 'counter', 'Process CPU time spent in pipeline stages', 'cpu_seconds'),
+        ('stage_peak_bytes', 'gauge', 'Largest traced allocation peak of a stage call that did not overlap '
+         'another thread', 'peak_bytes')
+    ]
+
+    lines = []
+    for metric, metric_type, description, field in metrics:
+        lines.append(f"# HELP {prefix}_{metric} {description}")
+        lines.append(f"# TYPE {prefix}_{metric} {metric_type}")
+        for name, values in summary.items():
+            lines.append(f'{prefix}_{metric}{{stage="{_escape_label(name)}"}} {values[field]}')
+
+    lines.append(f"# HELP {prefix}_stage_wall_seconds Recent wall time quantiles per stage")
+    lines.append(f"# TYPE {prefix}_stage_wall_seconds summary")
+    for name, values in summary.items():
+        label = _escape_label(name)
+        lines.append(f'{prefix}_stage_wall_seconds{{stage="{label}",quantile="0.5"}} {values["p50_seconds"]}')
+        lines.append(f'{prefix}_stage_wall_seconds{{stage="{label}",quantile="0.95"}} {values["p95_seconds"]}')
+        lines.append(f'{prefix}_stage_wall_seconds_sum{{stage="{label}"}} {values["wall_seconds"]}')
+        lines.append(f'{prefix}_stage_wall_seconds_count{{stage="{label}"}} {values["calls"]}')
+
+    return '\n'.join(lines) + '\n'
+
+def clear_stage_records() -> None:
+    """
+    מחיקת כל המדידות
+    """
+    with _lock:
+        _records.clear()
+        _totals.clear()
+
+# הפעלת מעקב הזיכרון כשהמדידה מופעלת מהסביבה
+if _enabled:
+    set_profiling(True)
@@ -0,0 +1,119 @@
+"""
+מודול כתיבת רסטרים
+שמירת מפות סיווג כ-Cloud Optimized GeoTIFF - אריחים, דחיסה וסקירות פנימיות
+(overviews) בדגימת mode, כך שתצוגה מוקטנת קוראת רק את רמת הסקירה הדרושה
+"""
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as copy_dataset
+from typing import Dict, List, Optional
+import config
+from utils.image_processing import get_class_palette
+
+def get_overview_factors(width: int, height: int, block_size: int = None) -> List[int]:
+    """
+    מקדמי הקטנה לסקירות - חזקות של 2 עד שהרמה האחרונה נכנסת בבלוק אחד
+    """
+    if block_size is None:
+        block_size = config.OUTPUT_BLOCK_SIZE
+
+    factors = []
+    factor = 2
+    while max(width, height) / (factor // 2) > block_size:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+def get_class_colormap() -> Dict[int, tuple]:
+    """
+    טבלת צבעים למחלקות, להצגה ישירה של מפת הסיווג בתוכנות GIS
+    """
+    palette = get_class_palette()
+    return {class_info['id']: tuple(int(c) for c in palette[class_info['id']]) + (255,)
+            for class_info in config.LAND_USE_CLASSES.values()}
+
+def build_mode_overviews(dataset, block_size: int = None) -> None:
+    """
+    בניית סקירות פנימיות בדגימת mode - כל פיקסל בסקירה מקבל את המחלקה השכיחה
+    """
+    factors = get_overview_factors(dataset.width, dataset.height, block_size)
+    if factors:
+        dataset.build_overviews(factors, Resampling.mode)
+
+def copy_as_cog(dataset, output_path: str, block_size: int = None) -> None:
+    """
+    העתקת קובץ עם סקירות לפריסת COG - אריחים וסקירות לפני הנתונים (COPY_SRC_OVERVIEWS)
+    """
+    if block_size is None:
+        block_size = config.OUTPUT_BLOCK_SIZE
+
+    copy_dataset(dataset, output_path, driver='GTiff',
+                 copy_src_overviews=True,
+                 tiled=True,
+                 blockxsize=block_size,
+                 blockysize=block_size,
+                 compress='deflate')
+
+def write_classification_cog(classification: np.ndarray,
+                             output_path: str,
+                             georef: Optional[Dict] = None,
+                             block_size: int = None) -> bool:
+    """
+    כתיבת מפת סיווג כ-COG
+
+    Args:
+        classification: מפת הסיווג
+        output_path: נתיב קובץ הפלט
+        georef: התייחסות גיאוגרפית (read_georeference), מועתקת מקובץ המקור
+        block_size: גודל בלוק פנימי
+
+    Returns:
+        האם הכתיבה הצליחה
+    """
+    if block_size is None:
+        block_size = config.OUTPUT_BLOCK_SIZE
+
+    height, width = classification.shape
+
+    profile = {
+        'driver': 'GTiff',
+        'width': width,
+        'height': height,
+        'count': 1,
+        'dtype': 'uint8',
+        'crs': georef['crs'] if georef else None,
+        'transform': georef['transform'] if georef else None,
+        'tiled': True,
+        'blockxsize': block_size,
+        'blockysize': block_size,
+        'compress': 'deflate'
+    }
+
+    try:
+        # בניית הסקירות בקובץ זמני בזיכרון, ואז העתקה לפריסת COG
+        with MemoryFile() as memfile:
+            with memfile.open(**profile) as tmp:
+                tmp.write(classification, 1)
+                build_mode_overviews(tmp, block_size)
+                # טבלת הצבעים אחרי הסקירות - GDAL מזהיר על סקירות בערוץ palette
+                tmp.write_colormap(1, get_class_colormap())
+
+            with memfile.open() as tmp:
+                copy_as_cog(tmp, output_path, block_size)
+        return True
+
+    except Exception as e:
+        print(f"❌ Error writing COG: {e}")
+        return False
+
+def classification_to_cog_bytes(classification: np.ndarray, georef: Optional[Dict] = None) -> Optional[bytes]:
+    """
+    יצירת COG בזיכרון - להורדה ישירה מהדפדפן ללא קובץ זמני בדיסק
+    """
+    with MemoryFile() as output:
+        if not write_classification_cog(classification, output.name, georef):
+            return None
+        return output.read()
@@ -0,0 +1,189 @@
+"""
+מאגר רסטרים בדיסק מבוסס np.memmap
+כל רשומה היא תיקייה עם מערך .npy לכל רסטר (סיווג, שכבת תצוגה, תמונה מוקטנת)
+וקובץ meta.json. מערכים נכתבים במקטעי שורות ונפתחים לקריאה בלבד כ-memmap,
+כך שסטטיסטיקות, שכבת התצוגה והייצוא חולקים את אותם דפים ממטמון מערכת
+ההפעלה, וה-session מחזיק ידית לקובץ ולא את הפיקסלים בזיכרון התהליך.
+הפינוי לפי מגבלת נפח הדיסק, מהרשומה שלא נגישה זמן רב ביותר
+"""
+
+import json
+import os
+import shutil
+import threading
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+META_FILE = 'meta.json'
+
+# גודל מקטע בהעתקה למערך בדיסק
+STORE_CHUNK_BYTES = 16 * 1024 * 1024
+
+def get_entry_dir(root: str, key: str) -> str:
+    """תיקיית רשומה במאגר"""
+    return os.path.join(root, key)
+
+def get_entry_file(root: str, key: str, filename: str) -> str:
+    """
+    נתיב לקובץ נלווה ברשומה (למשל COG להורדה) - נספר במגבלת הנפח ונמחק עם הרשומה
+    """
+    entry_dir = get_entry_dir(root, key)
+    os.makedirs(entry_dir, exist_ok=True)
+    return os.path.join(entry_dir, filename)
+
+def _get_array_path(root: str, key: str, name: str) -> str:
+    return os.path.join(get_entry_dir(root, key), f"{name}.npy")
+
+def _get_tmp_path(path: str) -> str:
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def create_array(root: str, key: str, name: str, shape: Tuple[int, ...], dtype) -> np.memmap:
+    """
+    מערך חדש בדיסק לכתיבה ישירה (למשל פלט הסיווג) - נשמר ברשומה ב-save_entry
+    """
+    os.makedirs(get_entry_dir(root, key), exist_ok=True)
+    return np.lib.format.open_memmap(_get_tmp_path(_get_array_path(root, key, name)),
+                                     mode='w+', dtype=dtype, shape=tuple(shape))
+
+def _write_array(path: str, array: np.ndarray) -> None:
+    """
+    העתקת מערך לקובץ .npy במקטעי שורות
+    """
+    array = np.asarray(array)
+    target = np.lib.format.open_memmap(path, mode='w+', dtype=array.dtype, shape=array.shape)
+
+    if array.ndim == 0 or array.size == 0:
+        target[...] = array
+    else:
+        row_bytes = max(1, array[0].nbytes)
+        rows = max(1, STORE_CHUNK_BYTES // row_bytes)
+        for start in range(0, array.shape[0], rows):
+            target[start:start + rows] = array[start:start + rows]
+
+    target.flush()
+    del target
+
+def save_entry(root: str, key: str, arrays: Dict[str, Optional[np.ndarray]], meta: Dict) -> None:
+    """
+    שמירת רשומה - מערכים ו-meta.json
+
+    מערך שנוצר ב-create_array מועבר למקומו ללא העתקה; כל קובץ נכתב לקובץ זמני
+    ומוחלף אטומית, ו-meta.json נכתב אחרון ומסמן שהרשומה שלמה
+    """
+    entry_dir = get_entry_dir(root, key)
+    os.makedirs(entry_dir, exist_ok=True)
+
+    for name, array in arrays.items():
+        if array is None:
+            continue
+
+        path = _get_array_path(root, key, name)
+        tmp_path = _get_tmp_path(path)
+        if (isinstance(array, np.memmap) and array.filename == os.path.abspath(tmp_path)
+                and os.path.exists(tmp_path)):
+            array.flush()
+        else:
+            _write_array(tmp_path, array)
+        os.replace(tmp_path, path)
+
+    meta = dict(meta, arrays=sorted(name for name, array in arrays.items() if array is not None))
+    meta_path = os.path.join(entry_dir, META_FILE)
+    tmp_path = _get_tmp_path(meta_path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+def open_entry(root: str, key: str) -> Optional[Dict]:
+    """
+    פתיחת רשומה - meta ומערכים כ-memmap לקריאה בלבד
+
+    Returns:
+        מילון עם meta ו-arrays, או None אם הרשומה לא קיימת או לא שלמה
+    """
+    entry_dir = get_entry_dir(root, key)
+    meta_path = os.path.join(entry_dir, META_FILE)
+
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(_get_array_path(root, key, name), mmap_mode='r')
+                  for name in meta['arrays']}
+        # עדכון זמן הגישה כדי שהפינוי יהיה לפי שימוש אחרון
+        os.utime(meta_path)
+    except FileNotFoundError:
+        return None
+
+    return {'meta': meta, 'arrays': arrays}
+
+def _get_entry_size(entry_dir: str) -> int:
+    """נפח כל הקבצים ברשומה"""
+    total = 0
+    for name in os.listdir(entry_dir):
+        try:
+            total += os.stat(os.path.join(entry_dir, name)).st_size
+        except OSError:
+            continue
+    return total
+
+def evict_entries(root: str, max_bytes: int) -> None:
+    """
+    מחיקת הרשומות הישנות ביותר (לפי זמן גישה אחרון) עד למגבלת הנפח
+
+    רשומה בכתיבה (ללא meta.json) לא נמחקת. ממפה פתוח של רשומה שנמחקה
+    ממשיך לעבוד עד שהוא נסגר, כי הקובץ נשאר עד לשחרור המיפוי
+    """
+    if not os.path.isdir(root):
+        return
+
+    entries = []
+    total = 0
+    for key in os.listdir(root):
+        entry_dir = os.path.join(root, key)
+        if not os.path.isdir(entry_dir):
+            continue
+        try:
+            size = _get_entry_size(entry_dir)
+            accessed = os.stat(os.path.join(entry_dir, META_FILE)).st_mtime
+        except OSError:
+            continue
+        total += size
+        entries.append((accessed, size, entry_dir))
+
+    for _, size, entry_dir in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
+
+def evict_files(root: str, max_bytes: int) -> None:
+    """
+    מחיקת הקבצים הישנים ביותר תחת root (לפי זמן גישה אחרון) עד למגבלת הנפח
+
+    למטמונים של קבצים בודדים (אריחים) - פגיעה במטמון מעדכנת את זמן השינוי
+    של הקובץ. קבצים זמניים בכתיבה לא נמחקים, ותיקייה שהתרוקנה נמחקת
+    """
+    entries = []
+    for dir_path, _, names in os.walk(root):
+        for name in names:
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(dir_path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            continue
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
@@ -0,0 +1,191 @@
+"""
+מטמון תוצאות סיווג
+תוצאות מאוחסנות לפי גיבוב תוכן הקובץ שהועלה והגדרות הסיווג, בשתי שכבות:
+שכבת LRU בזיכרון ומאגר רסטרים בדיסק (raster_store) עם מגבלת נפח ופינוי
+הרשומות הישנות. המערכים של תוצאה נפתחים מהדיסק כ-memmap לקריאה בלבד,
+כך ששכבת הזיכרון וה-sessions מחזיקים ידיות לקבצים ולא את הפיקסלים
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from typing import Dict, Optional, Tuple
+import config
+from utils.image_processing import get_classifier_fingerprint
+from utils.raster_store import create_array, evict_entries, get_entry_file, open_entry, save_entry
+
+# שכבת הזיכרון - משותפת לכל המשתמשים של תהליך Streamlit
+_memory_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_memory_bytes = 0
+_lock = threading.Lock()
+
+def get_result_cache_dir() -> str:
+    """
+    תיקיית שכבת הדיסק של המטמון
+    """
+    return os.path.join(config.CACHE_DIR, 'results')
+
+def make_result_key(data, **params) -> str:
+    """
+    מפתח מטמון מתוכן הקובץ, הגדרות הסיווג, צבעי המחלקות ופרמטרי העיבוד
+    """
+    digest = hashlib.sha256(data)
+    digest.update(get_classifier_fingerprint().encode('utf-8'))
+    # צבעי המחלקות נצרבים בשכבת התצוגה השמורה
+    colors = {name: info['color'] for name, info in config.LAND_USE_CLASSES.items()}
+    digest.update(json.dumps(colors, sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def _georef_to_json(georef: Optional[Dict]) -> str:
+    """
+    סריאליזציה של התייחסות גיאוגרפית לשמירה בקובץ המטמון
+    """
+    if georef is None:
+        return json.dumps(None)
+    return json.dumps({
+        'crs': georef['crs'].to_wkt(),
+        'transform': list(georef['transform'])[:6],
+        'width': georef['width'],
+        'height': georef['height']
+    })
+
+def _georef_from_json(payload: str) -> Optional[Dict]:
+    """
+    שחזור התייחסות גיאוגרפית מקובץ המטמון
+    """
+    data = json.loads(payload)
+    if data is None:
+        return None
+    
+    from rasterio.crs import CRS
+    from rasterio.transform import Affine
+    
+    return {
+        'crs': CRS.from_wkt(data['crs']),
+        'transform': Affine(*data['transform']),
+        'width': data['width'],
+        'height': data['height']
+    }
+
+def _result_nbytes(result: Dict) -> int:
+    """
+    נפח המערכים של תוצאה בזיכרון התהליך - מערך memmap נשאר בדיסק ולא נספר
+    """
+    return sum(value.nbytes for value in result.values()
+               if isinstance(value, np.ndarray) and not isinstance(value, np.memmap))
+
+def _remember(key: str, result: Dict) -> None:
+    """
+    הכנסת תוצאה לשכבת הזיכרון ופינוי הפריטים שלא נגישו זמן רב ביותר
+    """
+    global _memory_bytes
+
+    size = _result_nbytes(result)
+    limit = config.RESULT_CACHE_MEMORY_BYTES
+    if size > limit:
+        return
+
+    with _lock:
+        if key in _memory_cache:
+            _memory_bytes -= _result_nbytes(_memory_cache.pop(key))
+
+        _memory_cache[key] = result
+        _memory_bytes += size
+
+        while _memory_bytes > limit and _memory_cache:
+            _, evicted = _memory_cache.popitem(last=False)
+            _memory_bytes -= _result_nbytes(evicted)
+
+def _entry_to_result(entry: Dict) -> Dict:
+    """
+    תוצאה מרשומת מאגר - מערכים כ-memmap לקריאה בלבד
+    """
+    arrays = entry['arrays']
+    meta = entry['meta']
+    return {
+        'classification': arrays['classification'],
+        'overlay': arrays['overlay'],
+        'stats': meta['stats'],
+        'preview': arrays.get('preview'),
+        'georef': _georef_from_json(meta['georef'])
+    }
+
+def get_cached_result(key: str) -> Optional[Dict]:
+    """
+    שליפת תוצאה מהמטמון - תחילה מהזיכרון ואחר כך מהדיסק
+
+    Returns:
+        מילון עם classification, overlay, stats, preview ו-georef, או None אם לא נמצא
+    """
+    with _lock:
+        result = _memory_cache.get(key)
+        if result is not None:
+            _memory_cache.move_to_end(key)
+            return result
+
+    try:
+        entry = open_entry(get_result_cache_dir(), key)
+        if entry is None:
+            return None
+        result = _entry_to_result(entry)
+    except Exception as e:
+        print(f"⚠️ Corrupt result cache entry, ignoring: {e}")
+        return None
+
+    _remember(key, result)
+    return result
+
+def create_result_array(key: str, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.memmap:
+    """
+    מערך בדיסק שהעיבוד כותב אליו ישירות (למשל מפת הסיווג), ונשמר ב-store_result ללא העתקה
+    """
+    return create_array(get_result_cache_dir(), key, name, shape, dtype)
+
+def get_result_file_path(key: str, filename: str) -> str:
+    """
+    נתיב לקובץ נלווה לתוצאה (למשל COG להורדה) - נמחק יחד עם התוצאה בפינוי
+    """
+    return get_entry_file(get_result_cache_dir(), key, filename)
+
+def store_result(key: str, classification: np.ndarray, overlay: np.ndarray, stats: Dict,
+                 preview: Optional[np.ndarray] = None, georef: Optional[Dict] = None) -> Dict:
+    """
+    שמירת תוצאה במאגר הרסטרים ובשכבת הזיכרון
+
+    Args:
+        preview: תמונת המקור ברזולוציית התצוגה - מאפשרת הצגה ללא פענוח הקובץ
+        georef: התייחסות גיאוגרפית של מפת הסיווג - נקראת מהמקור פעם אחת בלבד
+
+    Returns:
+        התוצאה, עם מערכים כ-memmap לקריאה בלבד מהדיסק (או המערכים שהתקבלו אם השמירה נכשלה)
+    """
+    result = {'classification': classification, 'overlay': overlay, 'stats': stats,
+              'preview': preview, 'georef': georef}
+    cache_dir = get_result_cache_dir()
+
+    try:
+        save_entry(cache_dir, key,
+                   {'classification': classification, 'overlay': overlay, 'preview': preview},
+                   {'stats': stats, 'georef': _georef_to_json(georef)})
+        # הקריאה החוזרת מהדיסק משחררת את העותקים בזיכרון כשהקורא מוותר עליהם
+        result = _entry_to_result(open_entry(cache_dir, key))
+        evict_entries(cache_dir, config.RESULT_CACHE_DISK_BYTES)
+    except Exception as e:
+        print(f"⚠️ Could not save result cache: {e}")
+
+    _remember(key, result)
+    return result
+
+def clear_memory_cache() -> None:
+    """
+    ריקון שכבת הזיכרון
+    """
+    global _memory_bytes
+
+    with _lock:
+        _memory_cache.clear()
+        _memory_bytes = 0
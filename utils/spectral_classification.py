@@ -0,0 +1,170 @@
+"""
+מנוע סיווג מקומי לתמונות רב-ספקטרליות
+מימוש NumPy של calculate_indices ו-classify_land_use מ-earth_engine_utils,
+שרץ ישירות על ערוצי GeoTIFF מהדיסק (סדר הערוצים לפי config.MODEL_BANDS)
+ללא קריאה לשרתי Earth Engine. הסיווג מתבצע במקטעים של פיקסלים, כך
+שהמערכים הזמניים של האינדקסים לא מוקצים בגודל הסצנה המלאה
+
+סמנטיקה זהה לשרת:
+- normalizedDifference מחושב ב-float32, וערך שלילי באחד הערוצים ממסך את התוצאה
+- EVI מחושב ב-float64 (קבועי הביטוי הם double), וחלוקה באפס נותנת 0
+- תנאי על פיקסל ממוסך אינו מתקיים, ולכן where משאיר את הערך הקודם
+"""
+
+import numpy as np
+from typing import Callable, Dict, List, Optional
+import config
+from utils.classification_rules import get_compiled_rules
+from utils.tiled_processing import classify_geotiff_tiled
+
+# מספר פיקסלים מקסימלי למקטע בחישוב האינדקסים
+SPECTRAL_CHUNK_PIXELS = 1 << 18
+
+def get_band_indexes(src) -> List[int]:
+    """
+    מספרי הערוצים בקובץ (מ-1) לפי סדר config.MODEL_BANDS
+
+    ערוצים מזוהים לפי התיאור שלהם בקובץ (B2, B3...), ואם אין תיאורים -
+    לפי המיקום, בהנחה שהקובץ נכתב בסדר MODEL_BANDS
+    """
+    descriptions = [description.upper() if description else None for description in src.descriptions]
+
+    if all(band in descriptions for band in config.MODEL_BANDS):
+        return [descriptions.index(band) + 1 for band in config.MODEL_BANDS]
+
+    if src.count < len(config.MODEL_BANDS):
+        raise ValueError(f"Expected {len(config.MODEL_BANDS)} bands ({', '.join(config.MODEL_BANDS)}), "
+                         f"found {src.count}")
+
+    return list(range(1, len(config.MODEL_BANDS) + 1))
+
+def read_model_bands_window(src, window=None) -> np.ma.MaskedArray:
+    """
+    קריאת ערוצי המודל מחלון בקובץ בצורה (ערוצים, גובה, רוחב), עם מסכת nodata
+    """
+    return src.read(get_band_indexes(src), window=window, masked=True)
+
+def _band(bands: np.ndarray, name: str) -> np.ndarray:
+    """ערוץ לפי שמו ב-MODEL_BANDS"""
+    return bands[config.MODEL_BANDS.index(name)]
+
+def normalized_difference(first: np.ndarray, second: np.ndarray,
+                          valid: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    (first - second) / (first + second) ב-float32, כמו ee.Image.normalizedDifference
+
+    Returns:
+        מערך float32, עם NaN בפיקסלים ממוסכים (ערך שלילי או מחוץ ל-valid)
+    """
+    first = first.astype(np.float32)
+    second = second.astype(np.float32)
+
+    total = first + second
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = (first - second) / total
+    result[total == 0] = 0
+
+    masked = (first < 0) | (second < 0)
+    if valid is not None:
+        masked |= ~valid
+    result[masked] = np.nan
+    return result
+
+def enhanced_vegetation_index(nir: np.ndarray, red: np.ndarray, blue: np.ndarray,
+                              valid: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1)) ב-float64, כמו הביטוי בשרת
+
+    Returns:
+        מערך float64, עם NaN בפיקסלים ממוסכים
+    """
+    nir = nir.astype(np.float64)
+    red = red.astype(np.float64)
+    blue = blue.astype(np.float64)
+
+    denominator = nir + 6 * red - 7.5 * blue + 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = 2.5 * ((nir - red) / denominator)
+    result[denominator == 0] = 0
+
+    if valid is not None:
+        result[~valid] = np.nan
+    return result
+
+def calculate_indices_array(bands: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    חישוב NDVI, NDBI, MNDWI ו-EVI לערוצים בסדר MODEL_BANDS
+
+    Args:
+        bands: מערך (ערוצים, ...) - רגיל או ממוסך (np.ma)
+
+    Returns:
+        מילון אינדקסים, עם NaN בפיקסלים ממוסכים
+    """
+    valid = ~np.ma.getmaskarray(bands).any(axis=0) if np.ma.isMaskedArray(bands) else None
+    bands = np.ma.getdata(bands)
+
+    blue, green, red = _band(bands, 'B2'), _band(bands, 'B3'), _band(bands, 'B4')
+    nir, swir = _band(bands, 'B8'), _band(bands, 'B11')
+
+    return {
+        'NDVI': normalized_difference(nir, red, valid),
+        'NDBI': normalized_difference(swir, nir, valid),
+        'MNDWI': normalized_difference(green, swir, valid),
+        'EVI': enhanced_vegetation_index(nir, red, blue, valid)
+    }
+
+def _classify_chunk(bands: np.ndarray) -> np.ndarray:
+    """
+    סיווג מקטע פיקסלים - אותם כללים (config.SPECTRAL_CLASSIFICATION_RULES) ואותו סדר כמו classify_land_use
+    """
+    rules = get_compiled_rules(config.SPECTRAL_CLASSIFICATION_RULES, config.SPECTRAL_CLASSIFICATION_THRESHOLDS)
+    indices = calculate_indices_array(bands)
+    
+    # השוואה ב-float64, כמו השוואת ערך float32 לקבוע double בשרת
+    features = {name: indices[name].astype(np.float64, copy=False) for name in rules.features}
+    return rules.evaluate(features)
+
+def classify_land_use_array(bands: np.ndarray, chunk_pixels: int = None,
+                            out: Optional[np.ndarray] = None,
+                            progress: Optional[Callable[[float], None]] = None) -> np.ndarray:
+    """
+    סיווג שימושי קרקע מקומי, זהה פיקסל לפיקסל ל-classify_land_use בשרת
+
+    Args:
+        bands: מערך (ערוצים, גובה, רוחב) בסדר MODEL_BANDS - רגיל או ממוסך
+        chunk_pixels: מספר פיקסלים למקטע
+        out: מערך uint8 רציף בגודל (גובה, רוחב) לתוצאה (אופציונלי)
+        progress: נקרא עם החלק שסווג (0 עד 1) אחרי כל מקטע (אופציונלי)
+
+    Returns:
+        מפת סיווג uint8 בגודל (גובה, רוחב)
+    """
+    if chunk_pixels is None:
+        chunk_pixels = SPECTRAL_CHUNK_PIXELS
+
+    band_count, height, width = bands.shape
+    flat = bands.reshape(band_count, height * width)
+
+    if out is None:
+        out = np.empty((height, width), dtype=np.uint8)
+    classification = out.reshape(height * width)
+    for start in range(0, height * width, chunk_pixels):
+        classification[start:start + chunk_pixels] = _classify_chunk(flat[:, start:start + chunk_pixels])
+        if progress is not None:
+            progress(min(1.0, (start + chunk_pixels) / (height * width)))
+
+    return out
+
+def classify_multispectral_geotiff(input_path: str,
+                                   output_path: Optional[str] = None,
+                                   tile_size: int = None) -> Optional[Dict]:
+    """
+    סיווג GeoTIFF רב-ספקטרלי (למשל Sentinel-2 שהורד מראש) באריחים, ללא רשת
+
+    Returns:
+        סטטיסטיקות סיווג לכל הסצנה, או None אם הסיווג נכשל
+    """
+    return classify_geotiff_tiled(input_path, output_path, tile_size,
+                                  classifier=classify_land_use_array,
+                                  reader=read_model_bands_window)
@@ -0,0 +1,352 @@
+"""
+שרת אריחי XYZ לשכבות סיווג במצב המפה
+כל אריח z/x/y מחושב לפי דרישה: האזור המתאים נקרא מרסטר המקור דרך
+WarpedVRT ב-Web Mercator, מסווג במסווג הקיים ונצבע לפי לוח המחלקות.
+אריחים מקודדים נשמרים במטמון LRU בזיכרון ובדיסק, כך שגלילה והגדלה
+לא מחייבות סיווג מחדש ולא נדרש לסווג את כל הסצנה מראש.
+מקורות מוגבלים לקבצים תחת config.TILE_SOURCE_DIR, והדפדפן פונה לשרת דרך
+config.TILE_SERVER_PUBLIC_URL כשהשרת לא נגיש לו בכתובת ההאזנה
+"""
+
+import hashlib
+import os
+import re
+import socket
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_bounds
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform as transform_coords, transform_bounds
+from rasterio.windows import Window
+import config
+from utils.image_processing import (classify_rgb_image, get_class_palette, get_classifier_fingerprint,
+                                    get_rgb_classification_stats)
+from utils.raster_store import evict_files
+from utils.spectral_classification import classify_land_use_array, get_band_indexes, read_model_bands_window
+from utils.tiled_processing import read_rgb_window
+
+# חצי היקף כדור הארץ ב-Web Mercator (EPSG:3857)
+WEB_MERCATOR_HALF_EXTENT = 20037508.342789244
+
+# נתיב אריח, גם עם תחילית של proxy שלא מסיר אותה (/<prefix>/tiles/...)
+TILE_PATH = re.compile(r'^(?:/.*)?/tiles/(?P<source>[0-9a-f]+)/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.png$')
+
+# מקורות רשומים לפי מזהה, מטמון האריחים בזיכרון והשרת הפעיל
+_sources: Dict[str, Dict] = {}
+_memory_tiles: "OrderedDict[Tuple, bytes]" = OrderedDict()
+_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+_disk_writes = 0
+
+def get_tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    גבולות אריח XYZ ב-Web Mercator - (west, south, east, north)
+    """
+    span = 2 * WEB_MERCATOR_HALF_EXTENT / (2 ** z)
+    west = -WEB_MERCATOR_HALF_EXTENT + x * span
+    north = WEB_MERCATOR_HALF_EXTENT - y * span
+    return west, north - span, west + span, north
+
+def is_allowed_source(path: str) -> bool:
+    """
+    האם הקובץ נמצא תחת config.TILE_SOURCE_DIR - אחרי פתרון קישורים ו-'..'
+    """
+    root = os.path.realpath(config.TILE_SOURCE_DIR)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+def list_sources() -> List[str]:
+    """
+    קובצי GeoTIFF תחת config.TILE_SOURCE_DIR, כנתיבים יחסיים לתיקייה
+    """
+    root = config.TILE_SOURCE_DIR
+    if not os.path.isdir(root):
+        return []
+
+    sources = []
+    for dir_path, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().split('.')[-1] in ['tif', 'tiff']:
+                sources.append(os.path.relpath(os.path.join(dir_path, filename), root))
+    return sorted(sources)
+
+def register_source(path: str) -> str:
+    """
+    רישום רסטר מקור לשרת
+
+    Args:
+        path: נתיב לקובץ, מוחלט או יחסי ל-config.TILE_SOURCE_DIR
+
+    Returns:
+        מזהה המקור - תלוי בתוכן הקובץ (זמן שינוי וגודל), בהגדרות הסיווג ובצבעים
+
+    Raises:
+        PermissionError: הקובץ מחוץ ל-config.TILE_SOURCE_DIR
+    """
+    path = os.path.realpath(os.path.join(config.TILE_SOURCE_DIR, path))
+    if not is_allowed_source(path):
+        raise PermissionError(f"Tile sources must be under {config.TILE_SOURCE_DIR}")
+
+    stat = os.stat(path)
+    with rasterio.open(path) as src:
+        bounds = transform_bounds(src.crs, 'EPSG:3857', *src.bounds)
+        # מקור רב-ספקטרלי מזוהה לפי תיאורי הערוצים בלבד - RGB עם ערוצים נוספים נשאר RGB
+        descriptions = [description.upper() if description else None for description in src.descriptions]
+        multispectral = all(band in descriptions for band in config.MODEL_BANDS)
+        band_indexes = get_band_indexes(src) if multispectral else None
+
+    palette = get_class_palette()
+    payload = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{get_classifier_fingerprint()}|" \
+              f"{hashlib.sha256(palette.tobytes()).hexdigest()}|{config.TILE_OVERLAY_ALPHA}"
+    source_id = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    with _lock:
+        _sources[source_id] = {
+            'path': path,
+            'bounds': bounds,
+            'band_indexes': band_indexes
+        }
+    return source_id
+
+def get_source_bounds(source_id: str) -> Optional[Tuple[float, float, float, float]]:
+    """
+    גבולות מקור רשום בקואורדינטות גיאוגרפיות - (west, south, east, north)
+    """
+    source = _sources.get(source_id)
+    if source is None:
+        return None
+    return transform_bounds('EPSG:3857', 'EPSG:4326', *source['bounds'])
+
+def classify_area(source_id: str, lon: float, lat: float, size_pixels: int = None) -> Optional[Dict]:
+    """
+    סיווג וסטטיסטיקות לחלון ברזולוציה מלאה סביב נקודה במקור רשום
+
+    Returns:
+        סטטיסטיקות סיווג, או None אם המקור לא רשום או שהנקודה מחוץ לרסטר
+    """
+    if size_pixels is None:
+        size_pixels = config.TILE_SIZE
+
+    source = _sources.get(source_id)
+    if source is None:
+        return None
+
+    with rasterio.open(source['path']) as src:
+        xs, ys = transform_coords('EPSG:4326', src.crs, [lon], [lat])
+        row, col = src.index(xs[0], ys[0])
+        if not (0 <= row < src.height and 0 <= col < src.width):
+            return None
+
+        half = size_pixels // 2
+        window = Window(col - half, row - half, size_pixels, size_pixels).intersection(
+            Window(0, 0, src.width, src.height))
+
+        if source['band_indexes']:
+            classification = classify_land_use_array(read_model_bands_window(src, window))
+        else:
+            classification = classify_rgb_image(read_rgb_window(src, window))
+
+        georef = {'crs': src.crs, 'transform': src.window_transform(window)}
+
+    return get_rgb_classification_stats(classification, georef)
+
+def _encode_png(rgba: np.ndarray) -> bytes:
+    """קידוד אריח RGBA ל-PNG"""
+    success, encoded = cv2.imencode('.png', cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGRA))
+    if not success:
+        raise IOError("Could not encode tile")
+    return encoded.tobytes()
+
+def render_tile(source: Dict, z: int, x: int, y: int, tile_pixels: int = None) -> bytes:
+    """
+    סיווג וצביעה של אריח אחד מרסטר המקור
+
+    Returns:
+        PNG שקוף מחוץ לרסטר, ובתוכו צבעי המחלקות בשקיפות TILE_OVERLAY_ALPHA
+    """
+    if tile_pixels is None:
+        tile_pixels = config.TILE_PIXELS
+
+    west, south, east, north = get_tile_bounds(z, x, y)
+    rgba = np.zeros((tile_pixels, tile_pixels, 4), dtype=np.uint8)
+
+    src_west, src_south, src_east, src_north = source['bounds']
+    if west >= src_east or east <= src_west or south >= src_north or north <= src_south:
+        return _encode_png(rgba)
+
+    transform = from_bounds(west, south, east, north, tile_pixels, tile_pixels)
+
+    with rasterio.open(source['path']) as src:
+        with WarpedVRT(src, crs='EPSG:3857', transform=transform, width=tile_pixels, height=tile_pixels,
+                       resampling=Resampling.nearest) as vrt:
+            if source['band_indexes']:
+                bands = vrt.read(source['band_indexes'], masked=True)
+                classification = classify_land_use_array(bands)
+                valid = ~np.ma.getmaskarray(bands).any(axis=0)
+            else:
+                indexes = [1, 2, 3] if vrt.count >= 3 else list(range(1, vrt.count + 1))
+                tile = vrt.read(indexes)
+                classification = classify_rgb_image(np.ascontiguousarray(np.transpose(tile, (1, 2, 0))))
+                valid = vrt.read_masks(1) > 0
+
+    rgba[..., :3] = get_class_palette()[classification]
+    rgba[..., 3] = np.where(valid, config.TILE_OVERLAY_ALPHA, 0)
+    return _encode_png(rgba)
+
+def _get_tile_cache_path(source_id: str, z: int, x: int, y: int) -> str:
+    """נתיב אריח בשכבת הדיסק"""
+    return os.path.join(config.CACHE_DIR, 'tiles', source_id, str(z), str(x), f"{y}.png")
+
+def _evict_disk_tiles() -> None:
+    """
+    מחיקת האריחים הישנים ביותר בדיסק (לפי זמן גישה אחרון) עד למגבלת הנפח
+    """
+    evict_files(os.path.join(config.CACHE_DIR, 'tiles'), config.TILE_CACHE_DISK_BYTES)
+
+def _remember_tile(key: Tuple, data: bytes) -> None:
+    """הכנסת אריח לשכבת הזיכרון ופינוי הישנים ביותר"""
+    with _lock:
+        _memory_tiles[key] = data
+        _memory_tiles.move_to_end(key)
+        while len(_memory_tiles) > config.TILE_CACHE_MEMORY_TILES:
+            _memory_tiles.popitem(last=False)
+
+def get_tile(source_id: str, z: int, x: int, y: int) -> Optional[bytes]:
+    """
+    אריח PNG מהמטמון (זיכרון ואז דיסק), או סיווג ושמירה
+
+    Returns:
+        בתי PNG, או None אם המקור לא רשום
+    """
+    global _disk_writes
+
+    key = (source_id, z, x, y)
+    with _lock:
+        data = _memory_tiles.get(key)
+        if data is not None:
+            _memory_tiles.move_to_end(key)
+            return data
+        source = _sources.get(source_id)
+
+    if source is None:
+        return None
+
+    path = _get_tile_cache_path(source_id, z, x, y)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.utime(path)
+    except OSError:
+        data = None
+
+    if data is None:
+        data = render_tile(source, z, x, y)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            # בדיקת נפח הדיסק מדי כמה מאות אריחים, ולא בכל כתיבה
+            with _lock:
+                _disk_writes += 1
+                evict = _disk_writes % 256 == 0
+            if evict:
+                _evict_disk_tiles()
+        except Exception as e:
+            print(f"⚠️ Could not save tile cache: {e}")
+
+    _remember_tile(key, data)
+    return data
+
+def clear_memory_tiles() -> None:
+    """
+    ריקון שכבת הזיכרון של האריחים
+    """
+    with _lock:
+        _memory_tiles.clear()
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    """
+    טיפול בבקשות /tiles/<source>/<z>/<x>/<y>.png
+    """
+
+    def do_GET(self):
+        match = TILE_PATH.match(self.path.split('?', 1)[0])
+        if match is None:
+            self.send_error(404)
+            return
+
+        z, x, y = int(match['z']), int(match['x']), int(match['y'])
+        if x >= 2 ** z or y >= 2 ** z:
+            self.send_error(404)
+            return
+
+        try:
+            data = get_tile(match['source'], z, x, y)
+        except Exception as e:
+            print(f"❌ Error rendering tile {z}/{x}/{y}: {e}")
+            self.send_error(500)
+            return
+
+        if data is None:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'max-age=3600')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # בקשות אריחים רבות מדי ללוג הרגיל
+        pass
+
+def start_tile_server(host: str = None, port: int = None) -> str:
+    """
+    הפעלת שרת האריחים ב-thread רקע (פעם אחת לכל תהליך)
+
+    Returns:
+        כתובת הבסיס של השרת
+    """
+    global _server
+
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host or config.TILE_SERVER_HOST,
+                                           config.TILE_SERVER_PORT if port is None else port),
+                                          TileRequestHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='tile-server', daemon=True).start()
+
+        server_host, server_port = _server.server_address[:2]
+    return f"http://{server_host}:{server_port}"
+
+def get_tile_base_url() -> str:
+    """
+    כתובת הבסיס שהדפדפן פונה אליה - config.TILE_SERVER_PUBLIC_URL אם הוגדרה,
+    אחרת כתובת ההאזנה של השרת (שם המחשב כשהשרת מאזין לכל הממשקים)
+    """
+    local_url = start_tile_server()
+    if config.TILE_SERVER_PUBLIC_URL:
+        return config.TILE_SERVER_PUBLIC_URL.rstrip('/')
+
+    host, port = _server.server_address[:2]
+    if host in ('0.0.0.0', '::', ''):
+        return f"http://{socket.getfqdn()}:{port}"
+    return local_url
+
+def get_tile_url_template(source_id: str) -> str:
+    """
+    תבנית URL לשכבת TileLayer של folium
+    """
+    return f"{get_tile_base_url()}/tiles/{source_id}/{{z}}/{{x}}/{{y}}.png"
@@ -0,0 +1,123 @@
+"""
+מודול עיבוד באריחים
+סיווג קבצי GeoTIFF גדולים חלון אחר חלון, כך שצריכת הזיכרון
+תלויה בגודל האריח ולא בגודל הסצנה
+"""
+
+import os
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from typing import Callable, Dict, Iterator, Optional
+import config
+from utils.image_processing import (classify_rgb_image, count_classes, measure_class_areas,
+                                    stats_from_counts, CLASS_COUNT_BINS)
+from utils.raster_output import build_mode_overviews, copy_as_cog, get_class_colormap
+
+def iter_tile_windows(src, tile_size: int = None) -> Iterator[Window]:
+    """
+    מעבר על חלונות הקובץ בגודל אריח, מיושרים לבלוקים הפנימיים של הקובץ
+    """
+    if tile_size is None:
+        tile_size = config.TILE_SIZE
+
+    block_height, block_width = src.block_shapes[0]
+
+    # גודל אריח בכפולות של הבלוק, כדי שכל בלוק ייקרא פעם אחת בלבד
+    tile_height = (tile_size // block_height) * block_height if block_height <= tile_size else tile_size
+    tile_width = (tile_size // block_width) * block_width if block_width <= tile_size else tile_size
+
+    for row in range(0, src.height, tile_height):
+        for col in range(0, src.width, tile_width):
+            yield Window(col, row,
+                         min(tile_width, src.width - col),
+                         min(tile_height, src.height - row))
+
+def read_rgb_window(src, window: Window) -> np.ndarray:
+    """
+    קריאת חלון מהקובץ בפורמט (גובה, רוחב, ערוצים)
+    """
+    indexes = [1, 2, 3] if src.count >= 3 else list(range(1, src.count + 1))
+    tile = src.read(indexes, window=window)
+    return np.ascontiguousarray(np.transpose(tile, (1, 2, 0)))
+
+def classify_geotiff_tiled(input_path: str,
+                           output_path: Optional[str] = None,
+                           tile_size: int = None,
+                           classifier: Callable[[np.ndarray], np.ndarray] = classify_rgb_image,
+                           reader: Callable[..., np.ndarray] = read_rgb_window) -> Optional[Dict]:
+    """
+    סיווג GeoTIFF גדול באריחים
+
+    Args:
+        input_path: קובץ המקור
+        output_path: קובץ COG לכתיבת מפת הסיווג (אופציונלי)
+        tile_size: גודל אריח בפיקסלים
+        classifier: פונקציית סיווג לאריח בודד
+        reader: פונקציית קריאת אריח (src, window) בפורמט שהמסווג מצפה לו
+
+    Returns:
+        סטטיסטיקות סיווג מצטברות לכל הסצנה
+    """
+    dst = None
+    tmp_path = f"{output_path}.tmp.tif" if output_path else None
+
+    try:
+        with rasterio.open(input_path) as src:
+            if output_path:
+                block_size = config.OUTPUT_BLOCK_SIZE
+                # כתיבה זרימתית לקובץ ביניים, שיומר ל-COG בסיום
+                dst = rasterio.open(
+                    tmp_path, 'w',
+                    driver='GTiff',
+                    width=src.width,
+                    height=src.height,
+                    count=1,
+                    dtype='uint8',
+                    crs=src.crs,
+                    transform=src.transform,
+                    tiled=True,
+                    blockxsize=block_size,
+                    blockysize=block_size,
+                    compress='deflate'
+                )
+
+            counts = np.zeros(CLASS_COUNT_BINS, dtype=np.int64)
+
+            # שטח אמיתי לפי ה-geotransform, כאשר לקובץ יש מערכת קואורדינטות
+            areas_m2 = np.zeros(CLASS_COUNT_BINS, dtype=np.float64) if src.crs is not None else None
+
+            for window in iter_tile_windows(src, tile_size):
+                tile = reader(src, window)
+                classification = classifier(tile)
+
+                counts += count_classes(classification)
+
+                if areas_m2 is not None:
+                    areas_m2 += measure_class_areas(classification, src.transform, src.crs,
+                                                    row_offset=int(window.row_off))
+
+                if dst is not None:
+                    dst.write(classification, 1, window=window)
+
+        if dst is not None:
+            build_mode_overviews(dst)
+            # טבלת הצבעים אחרי הסקירות - GDAL מזהיר על סקירות בערוץ palette
+            dst.write_colormap(1, get_class_colormap())
+            dst.close()
+            dst = None
+
+            with rasterio.open(tmp_path) as tmp:
+                copy_as_cog(tmp, output_path)
+
+        return stats_from_counts(counts, areas_m2)
+
+    except Exception as e:
+        print(f"❌ Error in tiled classification: {e}")
+        return None
+
+    finally:
+        if dst is not None:
+            dst.close()
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)